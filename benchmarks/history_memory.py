@@ -0,0 +1,75 @@
+"""
+Memory / allocation benchmark: legacy List[Message] session history vs ConversationHistory.
+
+Replays the per-turn history operations of Flow.process_turn (copy for the provider call,
+append user + assistant messages, prune) for many live sessions.
+
+Usage:
+    python benchmarks/history_memory.py [sessions] [turns]
+"""
+import os
+import sys
+import gc
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gentis_ai.types import Message
+from gentis_ai.history import ConversationHistory, HistoryRecord
+from gentis_ai.memory import PNNet
+from gentis_ai.utils import Colors
+
+EXPERTS = ["orchestrator", "sales", "support"]
+
+
+def legacy_turn(history, turn):
+    expert = EXPERTS[turn % len(EXPERTS)]
+    message = f"user message number {turn}"
+    # Before: history.copy() + Message for the provider call
+    messages_for_llm = history.copy()
+    messages_for_llm.append(Message(role="user", content=message))
+    history.append(Message(role="user", content=message, metadata={"expert": expert}))
+    history.append(Message(role="assistant", content=f"assistant answer number {turn}", metadata={"expert": expert}))
+    return PNNet.prune(history)
+
+
+def compact_turn(history, turn):
+    expert = EXPERTS[turn % len(EXPERTS)]
+    message = f"user message number {turn}"
+    history.view((HistoryRecord("user", message),)) # What the provider call receives (no copy)
+    history.append("user", message, expert=expert)
+    history.append("assistant", f"assistant answer number {turn}", expert=expert)
+    return PNNet.prune(history)
+
+
+def run(label, factory, turn_fn, sessions, turns):
+    gc.collect()
+    gc_before = sum(s["collections"] for s in gc.get_stats())
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    store = {}
+    for user in range(sessions):
+        history = factory()
+        for turn in range(turns):
+            history = turn_fn(history, turn)
+        store[user] = history
+
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    gc_runs = sum(s["collections"] for s in gc.get_stats()) - gc_before
+
+    print(f"{Colors.CYAN}{label:<22}{Colors.ENDC} retained={current / 1e6:8.2f} MB  peak={peak / 1e6:8.2f} MB  "
+          f"live blocks={blocks:>9}  gc runs={gc_runs:>5}  time={elapsed:6.2f}s")
+    return current
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{Colors.GREEN}=== History memory benchmark: {sessions} sessions x {turns} turns ==={Colors.ENDC}")
+    before = run("List[Message]", list, legacy_turn, sessions, turns)
+    after = run("ConversationHistory", ConversationHistory, compact_turn, sessions, turns)
+    print(f"{Colors.YELLOW}Retained memory reduced by {100 * (1 - after / before):.1f}%{Colors.ENDC}")
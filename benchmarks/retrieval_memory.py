@@ -0,0 +1,80 @@
+"""
+Long sessions: prompt size and recall of old details, pruned history vs retrieval memory.
+
+Each session plants a few facts ("my locker code is 3817") early on, then makes small talk, and
+at checkpoints asks about the facts. "pruned" sends the last 20 turns (PNNet.prune's default),
+"retrieval" sends the top-k recalled past turns plus the last 2 turns (RetrievalMemory).
+A fact counts as recalled when its value is in the prompt the expert receives.
+
+Usage:
+    python benchmarks/retrieval_memory.py [sessions]
+"""
+import os
+import sys
+import time
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.memory import RetrievalMemory
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.utils import Colors
+
+FACTS = ["locker code", "flight number", "booking reference", "parking spot"]
+CHECKPOINTS = (15, 100, 300)
+SMALL_TALK = ["how are you today", "tell me a joke", "what a nice day", "thanks for the help", "let us continue"]
+
+
+class PromptRecordingLLM(MockLLM):
+    """Answers briefly and keeps the last prompt it received."""
+    def __init__(self):
+        super().__init__(default_response="Sure, noted.")
+        self.last_messages = []
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.last_messages = list(messages)
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+def run_session(memory, rng):
+    llm = PromptRecordingLLM()
+    flow = Flow(Router([Expert(name="orchestrator", description="General", system_prompt="You help.")], MockLLM()), llm, memory=memory)
+    values = {fact: str(rng.randint(1000, 9999)) for fact in FACTS}
+    for fact, value in values.items():
+        flow.process_turn(f"Please remember that my {fact} is {value}", user_id="u")
+    results = {}
+    turn = len(FACTS)
+    for checkpoint in CHECKPOINTS:
+        while turn < checkpoint:
+            flow.process_turn(rng.choice(SMALL_TALK), user_id="u")
+            turn += 1
+        recalled = tokens = 0
+        for fact, value in values.items():
+            flow.process_turn(f"What is my {fact}?", user_id="u")
+            prompt = "\n".join(m.content for m in llm.last_messages)
+            recalled += value in prompt
+            tokens += len(prompt) // 4
+        turn += len(FACTS)
+        results[checkpoint] = (tokens / len(FACTS), recalled / len(FACTS))
+    return results
+
+
+def run(label, memory_factory, sessions):
+    totals = {checkpoint: [0.0, 0.0] for checkpoint in CHECKPOINTS}
+    start = time.perf_counter()
+    for i in range(sessions):
+        for checkpoint, (tokens, recall) in run_session(memory_factory(), random.Random(i)).items():
+            totals[checkpoint][0] += tokens / sessions
+            totals[checkpoint][1] += recall / sessions
+    elapsed = time.perf_counter() - start
+    row = "  ".join(f"turn {c:>3}: {totals[c][0]:6.0f} tokens, recall {100 * totals[c][1]:5.1f}%" for c in CHECKPOINTS)
+    print(f"  {label:<10} {row}  ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{Colors.GREEN}=== {n_sessions} sessions, prompt tokens and fact recall at each checkpoint ==={Colors.ENDC}")
+    run("pruned", lambda: None, n_sessions)
+    run("retrieval", lambda: RetrievalMemory(top_k=3, recent_turns=2), n_sessions)
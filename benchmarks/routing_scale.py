@@ -0,0 +1,102 @@
+"""
+Routing cost vs roster size: flat routing vs hierarchical routing (lexical shortlist, categories + shortlist).
+
+Synthetic experts are grouped into themed categories; each query uses a few words of its target
+expert's description plus filler. A simulated router LLM picks the listed option sharing the most
+words with the query, and its latency is modeled as a fixed cost plus a per-prompt-token prefill cost,
+so the numbers show how prompt size (and hence latency) scales with the roster.
+The simulated LLM never confuses similar options, so accuracy here only reflects whether the
+target survived the shortlist (recall); real models also get less accurate as the prompt grows.
+
+Usage:
+    python benchmarks/routing_scale.py [queries]
+"""
+import os
+import re
+import sys
+import time
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.index import tokenize
+from gentis_ai.utils import Colors
+
+FIXED_MS = 150.0 # Per-call overhead and short decode of a small model
+PREFILL_MS_PER_TOKEN = 0.05
+EXPERTS_PER_CATEGORY = 25
+FILLER = "please could you help me with something about".split()
+
+
+class SimulatedRouterLLM(MockLLM):
+    """Picks the listed option (expert or category) sharing the most words with the user message."""
+    def __init__(self):
+        super().__init__()
+        self.prompt_tokens = 0
+        self.calls = 0
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        prompt = messages[-1].content
+        self.prompt_tokens += self.count_tokens(prompt)
+        self.calls += 1
+        query = set(tokenize(re.search(r'User Message: "(.*?)"', prompt, re.DOTALL).group(1)))
+        options = re.findall(r"^\s*- '(.*?)': (.*)$", prompt, re.MULTILINE)
+        best = max(options, key=lambda option: len(query & set(tokenize(option[1]))))
+        return best[0]
+
+
+def make_roster(n_experts, rng):
+    n_categories = max(1, n_experts // EXPERTS_PER_CATEGORY)
+    themes = [[f"t{c}w{i}" for i in range(12)] for c in range(n_categories)]
+    experts = [Expert(name="orchestrator", description="General chit-chat and greetings", system_prompt="sys")]
+    for i in range(n_experts - 1):
+        category = i % n_categories
+        words = rng.sample(themes[category], 3) + [f"e{i}k{j}" for j in range(3)]
+        experts.append(Expert(name=f"expert_{i}", description=" ".join(words), system_prompt="sys", category=f"cat_{category}"))
+    categories = {f"cat_{c}": " ".join(themes[c]) for c in range(n_categories)}
+    return experts, categories
+
+
+def make_queries(experts, n_queries, rng):
+    queries = []
+    for _ in range(n_queries):
+        target = rng.choice(experts[1:])
+        words = target.description.split()
+        # One theme word and two of the expert's own keywords, among filler
+        query_words = [words[0]] + rng.sample(words[3:], 2) + rng.sample(FILLER, 3)
+        rng.shuffle(query_words)
+        queries.append((" ".join(query_words), target.name))
+    return queries
+
+
+def run(label, router, queries):
+    llm = router.llm
+    correct = recalled = candidates = 0
+    start = time.perf_counter()
+    for query, target in queries:
+        shortlist = router._candidates(query, "orchestrator")
+        pool = shortlist if shortlist is not None else router._expert_names
+        candidates += len(pool)
+        recalled += target in pool
+        correct += router._classify(query, "orchestrator", None, shortlist) == [target]
+    local_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    calls = llm.calls / len(queries)
+    prompt_tokens = llm.prompt_tokens / len(queries)
+    modeled_ms = calls * FIXED_MS + prompt_tokens * PREFILL_MS_PER_TOKEN
+    print(f"  {label:<24} candidates={candidates / len(queries):7.1f}  prompt tokens={prompt_tokens:8.0f}  "
+          f"llm calls={calls:3.1f}  modeled latency={modeled_ms:7.1f} ms  local={local_ms:6.2f} ms  "
+          f"recall={100 * recalled / len(queries):5.1f}%  accuracy={100 * correct / len(queries):5.1f}%")
+
+
+if __name__ == "__main__":
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for n_experts in (10, 100, 1000):
+        rng = random.Random(n_experts)
+        experts, categories = make_roster(n_experts, rng)
+        queries = make_queries(experts, n_queries, rng)
+        print(f"{Colors.GREEN}=== {n_experts} experts, {len(categories)} categories, {n_queries} queries ==={Colors.ENDC}")
+        run("flat", Router(experts, SimulatedRouterLLM()), queries)
+        run("shortlist (8)", Router(experts, SimulatedRouterLLM(), shortlist_size=8), queries)
+        run("categories + shortlist", Router(experts, SimulatedRouterLLM(), categories=categories, shortlist_size=8), queries)
@@ -0,0 +1,118 @@
+"""
+Session persistence: write amplification, group commit and recovery time of the SessionJournal.
+
+1. Write amplification: bytes written per turn by the journal (one binary record holding the turn's
+   changes) vs saving the whole session as JSON after every turn (what a key-value session store does).
+2. Group commit: turns per second and records per fsync with 1..32 sessions writing concurrently.
+3. Recovery: time to reopen the journal (scan and index), to restore one session lazily,
+   and to rebuild every session, from the log alone and after compaction into a snapshot.
+
+Usage:
+    python benchmarks/session_journal.py [sessions] [turns]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gentis_ai.journal import SessionJournal, encode_turn
+from gentis_ai.history import HistoryRecord
+from gentis_ai.utils import Colors
+
+WORDS = "the order invoice shipping refund account password delivery warranty payment status help please thanks".split()
+MAX_HISTORY = 40 # PNNet.prune's default
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def make_turn(rng, i):
+    expert = "billing" if i % 5 == 0 else "orchestrator"
+    return expert, [HistoryRecord("user", sentence(rng, 12), expert), HistoryRecord("assistant", sentence(rng, 60), expert)]
+
+
+def write_amplification(turns):
+    rng = random.Random(0)
+    history = []
+    journal_bytes = blob_bytes = 0
+    for i in range(turns):
+        expert, messages = make_turn(rng, i)
+        history = (history + messages)[-MAX_HISTORY:]
+        journal_bytes += len(encode_turn("user-1", expert, messages, history_len=len(history)))
+        blob = {"current_expert": expert, "history": [r.model_dump() for r in history]}
+        blob_bytes += len(json.dumps(blob).encode("utf-8"))
+    print(f"{Colors.GREEN}=== Write amplification, {turns} turns (history pruned to {MAX_HISTORY} messages) ==={Colors.ENDC}")
+    print(f"  journal record        {journal_bytes / turns:8.0f} bytes/turn")
+    print(f"  full JSON rewrite     {blob_bytes / turns:8.0f} bytes/turn  ({blob_bytes / journal_bytes:.1f}x)")
+
+
+def group_commit(directory, turns):
+    print(f"{Colors.GREEN}=== Group commit, {turns} turns per session, fsync per batch ==={Colors.ENDC}")
+    for sessions in (1, 4, 16, 32):
+        path = os.path.join(directory, f"commit-{sessions}")
+        journal = SessionJournal(path)
+        rng = random.Random(sessions)
+        payloads = [make_turn(rng, i) for i in range(turns)]
+
+        def session(n):
+            for i, (expert, messages) in enumerate(payloads):
+                journal.record_turn(f"s{n}", expert, messages, history_len=min(2 * (i + 1), MAX_HISTORY))
+
+        threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        journal.close()
+        print(f"  {sessions:>2} sessions  {journal.records_written / elapsed:8.0f} turns/s  {journal.records_written / journal.batches_written:6.1f} records/fsync")
+
+
+def recovery(directory, sessions, turns):
+    path = os.path.join(directory, "recovery")
+    journal = SessionJournal(path, fsync=False, compact_segments=0, segment_bytes=4 * 1024 * 1024)
+    rng = random.Random(1)
+    for i in range(turns):
+        for n in range(sessions):
+            expert, messages = make_turn(rng, i)
+            journal.record_turn(f"s{n}", expert, messages, history_len=min(2 * (i + 1), MAX_HISTORY))
+    journal.close()
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"{Colors.GREEN}=== Recovery, {sessions} sessions x {turns} turns ==={Colors.ENDC}")
+
+    for label in ("log only", "after compaction"):
+        if label == "after compaction":
+            journal = SessionJournal(path, fsync=False, compact_segments=0) # Opens a new segment, so every turn is in a sealed one
+            journal.compact()
+            journal.close()
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        start = time.perf_counter()
+        journal = SessionJournal(path, fsync=False)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        journal.load("s0")
+        lazy = time.perf_counter() - start
+        start = time.perf_counter()
+        journal.load_all()
+        full = time.perf_counter() - start
+        journal.close()
+        print(f"  {label:<17} {size / 1024:8.0f} KiB  open+index={opened * 1000:7.1f} ms  one session={lazy * 1000:6.2f} ms  all sessions={full * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_turns = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    directory = tempfile.mkdtemp()
+    try:
+        write_amplification(n_turns)
+        group_commit(directory, min(n_turns, 50))
+        recovery(directory, n_sessions, n_turns)
+    finally:
+        shutil.rmtree(directory)
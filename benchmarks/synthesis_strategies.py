@@ -0,0 +1,84 @@
+"""
+Cost of merging hybrid answers: LLM synthesis (full answers, answers compressed to a token budget,
+a cheaper model) vs a sectioned merge and a winner pick, which make no LLM call.
+
+Each expert answers with a few sentences, the first one carrying its key fact. A simulated synthesizer
+LLM's latency is modeled as a fixed cost plus per-token prefill and decode costs (a smaller model is
+cheaper on each), so the numbers show how the synthesis cost grows with the fan-out and answer length.
+"facts" is the share of the experts' key facts that reach the reply (for LLM strategies: that
+the synthesizer gets to see).
+
+Usage:
+    python benchmarks/synthesis_strategies.py [turns]
+"""
+import os
+import sys
+import time
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gentis_ai.types import Expert
+from gentis_ai.synthesis import LLMSynthesis, SectionedMerge, WinnerSynthesis
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.utils import Colors
+
+# Per model: (fixed ms, prefill ms per token, decode ms per token)
+COSTS = {"large": (200.0, 0.1, 20.0), "small": (80.0, 0.03, 6.0)}
+OUTPUT_TOKENS = 150
+SYNTHESIZER = Expert(name="orchestrator", description="General", system_prompt="You merge expert opinions.")
+
+
+class SimulatedSynthesizerLLM(MockLLM):
+    """Counts the synthesis prompt tokens and models the call latency of the requested model."""
+    def __init__(self):
+        super().__init__(default_response="x" * OUTPUT_TOKENS * 4)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.modeled_ms = 0.0
+        self.last_prompt = ""
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        fixed, prefill, decode = COSTS[kwargs.get("model") or "large"]
+        self.last_prompt = messages[-1].content
+        tokens = self.count_tokens((system_prompt or "") + self.last_prompt)
+        self.calls += 1
+        self.prompt_tokens += tokens
+        self.modeled_ms += fixed + tokens * prefill + OUTPUT_TOKENS * decode
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+def make_turn(fan_out, sentences, rng):
+    answers = []
+    for i in range(fan_out):
+        fact = f"Key fact {i}: the answer for topic t{i} is {rng.randint(100, 999)}."
+        filler = " ".join(f"Detail {j} about topic t{i} with some supporting explanation for the user." for j in range(sentences))
+        answers.append((f"expert_{i}", f"{fact} {filler}"))
+    message = "Tell me about " + " and ".join(f"topic t{i}" for i in range(fan_out))
+    return message, answers
+
+
+def run(label, strategy, turns):
+    llm = SimulatedSynthesizerLLM()
+    facts = 0
+    start = time.perf_counter()
+    for message, answers in turns:
+        _, reply = strategy.synthesize(message, answers, llm, SYNTHESIZER)
+        seen = llm.last_prompt if strategy.uses_llm else reply
+        facts += sum(answer.split(" Detail")[0] in seen for _, answer in answers) / len(answers)
+    local_ms = (time.perf_counter() - start) * 1000 / len(turns)
+    print(f"  {label:<28} llm calls={llm.calls / len(turns):3.1f}  prompt tokens={llm.prompt_tokens / len(turns):7.0f}  "
+          f"modeled latency={llm.modeled_ms / len(turns):7.1f} ms  local={local_ms:6.3f} ms  facts={100 * facts / len(turns):5.1f}%")
+
+
+if __name__ == "__main__":
+    n_turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for fan_out in (2, 3, 5):
+        for sentences in (4, 16):
+            rng = random.Random(fan_out * 100 + sentences)
+            turns = [make_turn(fan_out, sentences, rng) for _ in range(n_turns)]
+            print(f"{Colors.GREEN}=== fan-out {fan_out}, {sentences + 1} sentences per answer, {n_turns} turns ==={Colors.ENDC}")
+            run("llm (full answers)", LLMSynthesis(), turns)
+            run("llm (budget 300 tokens)", LLMSynthesis(answer_budget=300), turns)
+            run("llm (small model, budget)", LLMSynthesis(model="small", answer_budget=300), turns)
+            run("sectioned merge", SectionedMerge(), turns)
+            run("winner", WinnerSynthesis(), turns)
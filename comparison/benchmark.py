@@ -3,7 +3,7 @@ import time
 import asyncio
 from dotenv import load_dotenv
 from gentis_ai import Expert, Router, Flow
-from gentis_ai.llm import GeminiLLM
+from gentis_ai.llm import GeminiLLM, RateLimitedLLM
 from gentis_ai.types import Message
 from gentis_ai.prompts import QUICK_START_SUPPORT, QUICK_START_ORCHESTRATOR, QUICK_START_SALES
 
@@ -15,6 +15,7 @@ load_dotenv()
 
 # Configuration
 MODEL_NAME = "gemini-2.5-flash" # Using available model from list
+REQUESTS_PER_MINUTE = 10 # Free tier quota of the model
 API_KEY = os.getenv("GOOGLE_API_KEY")
 
 if not API_KEY:
@@ -42,7 +43,8 @@ def run_gentis_ai():
     start_time = time.time()
     
     # 1. Setup LLM
-    llm = GeminiLLM(model_name=MODEL_NAME, api_key=API_KEY)
+    # Calls wait for quota instead of failing with 429s, so no sleeping between turns
+    llm = RateLimitedLLM(GeminiLLM(model_name=MODEL_NAME, api_key=API_KEY), requests_per_minute=REQUESTS_PER_MINUTE)
     
     # 2. Define Experts
     # Orchestrator (Default) acts as the central guide
@@ -75,11 +77,6 @@ def run_gentis_ai():
     total_latency = 0
     
     for i, user_input in enumerate(TURNS):
-        # Sleep to avoid rate limits
-        if i > 0:
-            print("Sleeping for 60s to respect rate limits...")
-            time.sleep(60)
-        
         turn_start = time.time()
         log_to_file(filename, f"\n--- Turn {i+1} ---")
         log_to_file(filename, f"User: {user_input}")
@@ -89,8 +89,10 @@ flow = Flow(router=router, llm=llm)
 def run_turn(user_input):
     print(f"\nUser: {user_input}")
     try:
-        response = flow.process_turn(user_input)
-        print(f"Agent ({response.agent_name}): {response.content}")
+        # Tool-enabled experts stream like any other expert: chunks are printed as they arrive
+        print("Agent: ", end="")
+        response = flow.process_turn(user_input, stream=True)
+        print(f"({response.agent_name}, tools: {response.metadata.get('tool_calls', [])})")
         # Note: In a real implementation, the LLM might return a tool call request.
         # The current BaseLLM.generate implementation in gentis_ai returns a string.
         # For Gemini/Ollama clients, if they execute tools automatically, the final response will be text.
@@ -1,7 +1,13 @@
-from .types import Expert, Message, TurnResponse
+from .types import Expert, Message, TurnResponse, WarmupReport, GenerationConfig
 from .router import Router
 from .session import Flow
-from .memory import PNNet
-from .llm import BaseLLM, GeminiLLM, MockLLM
+from .memory import PNNet, RetrievalMemory
+from .history import ConversationHistory
+from .journal import SessionJournal
+from .batch import BatchReport
+from .tools import cached_tool, ToolCache
+from .tracing import Tracer
+from .context import CancelToken
+from .llm import BaseLLM, GeminiLLM, MockLLM, ModelRegistry
 
-__all__ = ["Expert", "Message", "TurnResponse", "Router", "Flow", "PNNet", "BaseLLM", "GeminiLLM", "MockLLM"]
+__all__ = ["Expert", "Message", "TurnResponse", "WarmupReport", "GenerationConfig", "Router", "Flow", "PNNet", "RetrievalMemory", "ConversationHistory", "SessionJournal", "BatchReport", "cached_tool", "ToolCache", "Tracer", "CancelToken", "BaseLLM", "GeminiLLM", "MockLLM", "ModelRegistry"]
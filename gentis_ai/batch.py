@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import threading
+import concurrent.futures
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Union, Callable, TYPE_CHECKING
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    from .session import Flow
+
+
+class BatchReport(BaseModel):
+    """
+    Aggregate statistics for a batch run.
+    """
+    conversations: int = 0
+    turns: int = 0
+    errors: int = 0
+    skipped: int = 0 # Conversations already present in the checkpoint
+    duplicates: int = 0 # Conversations skipped because an earlier one in the input has the same id
+    elapsed_seconds: float = 0.0
+    turns_per_second: float = 0.0
+    conversations_per_second: float = 0.0
+    token_usage: Dict[str, int] = Field(default_factory=lambda: {"total": 0})
+
+
+def read_conversations(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily reads conversations from a JSONL file.
+    Each line is an object like {"id": "conv-1", "turns": ["hi", "I want to buy", ...]}.
+    Turns may also be objects with a "content" field.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "id" not in record:
+                record["id"] = f"line-{line_no}"
+            yield record
+
+
+def load_checkpoint(output_path: str) -> set:
+    """
+    Returns the ids of conversations that completed successfully in a previous run.
+    The output file doubles as the checkpoint: one line is appended per finished conversation.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from an interrupted run, it will be reprocessed
+                continue
+            if not record.get("error"):
+                done.add(str(record.get("id")))
+    return done
+
+
+class BatchRunner:
+    """
+    Replays many independent conversations through a Flow.
+    Conversations run concurrently (bounded by `concurrency`), turns within a conversation run in order.
+    """
+    def __init__(self, flow: "Flow", concurrency: int = 4, output_path: Optional[str] = None, resume: bool = True, keep_sessions: bool = False):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.flow = flow
+        self.concurrency = concurrency
+        self.output_path = output_path
+        self.resume = resume
+        self.keep_sessions = keep_sessions
+        self.report = BatchReport()
+        self._lock = threading.Lock()
+
+    def _turns(self, conversation: Dict[str, Any]) -> List[str]:
+        turns = conversation.get("turns") or []
+        return [t["content"] if isinstance(t, dict) else str(t) for t in turns]
+
+    def _run_conversation(self, conversation: Dict[str, Any]) -> Dict[str, Any]:
+        conversation_id = str(conversation["id"])
+        results = []
+        error = None
+        try:
+            for message in self._turns(conversation):
+                response = self.flow.process_turn(message, user_id=conversation_id)
+                results.append(response.model_dump())
+                if response.error:
+                    # The turn got a fallback answer: the rest would replay a different conversation
+                    error = response.error
+                    break
+        except Exception as e:
+            error = str(e)
+        finally:
+            if not self.keep_sessions:
+                self.flow._drop_session(conversation_id)
+        return {"id": conversation_id, "turns": results, "error": error}
+
+    def _record(self, result: Dict[str, Any], out) -> None:
+        with self._lock:
+            if out is not None:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            self.report.conversations += 1
+            self.report.turns += len(result["turns"])
+            if result["error"]:
+                self.report.errors += 1
+            for turn in result["turns"]:
+                for key, value in (turn.get("token_usage") or {}).items():
+                    self.report.token_usage[key] = self.report.token_usage.get(key, 0) + value
+
+    def run(self, conversations: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Processes conversations and yields one result per conversation as it completes.
+        Completion order is not input order; use the "id" field to match results.
+        A conversation whose turn fails is reported with "error" set (and retried on resume);
+        a conversation reusing an earlier one's id is skipped.
+        """
+        done = load_checkpoint(self.output_path) if (self.output_path and self.resume) else set()
+        out = open(self.output_path, "a", encoding="utf-8") if self.output_path else None
+        start = time.perf_counter()
+        # Keep a small window of submitted work so huge corpora are never fully loaded in memory
+        max_pending = self.concurrency * 2
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                pending = set()
+                seen = set()
+                for position, conversation in enumerate(conversations, 1):
+                    if "id" not in conversation:
+                        # Same fallback as read_conversations (position in the input), without mutating the caller's dict
+                        conversation = dict(conversation, id=f"item-{position}")
+                    conversation_id = str(conversation["id"])
+                    if conversation_id in done:
+                        self.report.skipped += 1
+                        continue
+                    if conversation_id in seen:
+                        # It would share (and mix) the session of the earlier one, which may still be running
+                        self.report.duplicates += 1
+                        continue
+                    seen.add(conversation_id)
+                    pending.add(executor.submit(self._run_conversation, conversation))
+                    if len(pending) >= max_pending:
+                        finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in finished:
+                            result = future.result()
+                            self._record(result, out)
+                            yield result
+                for future in concurrent.futures.as_completed(pending):
+                    result = future.result()
+                    self._record(result, out)
+                    yield result
+        finally:
+            if out is not None:
+                out.close()
+            elapsed = time.perf_counter() - start
+            self.report.elapsed_seconds = elapsed
+            if elapsed > 0:
+                self.report.turns_per_second = self.report.turns / elapsed
+                self.report.conversations_per_second = self.report.conversations / elapsed
+
+
+def process_batch(flow: "Flow", conversations: Union[str, Iterable[Dict[str, Any]]], output_path: Optional[str] = None, concurrency: int = 4, resume: bool = True, keep_sessions: bool = False, on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> BatchReport:
+    """
+    Runs a whole batch and returns the aggregate report.
+    `conversations` is either a path to a JSONL file or an iterable of conversation dicts.
+    """
+    if isinstance(conversations, str):
+        conversations = read_conversations(conversations)
+    runner = BatchRunner(flow, concurrency=concurrency, output_path=output_path, resume=resume, keep_sessions=keep_sessions)
+    for result in runner.run(conversations):
+        if on_result:
+            on_result(result)
+    return runner.report
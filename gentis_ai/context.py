@@ -0,0 +1,138 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Iterator, Optional
+
+
+class Priority(IntEnum):
+    """
+    Scheduling priority of a provider call (lower goes first when calls queue behind a rate limit).
+    """
+    ROUTING = 0 # The turn can't start before the router answers
+    INTERACTIVE = 1 # Expert answers and synthesis, a user is waiting
+    BACKGROUND = 2 # Summarization and other work nobody is waiting on
+
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("gentis_priority", default=Priority.INTERACTIVE)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: Priority) -> Iterator[None]:
+    """Sets the priority of the provider calls made inside the block (and in tasks copying this context)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+_session_key: contextvars.ContextVar = contextvars.ContextVar("gentis_session_key", default=None)
+
+
+def current_session_key() -> Optional[str]:
+    return _session_key.get()
+
+
+@contextmanager
+def session_key(key: Optional[str]) -> Iterator[None]:
+    """Tags the provider calls made inside the block with the conversation they belong to (e.g. for sticky replicas)."""
+    token = _session_key.set(key)
+    try:
+        yield
+    finally:
+        _session_key.reset(token)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The deadline of the current turn passed before the call could be made."""
+
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("gentis_deadline", default=None)
+
+
+def current_deadline() -> Optional[float]:
+    """Deadline of the current turn as a time.monotonic() value (None = no deadline)."""
+    return _deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the deadline (negative once it passed, None = no deadline)."""
+    deadline = _deadline.get()
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+def check_deadline() -> Optional[float]:
+    """Returns the seconds left (None = no deadline). Raises DeadlineExceeded once the deadline passed."""
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("The turn's deadline passed")
+    return remaining
+
+
+@contextmanager
+def deadline_after(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Gives the work inside the block `seconds` to complete (None = no limit).
+    Nested deadlines can only shorten the enclosing one.
+    """
+    deadline = _deadline.get()
+    if seconds is not None:
+        ends_at = time.monotonic() + seconds
+        deadline = ends_at if deadline is None else min(deadline, ends_at)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class CancelToken:
+    """
+    Set by the consumer of a turn when it stops reading, e.g. a web handler whose client disconnected.
+    Provider streams started under `cancel_scope(token)` check it between chunks: once it is set they stop
+    reading and close their upstream connection, so the server stops generating tokens nobody will read.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the token is cancelled (or the timeout passes). Returns whether it was cancelled."""
+        return self._event.wait(timeout)
+
+
+_cancel_token: contextvars.ContextVar = contextvars.ContextVar("gentis_cancel_token", default=None)
+
+
+def current_cancel_token() -> Optional[CancelToken]:
+    return _cancel_token.get()
+
+
+def is_cancelled() -> bool:
+    token = _cancel_token.get()
+    return token is not None and token.cancelled
+
+
+@contextmanager
+def cancel_scope(token: Optional[CancelToken]) -> Iterator[None]:
+    """Lets `token` stop the provider streams started inside the block (and in tasks copying this context)."""
+    reset = _cancel_token.set(token)
+    try:
+        yield
+    finally:
+        _cancel_token.reset(reset)
@@ -0,0 +1,184 @@
+import os
+import json
+import zlib
+import time
+import queue
+import atexit
+import datetime
+import threading
+from typing import Dict, List, Any, Optional
+from .types import Message
+
+
+class DebugLogWriter:
+    """
+    Background writer for Flow debug traces.
+
+    Each turn is recorded as one compact JSONL line holding only what changed (new messages,
+    routing decision, resulting history length, summary if one was made). Lines are queued
+    and written in batches by a daemon thread, so the request path never touches the disk.
+    When the queue is full, records are dropped (and counted) instead of blocking the turn.
+    """
+    def __init__(self, directory: str = "debug-cache", filename: str = "debug.jsonl", max_queue: int = 10000, batch_size: int = 256, flush_interval: float = 0.5, sample_rate: float = 1.0, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5):
+        """
+        Args:
+            directory: Folder holding the log segments.
+            filename: Name of the active segment. Rotated segments get a ".1", ".2", ... suffix.
+            max_queue: Maximum number of pending records.
+            batch_size: Maximum number of records written per batch.
+            flush_interval: Seconds the writer waits for more records before writing a partial batch.
+            sample_rate: Fraction of sessions that are logged (sampling is per session, so logged sessions are complete).
+            max_bytes: Size at which the active segment is rotated.
+            backup_count: Number of rotated segments to keep.
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, filename)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.written = 0
+        self.dropped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="gentis-debug-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def is_sampled(self, user_id: Optional[str]) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        return zlib.crc32(str(user_id).encode("utf-8")) / 0xFFFFFFFF < self.sample_rate
+
+    def log_turn(self, user_id: Optional[str], record: Dict[str, Any]) -> bool:
+        """
+        Queues one turn record. Returns False if the session is not sampled or the queue is full.
+        """
+        if self._closed or not self.is_sampled(user_id):
+            return False
+        record = dict(record, session=user_id, ts=datetime.datetime.now().isoformat())
+        try:
+            self._queue.put_nowait(json.dumps(record, separators=(",", ":"), ensure_ascii=False))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _rotate(self) -> None:
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, lines: List[str]) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+                size = f.tell()
+            self.written += len(lines)
+            if size >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            print(f"Debug Log Error: {e}")
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            lines = []
+            taken = 1
+            if item is None:
+                stop = True
+            else:
+                lines.append(item)
+            # Gather a batch: whatever is queued, waiting at most flush_interval for more
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(lines) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is None:
+                    stop = True
+                else:
+                    lines.append(item)
+            if lines:
+                self._write(lines)
+            for _ in range(taken):
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Blocks until every queued record has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Writes the pending records and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+
+def load_debug_session(user_id: str, directory: str = "debug-cache", filename: str = "debug.jsonl") -> Dict[str, Any]:
+    """
+    Rebuilds the debug state of one session by replaying its turn records.
+    If older segments were rotated out, the history starts at the oldest retained turn.
+
+    Returns:
+        {"session", "current_expert", "last_updated", "history": [message dicts], "turns": [turn records]}
+    """
+    from .memory import PNNet
+
+    path = os.path.join(directory, filename)
+    rotated = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            suffix = name[len(filename) + 1:]
+            if name.startswith(filename + ".") and suffix.isdigit():
+                rotated.append((int(suffix), os.path.join(directory, name)))
+    # Highest suffix is the oldest segment, the active file is the newest
+    segments = [p for _, p in sorted(rotated, reverse=True)]
+    if os.path.exists(path):
+        segments.append(path)
+
+    history: List[Message] = []
+    turns: List[Dict[str, Any]] = []
+    state = {"session": user_id, "current_expert": None, "last_updated": None}
+    for segment in segments:
+        with open(segment, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("session") != user_id:
+                    continue
+                if record.get("sanitized"):
+                    history = PNNet.sanitize_for_switch(history)
+                for msg in record.get("messages", []):
+                    history.append(Message(role=msg["role"], content=msg["content"], metadata={"expert": msg.get("expert")}))
+                length = record.get("history_len", len(history))
+                if record.get("summary") is not None:
+                    recent = history[-(length - 1):] if length > 1 else []
+                    history = [Message(role="system", content=record["summary"])] + recent
+                elif len(history) > length:
+                    history = history[-length:] if length else []
+                state["current_expert"] = record.get("expert")
+                state["last_updated"] = record.get("ts")
+                turns.append({k: v for k, v in record.items() if k != "messages"})
+
+    state["history"] = [msg.model_dump() for msg in history]
+    state["turns"] = turns
+    return state
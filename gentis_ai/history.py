@@ -0,0 +1,153 @@
+import sys
+from typing import List, Any, Dict, Optional, Iterable, Iterator, Sequence, Union, Callable
+from .types import Message
+
+
+class HistoryRecord:
+    """
+    Compact, immutable history entry.
+    Quacks like a Message (role, content, metadata) so providers can read it directly;
+    role and expert names are interned so thousands of sessions share the same strings.
+    """
+    __slots__ = ("role", "content", "expert", "extra")
+
+    def __init__(self, role: str, content: str, expert: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.expert = sys.intern(expert) if expert else None
+        self.extra = extra or None
+
+    @classmethod
+    def from_message(cls, msg: Union[Message, "HistoryRecord"]) -> "HistoryRecord":
+        if isinstance(msg, HistoryRecord):
+            return msg
+        metadata = dict(msg.metadata or {})
+        expert = metadata.pop("expert", None)
+        return cls(msg.role, msg.content, expert, metadata)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        metadata = {"expert": self.expert} if self.expert else {}
+        if self.extra:
+            metadata.update(self.extra)
+        return metadata
+
+    def to_message(self) -> Message:
+        return Message(role=self.role, content=self.content, metadata=self.metadata)
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Same shape as Message.model_dump(), without building a Message."""
+        return {"role": self.role, "content": self.content, "metadata": self.metadata}
+
+    def __repr__(self) -> str:
+        return f"HistoryRecord(role={self.role!r}, content={self.content!r}, expert={self.expert!r})"
+
+
+class HistoryView(Sequence):
+    """
+    Read-only window over a history snapshot, optionally followed by extra pending entries
+    (e.g. the new user message). Creating one copies no records.
+    """
+    __slots__ = ("_records", "_start", "_stop", "_tail")
+
+    def __init__(self, records: List[HistoryRecord], start: int = 0, stop: Optional[int] = None, tail: Sequence[Any] = ()):
+        self._records = records
+        self._start = start
+        self._stop = len(records) if stop is None else stop
+        self._tail = tuple(tail)
+
+    def __len__(self) -> int:
+        return (self._stop - self._start) + len(self._tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("history index out of range")
+        base = self._stop - self._start
+        if index < base:
+            return self._records[self._start + index]
+        return self._tail[index - base]
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._start, self._stop):
+            yield self._records[i]
+        yield from self._tail
+
+    def __add__(self, other: Iterable[Any]) -> "HistoryView":
+        return HistoryView(self._records, self._start, self._stop, self._tail + tuple(other))
+
+    def copy(self) -> List[Any]:
+        return list(self)
+
+    def to_messages(self) -> List[Message]:
+        return [r.to_message() if isinstance(r, HistoryRecord) else r for r in self]
+
+
+class ConversationHistory(Sequence):
+    """
+    Append-only conversation history backed by a flat list of HistoryRecord.
+
+    Appends mutate the list in place; operations that drop entries (prune, switch sanitization,
+    summarization) swap in a new list instead. Views taken earlier therefore stay valid and
+    unchanged, which makes `view()` safe to hand to providers and parallel experts without copying.
+    Message objects are only built by `to_messages()`, at the API boundary.
+    """
+    __slots__ = ("_records",)
+
+    def __init__(self, records: Optional[Iterable[Union[Message, HistoryRecord]]] = None):
+        self._records: List[HistoryRecord] = [HistoryRecord.from_message(r) for r in records] if records else []
+
+    def append(self, role: str, content: str, expert: Optional[str] = None, **extra) -> HistoryRecord:
+        record = HistoryRecord(role, content, expert, extra)
+        self._records.append(record)
+        return record
+
+    def append_message(self, msg: Union[Message, HistoryRecord]) -> HistoryRecord:
+        record = HistoryRecord.from_message(msg)
+        self._records.append(record)
+        return record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._records[index])
+        return self._records[index]
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        return iter(self._records)
+
+    def view(self, extra: Iterable[Any] = ()) -> HistoryView:
+        """Immutable view of the current history followed by `extra` entries."""
+        return HistoryView(self._records, 0, len(self._records), tuple(extra))
+
+    def tail(self, n: int) -> HistoryView:
+        """Immutable view of the last n entries."""
+        size = len(self._records)
+        return HistoryView(self._records, max(0, size - n), size)
+
+    def keep_last(self, n: int) -> "ConversationHistory":
+        """Drops everything but the last n entries. Returns self."""
+        if len(self._records) > n:
+            self._records = self._records[-n:] if n > 0 else []
+        return self
+
+    def filter(self, predicate: Callable[[HistoryRecord], bool]) -> "ConversationHistory":
+        """Returns a new history holding the records that match `predicate` (records are shared)."""
+        filtered = ConversationHistory()
+        filtered._records = [r for r in self._records if predicate(r)]
+        return filtered
+
+    def copy(self) -> List[HistoryRecord]:
+        return list(self._records)
+
+    def to_messages(self) -> List[Message]:
+        return [r.to_message() for r in self._records]
+
+    def __repr__(self) -> str:
+        return f"ConversationHistory({len(self._records)} records)"
@@ -0,0 +1,162 @@
+import re
+import math
+import heapq
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Iterable, Hashable, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # Vector search falls back to plain Python
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Words too common to tell documents apart
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its me my of on or our so
+that the their them they this to was we what when where which who why will with you your
+""".split())
+
+
+def _stem(token: str) -> str:
+    # Light suffix stripping so "refunds" matches "refund" and "batteries" matches "battery"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return token[:-2]
+    for suffix in ("ing", "ed", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3 and not token.endswith("ss"):
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased, lightly stemmed word tokens without stopwords."""
+    return [_stem(token) for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Small in-memory lexical index (Okapi BM25) over short documents such as expert descriptions.
+    Postings are kept per term, so a query only scores the documents sharing a term with it.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[Hashable, int]] = {}
+        self._lengths: Dict[Hashable, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Indexes `text` under `doc_id`, replacing any previous version of the document."""
+        if doc_id in self._lengths:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        for term, count in Counter(tokens).items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        self._lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: Hashable) -> None:
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in [t for t, docs in self._postings.items() if doc_id in docs]:
+            del self._postings[term][doc_id]
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Iterable[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Returns up to `k` (doc_id, score) pairs, best first. Documents sharing no term with the query are not returned.
+        `allowed` restricts the search to a subset of the documents.
+        """
+        if not self._lengths:
+            return []
+        allowed = set(allowed) if allowed is not None else None
+        n_docs = len(self._lengths)
+        avg_length = self._total_length / n_docs or 1.0
+        scores: Dict[Hashable, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class VectorIndex:
+    """
+    In-memory cosine-similarity index over embedding vectors, with the same interface as BM25Index
+    (documents are vectors and so are queries). Searches are one matrix product with NumPy installed,
+    plain Python otherwise (fine for the few hundred documents of a session).
+    """
+    def __init__(self):
+        self._ids: List[Hashable] = []
+        self._vectors: List[List[float]] = [] # Unit length
+        self._positions: Dict[Hashable, int] = {}
+        self._matrix = None # NumPy copy of _vectors, rebuilt on the first search after a change
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._positions
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def add(self, doc_id: Hashable, vector: Sequence[float]) -> None:
+        """Indexes `vector` under `doc_id`, replacing any previous version of the document."""
+        if doc_id in self._positions:
+            self.remove(doc_id)
+        self._positions[doc_id] = len(self._ids)
+        self._ids.append(doc_id)
+        self._vectors.append(self._normalize(vector))
+        self._matrix = None
+
+    def vector(self, doc_id: Hashable) -> List[float]:
+        """The indexed (unit length) vector of a document."""
+        return self._vectors[self._positions[doc_id]]
+
+    def remove(self, doc_id: Hashable) -> None:
+        position = self._positions.pop(doc_id, None)
+        if position is None:
+            return
+        del self._ids[position]
+        del self._vectors[position]
+        for moved in self._ids[position:]:
+            self._positions[moved] -= 1
+        self._matrix = None
+
+    def search(self, query: Sequence[float], k: int = 10, allowed: Optional[Iterable[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Returns up to `k` (doc_id, cosine similarity) pairs, best first.
+        `allowed` restricts the search to a subset of the documents.
+        """
+        if not self._ids:
+            return []
+        query = self._normalize(query)
+        if np is not None:
+            if self._matrix is None:
+                self._matrix = np.asarray(self._vectors, dtype=np.float32)
+            scores = (self._matrix @ np.asarray(query, dtype=np.float32)).tolist()
+        else:
+            scores = [sum(a * b for a, b in zip(vector, query)) for vector in self._vectors]
+        allowed = set(allowed) if allowed is not None else None
+        candidates = ((doc_id, score) for doc_id, score in zip(self._ids, scores) if allowed is None or doc_id in allowed)
+        return heapq.nlargest(k, candidates, key=lambda item: item[1])
@@ -0,0 +1,510 @@
+import os
+import json
+import zlib
+import queue
+import struct
+import atexit
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Sequence
+from .history import HistoryRecord
+from .memory import PNNet
+from .utils import Colors
+from . import metrics
+
+# Frame: payload length, CRC32 of the payload, payload
+_FRAME = struct.Struct("<II")
+_TURN = 1 # One turn of one session (appended to the log)
+_SESSION = 2 # The full state of one session (in snapshots)
+_SANITIZED = 1
+_SUMMARIZED = 2
+
+_SEGMENT_PREFIX, _SEGMENT_SUFFIX = "wal-", ".log"
+_SNAPSHOT_PREFIX, _SNAPSHOT_SUFFIX = "snapshot-", ".snap"
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _str(s: Optional[str]) -> bytes:
+    # Length + 1, so 0 encodes None
+    if s is None:
+        return b"\x00"
+    data = s.encode("utf-8")
+    return _varint(len(data) + 1) + data
+
+
+def _read_str(buf: bytes, pos: int) -> Tuple[Optional[str], int]:
+    n, pos = _read_varint(buf, pos)
+    if n == 0:
+        return None, pos
+    end = pos + n - 1
+    return buf[pos:end].decode("utf-8"), end
+
+
+def _messages(records: Sequence[Any]) -> bytes:
+    parts = [_varint(len(records))]
+    for r in records:
+        extra = getattr(r, "extra", None)
+        parts += [_str(r.role), _str(getattr(r, "expert", None)), _str(r.content), _str(json.dumps(extra, ensure_ascii=False) if extra else None)]
+    return b"".join(parts)
+
+
+def _read_messages(buf: bytes, pos: int) -> Tuple[List[HistoryRecord], int]:
+    count, pos = _read_varint(buf, pos)
+    records = []
+    for _ in range(count):
+        role, pos = _read_str(buf, pos)
+        expert, pos = _read_str(buf, pos)
+        content, pos = _read_str(buf, pos)
+        extra, pos = _read_str(buf, pos)
+        records.append(HistoryRecord(role, content, expert, json.loads(extra) if extra else None))
+    return records, pos
+
+
+def _frame(payload: bytes) -> bytes:
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_turn(user_id: Optional[str], expert: str, messages: Sequence[Any], sanitized: bool = False, history_len: int = 0, summary: Optional[str] = None) -> bytes:
+    """
+    Framed record of one turn: the messages it appended, the expert that answered, and how the
+    history was reshaped (switch sanitization before the append, pruning / summary replacement after).
+    """
+    flags = (_SANITIZED if sanitized else 0) | (_SUMMARIZED if summary is not None else 0)
+    payload = bytes((_TURN,)) + _str(user_id) + _str(expert) + bytes((flags,)) + _varint(history_len)
+    if summary is not None:
+        payload += _str(summary)
+    return _frame(payload + _messages(messages))
+
+
+def _encode_session(user_id: Optional[str], state: Dict[str, Any]) -> bytes:
+    return _frame(bytes((_SESSION,)) + _str(user_id) + _str(state["current_expert"]) + _messages(state["history"]))
+
+
+def _apply(state: Optional[Dict[str, Any]], payload: bytes) -> Dict[str, Any]:
+    """Replays one record (turn or snapshot entry) on a session state."""
+    kind = payload[0]
+    _, pos = _read_str(payload, 1)
+    expert, pos = _read_str(payload, pos)
+    if kind == _SESSION:
+        history, _ = _read_messages(payload, pos)
+        return {"current_expert": expert, "history": history}
+
+    history = state["history"] if state is not None else []
+    flags = payload[pos]
+    history_len, pos = _read_varint(payload, pos + 1)
+    summary = None
+    if flags & _SUMMARIZED:
+        summary, pos = _read_str(payload, pos)
+    messages, _ = _read_messages(payload, pos)
+    # Same steps as Flow.process_turn
+    if flags & _SANITIZED:
+        history = [r for r in history if PNNet._keep_on_switch(r)]
+    history = history + messages
+    if summary is not None:
+        recent = history[-(history_len - 1):] if history_len > 1 else []
+        history = [HistoryRecord("system", summary)] + recent
+    elif len(history) > history_len:
+        history = history[-history_len:] if history_len else []
+    return {"current_expert": expert, "history": history}
+
+
+def _frame_end(data: bytes, pos: int) -> int:
+    """End offset of the record starting at `pos` if it is complete and intact, else -1."""
+    if pos + _FRAME.size >= len(data):
+        return -1
+    length, crc = _FRAME.unpack_from(data, pos)
+    end = pos + _FRAME.size + length
+    if length == 0 or end > len(data) or data[pos + _FRAME.size] not in (_TURN, _SESSION) or zlib.crc32(data[pos + _FRAME.size:end]) != crc:
+        return -1
+    return end
+
+
+def _scan_frames(data: bytes) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Splits a file into its intact records and the damaged ranges between them, as (start, end) offsets.
+    After a damaged record the scan resumes at the next intact one; damage with no intact record
+    after it is a torn tail (an interrupted append) and is not reported as a range.
+    """
+    records: List[Tuple[int, int]] = []
+    damaged: List[Tuple[int, int]] = []
+    pos = 0
+    while pos < len(data):
+        end = _frame_end(data, pos)
+        if end >= 0:
+            records.append((pos, end))
+            pos = end
+            continue
+        resume = next((p for p in range(pos + 1, len(data) - _FRAME.size) if _frame_end(data, p) >= 0), None)
+        if resume is None:
+            break
+        damaged.append((pos, resume))
+        pos = resume
+    return records, damaged
+
+
+def _read_frames(path: str) -> Iterator[Tuple[int, bytes]]:
+    """Yields (offset, payload) of the intact records of a file (damaged ones are skipped)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    for start, end in _scan_frames(data)[0]:
+        yield start, data[start + _FRAME.size:end]
+
+
+class _Pending:
+    __slots__ = ("data", "key", "done", "error")
+
+    def __init__(self, data: bytes, key: Any, wait: bool):
+        self.data = data
+        self.key = key
+        self.done = threading.Event() if wait else None
+        self.error: Optional[BaseException] = None
+
+
+class SessionJournal:
+    """
+    Crash-safe persistence of Flow sessions (`Flow(journal=SessionJournal("sessions/"))`).
+
+    Each turn appends one compact binary record (new messages, answering expert, switch sanitization,
+    pruning / summary replacement) to a segmented write-ahead log; nothing already written is rewritten.
+    A background thread writes the records queued by concurrent turns together, with one fsync per
+    batch (group commit), and a turn returns once its record is durable.
+    Sealed segments are periodically folded into a snapshot holding each session's state.
+
+    Opening the journal only scans the snapshot and segments to index each session's records
+    (and cuts a torn tail left by a crash); a session is decoded when it is first used (`load`),
+    or all at once with `load_all`.
+    """
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024, sync: bool = True, fsync: bool = True, max_batch: int = 1024, compact_segments: int = 4):
+        """
+        Args:
+            directory: Folder holding the log segments and snapshots.
+            segment_bytes: Size at which the active segment is sealed and a new one started.
+            sync: Wait until a turn's record is written (and fsynced) before the turn returns.
+                  False returns immediately; a crash may then lose the last turns.
+            fsync: Flush each batch to disk (False leaves it to the OS: survives a process crash, not a power loss).
+            max_batch: Maximum number of records written per batch.
+            compact_segments: Fold the sealed segments into a new snapshot once there are this many (0 = only on compact()).
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self.fsync = fsync
+        self.max_batch = max_batch
+        self.compact_segments = compact_segments
+        self.bytes_written = 0
+        self.records_written = 0
+        self.batches_written = 0
+        self.damaged_ranges = 0 # Found in the middle of files on open (copied to <file>.corrupt)
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock() # Guards the index and the file set
+        self._compact_lock = threading.Lock()
+        # Session -> locations of its records, in order: (path, offset, length)
+        self._index: Dict[Optional[str], List[Tuple[str, int, int]]] = {}
+        self._snapshot: Optional[str] = None
+        self._snapshot_segment = 0 # Last segment folded into the snapshot
+        self._segments: List[str] = []
+        self._scan()
+
+        self._segment_no = self._number(self._segments[-1]) + 1 if self._segments else self._snapshot_segment + 1
+        self._file = None
+        self._open_segment()
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._closed = False
+        self._failed: Optional[BaseException] = None # Set if the writer can't continue (e.g. no new segment can be created)
+        self._compactor: Optional[threading.Thread] = None
+        self._thread = threading.Thread(target=self._run, name="gentis-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Files ---
+
+    @staticmethod
+    def _number(path: str) -> int:
+        name = os.path.basename(path)
+        return int(name.split("-", 1)[1].split(".", 1)[0])
+
+    def _files(self, prefix: str, suffix: str) -> List[str]:
+        names = [n for n in os.listdir(self.directory) if n.startswith(prefix) and n.endswith(suffix) and n[len(prefix):-len(suffix)].isdigit()]
+        return sorted((os.path.join(self.directory, n) for n in names), key=self._number)
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{number:08d}{_SEGMENT_SUFFIX}")
+
+    def _open_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = self._segment_path(self._segment_no)
+        # Unbuffered: a failed write leaves nothing behind in a buffer that a later flush would append
+        self._file = open(path, "ab", buffering=0)
+        with self._lock:
+            self._segments.append(path)
+
+    def _index_file(self, path: str) -> int:
+        """
+        Indexes the intact records of a file and quarantines damaged ones found in its middle.
+        Returns the end offset of its last intact record.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        records, damaged = _scan_frames(data)
+        for start, end in records:
+            key, _ = _read_str(data, start + _FRAME.size + 1)
+            self._index.setdefault(key, []).append((path, start, end - start))
+        if damaged:
+            # Kept for inspection: the file itself is left as is, its intact records are still used
+            with open(path + ".corrupt", "wb") as f:
+                for start, end in damaged:
+                    f.write(data[start:end])
+            self.damaged_ranges += len(damaged)
+            ranges = ", ".join(f"{start}-{end}" for start, end in damaged)
+            print(f"{Colors.YELLOW}Journal: damaged records in {os.path.basename(path)} (bytes {ranges}) were skipped and copied to {os.path.basename(path)}.corrupt{Colors.ENDC}")
+        return records[-1][1] if records else 0
+
+    def _scan(self) -> None:
+        snapshots = self._files(_SNAPSHOT_PREFIX, _SNAPSHOT_SUFFIX)
+        if snapshots:
+            self._snapshot = snapshots[-1]
+            self._snapshot_segment = self._number(self._snapshot)
+            self._index_file(self._snapshot)
+            for stale in snapshots[:-1]:
+                os.remove(stale)
+        for path in self._files(_SEGMENT_PREFIX, _SEGMENT_SUFFIX):
+            if self._number(path) <= self._snapshot_segment:
+                os.remove(path) # Already in the snapshot (a compaction stopped before deleting it)
+                continue
+            end = self._index_file(path)
+            if end < os.path.getsize(path):
+                # Torn tail of an interrupted write (nothing intact follows it): never acknowledged, so it is dropped
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+            self._segments.append(path)
+
+    # --- Writing ---
+
+    def record_turn(self, user_id: Optional[str], expert: str, messages: Sequence[Any], sanitized: bool = False, history_len: int = 0, summary: Optional[str] = None) -> None:
+        """
+        Appends one turn of a session. With sync=True, blocks until the record is durable.
+        Raises the write error if the record could not be written, and RuntimeError once a write error
+        has stopped the journal.
+        """
+        if self._closed:
+            raise RuntimeError("The journal is closed")
+        if self._failed is not None:
+            raise RuntimeError(f"The journal stopped after a write error: {self._failed}") from self._failed
+        pending = _Pending(encode_turn(user_id, expert, messages, sanitized, history_len, summary), user_id, self.sync)
+        self._queue.put(pending)
+        if pending.done is not None:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+
+    def _write(self, batch: List[_Pending]) -> None:
+        batch = [p for p in batch if p.data] # flush() markers carry no data
+        if not batch:
+            return
+        path = self._segments[-1]
+        offset = self._file.tell()
+        try:
+            view = memoryview(b"".join(p.data for p in batch))
+            while view:
+                view = view[self._file.write(view):]
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except Exception as e:
+            for p in batch:
+                p.error = e
+            print(f"{Colors.RED}Journal write error: {e}{Colors.ENDC}")
+            self._rollback(offset)
+            return
+        with self._lock:
+            for p in batch:
+                self._index.setdefault(p.key, []).append((path, offset, len(p.data)))
+                offset += len(p.data)
+        size = sum(len(p.data) for p in batch)
+        self.bytes_written += size
+        self.records_written += len(batch)
+        self.batches_written += 1
+        metrics.JOURNAL_BYTES.inc(size)
+        metrics.JOURNAL_BATCH_SIZE.observe(len(batch))
+
+    def _rollback(self, offset: int) -> None:
+        """Cuts a partly written batch, so the next batch starts on a record boundary."""
+        try:
+            self._file.seek(offset)
+            self._file.truncate()
+        except OSError as e:
+            # The segment can't be cut: continue in a new one (this tail is dropped as torn on the next open)
+            print(f"{Colors.RED}Journal: could not roll back a failed write ({e}), starting a new segment{Colors.ENDC}")
+            self._segment_no += 1
+            self._open_segment()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch = []
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            # Group commit: whatever queued up while the previous batch was being synced goes in this one
+            while not stop and len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            try:
+                if self._failed is not None:
+                    raise self._failed
+                if batch:
+                    self._write(batch)
+                # Rotated before the turns are released, so a segment is sealed once its writers return
+                if self._file.tell() >= self.segment_bytes:
+                    self._segment_no += 1
+                    self._open_segment()
+                    self._maybe_compact()
+            except Exception as e:
+                # No segment to write to: fail this batch and every later turn instead of stopping the thread
+                if self._failed is None:
+                    print(f"{Colors.RED}Journal stopped: {e}{Colors.ENDC}")
+                self._failed = e
+                for p in batch:
+                    if p.error is None:
+                        p.error = e
+            finally:
+                for p in batch:
+                    if p.done is not None:
+                        p.done.set()
+
+    # --- Compaction ---
+
+    def _maybe_compact(self) -> None:
+        sealed = len(self._segments) - 1
+        if self.compact_segments and sealed >= self.compact_segments and (self._compactor is None or not self._compactor.is_alive()):
+            self._compactor = threading.Thread(target=self.compact, name="gentis-journal-compaction", daemon=True)
+            self._compactor.start()
+
+    def compact(self) -> None:
+        """
+        Folds the snapshot and the sealed segments into a new snapshot, then deletes them.
+        Turns keep being written to the active segment meanwhile.
+        """
+        with self._compact_lock:
+            with self._lock:
+                sealed = self._segments[:-1]
+                previous = self._snapshot
+            if not sealed:
+                return
+            states: Dict[Optional[str], Dict[str, Any]] = {}
+            for path in ([previous] if previous else []) + sealed:
+                for _, payload in _read_frames(path):
+                    key, _ = _read_str(payload, 1)
+                    states[key] = _apply(states.get(key), payload)
+
+            last = self._number(sealed[-1])
+            path = os.path.join(self.directory, f"{_SNAPSHOT_PREFIX}{last:08d}{_SNAPSHOT_SUFFIX}")
+            locations: Dict[Optional[str], Tuple[str, int, int]] = {}
+            with open(path + ".tmp", "wb") as f:
+                for key, state in states.items():
+                    data = _encode_session(key, state)
+                    locations[key] = (path, f.tell(), len(data))
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+
+            folded = set(sealed) | ({previous} if previous else set())
+            with self._lock:
+                for key in set(self._index) | set(locations):
+                    remaining = [loc for loc in self._index.get(key, []) if loc[0] not in folded]
+                    self._index[key] = ([locations[key]] if key in locations else []) + remaining
+                self._snapshot = path
+                self._snapshot_segment = last
+                self._segments = [s for s in self._segments if s not in folded]
+                # Deleted under the lock so no load() is reading them
+                for old in folded:
+                    os.remove(old)
+            metrics.JOURNAL_COMPACTIONS.inc()
+
+    # --- Reading ---
+
+    def __contains__(self, user_id: Optional[str]) -> bool:
+        with self._lock:
+            return user_id in self._index
+
+    def sessions(self) -> List[Optional[str]]:
+        """Ids of the sessions in the journal."""
+        with self._lock:
+            return list(self._index)
+
+    def load(self, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Rebuilds one session by replaying its records.
+        Returns {"current_expert": str, "history": [HistoryRecord]} or None if the session is unknown.
+        """
+        with self._lock:
+            locations = list(self._index.get(user_id, ()))
+            chunks = []
+            for path, offset, length in locations:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    chunks.append(f.read(length))
+        state = None
+        for chunk in chunks:
+            state = _apply(state, chunk[_FRAME.size:])
+        return state
+
+    def load_all(self) -> Dict[Optional[str], Dict[str, Any]]:
+        """Rebuilds every session (reading each file once)."""
+        with self._lock:
+            files = ([self._snapshot] if self._snapshot else []) + list(self._segments)
+            states: Dict[Optional[str], Dict[str, Any]] = {}
+            for path in files:
+                for _, payload in _read_frames(path):
+                    key, _ = _read_str(payload, 1)
+                    states[key] = _apply(states.get(key), payload)
+        return states
+
+    # --- Lifecycle ---
+
+    def flush(self) -> None:
+        """Blocks until every queued record is written. Raises the error that stopped the writer, if any."""
+        marker = _Pending(b"", None, True)
+        self._queue.put(marker) # Set once the writer has reached it
+        marker.done.wait()
+        if marker.error is not None:
+            raise marker.error
+
+    def close(self) -> None:
+        """Writes the pending records and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        self._file.close()
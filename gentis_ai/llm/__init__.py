@@ -3,5 +3,10 @@ from .gemini import GeminiLLM
 from .vllm import VLLMLLM
 from .ollama import OllamaLLM
 from .mock import MockLLM
+from .registry import ModelRegistry
+from .ratelimit import RateLimiter, RateLimitedLLM, RateLimitTimeout
+from .pool import ReplicaPool
+from .scheduling import ModelAffinityScheduler
+from .resilient import ResilientLLM, CircuitBreaker, ProviderTimeout, AllProvidersFailed
 
-__all__ = ["BaseLLM", "GeminiLLM", "VLLMLLM", "OllamaLLM", "MockLLM"]
+__all__ = ["BaseLLM", "GeminiLLM", "VLLMLLM", "OllamaLLM", "MockLLM", "ModelRegistry", "RateLimiter", "RateLimitedLLM", "RateLimitTimeout", "ResilientLLM", "CircuitBreaker", "ProviderTimeout", "AllProvidersFailed", "ReplicaPool", "ModelAffinityScheduler"]
@@ -1,12 +1,73 @@
+import time
+import threading
 from abc import ABC, abstractmethod
 from typing import List, Optional, Any, Dict, Generator, Union
 from ..types import Message
+from .. import metrics
 
 class BaseLLM(ABC):
     """
     Abstract Base Class for LLM providers.
     """
-    
+
+    def _thread_state(self) -> threading.local:
+        """
+        Per-thread state of the provider.
+        Kept per thread so concurrent sessions sharing one provider don't read each other's call details.
+        """
+        return self.__dict__.get("_call_state") or self.__dict__.setdefault("_call_state", threading.local())
+
+    @property
+    def _last_usage(self) -> Dict[str, int]:
+        state = self._thread_state()
+        usage = getattr(state, "usage", None)
+        if usage is None:
+            usage = state.usage = {"total": 0}
+        return usage
+
+    @_last_usage.setter
+    def _last_usage(self, value: Dict[str, int]):
+        self._thread_state().usage = value
+
+    @property
+    def _last_tool_calls(self) -> List[Dict[str, Any]]:
+        state = self._thread_state()
+        calls = getattr(state, "tool_calls", None)
+        if calls is None:
+            calls = state.tool_calls = []
+        return calls
+
+    @_last_tool_calls.setter
+    def _last_tool_calls(self, value: List[Dict[str, Any]]):
+        self._thread_state().tool_calls = value
+
+    def _record_call(self, started_at: float, status: str = "ok", model: Optional[str] = None) -> None:
+        """
+        Records latency, outcome and tokens of a provider call in the metrics registry.
+        Streaming providers call it once the stream is exhausted (status "cancelled" if its consumer went away).
+        """
+        provider = type(self).__name__
+        model = model or getattr(self, "model_name", "")
+        metrics.LLM_REQUESTS.inc(provider=provider, model=model, status=status)
+        metrics.LLM_DURATION.observe(time.perf_counter() - started_at, provider=provider, model=model)
+        if status != "error":
+            metrics.LLM_TOKENS.inc(self._last_usage.get("total", 0), provider=provider, model=model)
+
+    @staticmethod
+    def _choices_schema(choices: List[str], multiple: bool = False) -> Dict[str, Any]:
+        """JSON schema of an output restricted to `choices` (a non-empty list of them if `multiple`)."""
+        schema = {"type": "string", "enum": list(choices)}
+        if multiple:
+            return {"type": "array", "items": schema, "minItems": 1}
+        return schema
+
+    def get_tool_calls(self) -> List[Dict[str, Any]]:
+        """
+        Returns the tools executed during the last call (name, latency_ms, error).
+        Providers that let the SDK run tools internally return an empty list.
+        """
+        return list(self._last_tool_calls)
+
     @abstractmethod
     def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, **kwargs) -> Union[str, Generator[str, None, None]]:
         """
@@ -18,12 +79,23 @@ class BaseLLM(ABC):
             tools: Optional list of tools/functions.
             stream: Whether to stream the response.
             **kwargs: Additional model-specific parameters (e.g., temperature).
+                      `model` overrides the provider's model_name for this call (None keeps the default).
+                      Constrained calls (e.g. routing) may also pass `max_tokens`, `stop` (list of stop sequences),
+                      `choices` (the only allowed outputs) and `multiple_choices` (output a JSON list of choices);
+                      providers map them to their native options or ignore what they can't enforce.
             
         Returns:
             The string response content, or a generator if stream=True.
         """
         pass
 
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        """
+        Opens the provider's connection and loads `models` (default: the provider's model) ahead of the first call.
+        Returns the seconds spent per model. Providers with nothing to prepare return {}.
+        """
+        return {}
+
     @abstractmethod
     def get_token_usage(self) -> Dict[str, int]:
         """
@@ -1,8 +1,12 @@
 from typing import List, Any, Dict, Optional, Union, Generator
 from ..types import Message
 from .base import BaseLLM
+from ..context import check_deadline, current_cancel_token
+from ..streaming import close_stream
 from ..utils import Colors
+from ..tools import execute_tool_calls, tool_name
 import os
+import time
 try:
     from google import genai
     from google.genai import types
@@ -11,7 +15,7 @@ except ImportError:
     types = None
 
 class GeminiLLM(BaseLLM):
-    def __init__(self, api_key: Optional[str] = None, model_name: str = "gemini-2.0-flash-lite"):
+    def __init__(self, api_key: Optional[str] = None, model_name: str = "gemini-2.0-flash-lite", max_tool_iterations: int = 5):
         if not genai:
             raise ImportError("google-genai package is required for GeminiLLM")
         #  lets check if its already an env var 
@@ -20,9 +24,11 @@ class GeminiLLM(BaseLLM):
             raise ValueError("API key is required. Provide it directly or set GOOGLE_API_KEY in the environment. \nIf you don't have one, create one for free at https://aistudio.google.com/api-keys/")
         self.client = genai.Client(api_key=resolved_api_key)
         self.model_name = model_name
+        self.max_tool_iterations = max_tool_iterations
         self._last_usage = {"total": 0}
 
-    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, **kwargs) -> Union[str, Generator[str, None, None]]:
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, model: Optional[str] = None, **kwargs) -> Union[str, Generator[str, None, None]]:
+        model = model or self.model_name
         genai_history = []
         
         # Handle System Prompt
@@ -47,13 +53,39 @@ class GeminiLLM(BaseLLM):
             ))
 
         # Configure Tools
-        tool_config = None
+        # When streaming, the tool loop is run here so text chunks can be forwarded as they arrive
+        config_kwargs = {}
         if tools:
-            tool_config = types.GenerateContentConfig(
-                tools=tools,
-                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=False)
-            )
+            config_kwargs["tools"] = tools
+            config_kwargs["automatic_function_calling"] = types.AutomaticFunctionCallingConfig(disable=stream)
+
+        # Sampling settings (see GenerationConfig)
+        for name in ("temperature", "top_p", "top_k", "seed"):
+            if kwargs.get(name) is not None:
+                config_kwargs[name] = kwargs[name]
 
+        # Output constraints: token cap, stop sequences and native enum / JSON schema decoding
+        if kwargs.get("max_tokens"):
+            config_kwargs["max_output_tokens"] = kwargs["max_tokens"]
+        if kwargs.get("stop"):
+            config_kwargs["stop_sequences"] = kwargs["stop"]
+        if kwargs.get("choices"):
+            enum_schema = {"type": "STRING", "enum": list(kwargs["choices"])}
+            if kwargs.get("multiple_choices"):
+                config_kwargs["response_mime_type"] = "application/json"
+                config_kwargs["response_schema"] = {"type": "ARRAY", "items": enum_schema}
+            else:
+                config_kwargs["response_mime_type"] = "text/x.enum"
+                config_kwargs["response_schema"] = enum_schema
+            # The schema already bounds the output, and a stop sequence could cut the JSON list
+            config_kwargs.pop("stop_sequences", None)
+        # The turn's deadline bounds the HTTP request
+        remaining = check_deadline()
+        if remaining is not None:
+            config_kwargs["http_options"] = types.HttpOptions(timeout=max(1, int(remaining * 1000)))
+        tool_config = types.GenerateContentConfig(**config_kwargs) if config_kwargs else None
+
+        started_at = time.perf_counter()
         try:
             # We use chats.create to maintain some semblance of session if needed, 
             # but here we are stateless per call, reconstructing history.
@@ -74,33 +106,107 @@ class GeminiLLM(BaseLLM):
             last_message_content = genai_history[-1].parts[0].text
 
             chat = self.client.chats.create(
-                model=self.model_name,
+                model=model,
                 history=history_content,
                 config=tool_config
             )
             
-            if stream and not tools:
-                response_stream = chat.send_message_stream(last_message_content)
-                def generator():
-                    full_text = ""
-                    for chunk in response_stream:
-                        text = chunk.text
-                        full_text += text
-                        yield text
-                    if response_stream.usage_metadata:
-                         self._last_usage["total"] = response_stream.usage_metadata.total_token_count
-                return generator()
+            if stream:
+                tool_map = {tool_name(t): t for t in (tools or []) if callable(t)}
+                return self._stream_with_tools(chat, last_message_content, tool_map, started_at, model)
 
+            self._last_tool_calls = []
             response = chat.send_message(last_message_content)
             
             if response.usage_metadata:
                 self._last_usage["total"] = response.usage_metadata.total_token_count
+            self._record_call(started_at, model=model)
                 
             return getattr(response, "text", "") or ""
 
         except Exception as e:
+            self._record_call(started_at, "error", model)
             raise e
 
+    @staticmethod
+    def _split_chunk(chunk) -> tuple:
+        """Returns the text and the function calls carried by a streamed chunk."""
+        text = ""
+        calls = []
+        candidates = getattr(chunk, "candidates", None) or []
+        content = candidates[0].content if candidates else None
+        for part in (content.parts if content and content.parts else []):
+            if part.function_call:
+                calls.append(part.function_call)
+            elif part.text and not getattr(part, "thought", False):
+                text += part.text
+        return text, calls
+
+    def _stream_with_tools(self, chat, message: Any, tool_map: Dict[str, Any], started_at: float, model: str) -> Generator[str, None, None]:
+        """
+        Streams the answer. Function calls found in the stream are executed, their results sent back
+        on the same chat, and the answer keeps streaming, for up to max_tool_iterations rounds.
+        """
+        self._last_tool_calls = []
+        cancel = current_cancel_token()
+        response_stream = chat.send_message_stream(message)
+
+        def generator():
+            nonlocal response_stream
+            # Kept here and published to the thread running the generator: a stream may be
+            # started in one thread (e.g. ResilientLLM's worker) and consumed in another
+            executed_tools = []
+            total_tokens = 0
+            iterations = 0
+            status = "ok"
+            try:
+                while True:
+                    function_calls = []
+                    round_tokens = 0
+                    for chunk in response_stream:
+                        text, calls = self._split_chunk(chunk)
+                        function_calls.extend(calls)
+                        # Usage is cumulative within a response: the last chunk holds the round's total
+                        if chunk.usage_metadata and chunk.usage_metadata.total_token_count:
+                            round_tokens = chunk.usage_metadata.total_token_count
+                            self._last_usage = {"total": total_tokens + round_tokens}
+                        if text:
+                            yield text
+                        if cancel is not None and cancel.cancelled:
+                            status = "cancelled"
+                            return
+
+                    total_tokens += round_tokens
+                    if not function_calls or iterations >= self.max_tool_iterations:
+                        return
+
+                    iterations += 1
+                    results = execute_tool_calls([(fc.name, fc.args) for fc in function_calls], tool_map)
+                    parts = []
+                    for result in results:
+                        executed_tools.append({"name": result["name"], "latency_ms": result["latency_ms"], "error": result["error"], "round": iterations})
+                        parts.append(types.Part.from_function_response(name=result["name"], response={"result": result["result"]}))
+                    response_stream = chat.send_message_stream(parts)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                # Also reached when the consumer closes the generator early: drop the connection
+                close_stream(response_stream)
+                self._last_tool_calls = executed_tools
+                self._record_call(started_at, status, model)
+
+        return generator()
+
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        # Fetching the model metadata opens the connection (TLS) and checks the key, without spending tokens
+        timings = {}
+        for model in models or [self.model_name]:
+            started_at = time.perf_counter()
+            self.client.models.get(model=model)
+            timings[model] = time.perf_counter() - started_at
+        return timings
+
     def get_token_usage(self) -> Dict[str, int]:
         return self._last_usage
 
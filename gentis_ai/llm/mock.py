@@ -1,4 +1,6 @@
-from typing import List, Any, Dict
+import json
+import time
+from typing import List, Any, Dict, Optional
 from ..types import Message
 from .base import BaseLLM
 
@@ -14,6 +16,7 @@ class MockLLM(BaseLLM):
         self._last_usage = {"total": 0}
 
     def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, **kwargs) -> str:
+        started_at = time.perf_counter()
         last_msg = messages[-1].content if messages else ""
         response_text = self.default_response
         
@@ -29,13 +32,22 @@ class MockLLM(BaseLLM):
                 if keyword.lower() in target_text.lower():
                     response_text = agent_name
                     break
+            # Constrained routing: answer with a JSON list, like a schema-constrained provider would
+            if kwargs.get("choices") and kwargs.get("multiple_choices"):
+                response_text = json.dumps([name.strip() for name in response_text.split(",")])
+        elif self._handoff_target(system_prompt, last_msg):
+            # 2. Fused routing: hand off when a routing rule points to another expert
+            response_text = f"<<handoff: {self._handoff_target(system_prompt, last_msg)}>>"
         else:
-            # 2. Handle Conversation Requests (Substring match)
+            # 3. Handle Conversation Requests (Substring match)
             for key, response in self.responses.items():
                 if key.lower() in last_msg.lower():
                     response_text = response
                     break
             
+        for stop in kwargs.get("stop") or []:
+            response_text = response_text.split(stop)[0]
+
         # Calculate tokens
         input_text = (system_prompt or "") + "".join([m.content for m in messages])
         input_tokens = self.count_tokens(input_text)
@@ -46,9 +58,23 @@ class MockLLM(BaseLLM):
             "completion_tokens": output_tokens,
             "total": input_tokens + output_tokens
         }
+        self._record_call(started_at, model=kwargs.get("model"))
         
         return response_text
 
+    def _handoff_target(self, system_prompt: Optional[str], user_message: str) -> Optional[str]:
+        if not system_prompt or "<<handoff:" not in system_prompt:
+            return None
+        import re
+        match = re.search(r"you are the '(.*?)' expert", system_prompt)
+        current = match.group(1) if match else None
+        others = re.findall(r"^\s*- '(.*?)':", system_prompt, re.MULTILINE)
+        for keyword, agent_name in self.routing_rules.items():
+            if keyword.lower() in user_message.lower():
+                targets = [name.strip() for name in agent_name.split(",")]
+                return agent_name if targets != [current] and all(name in others or name == current for name in targets) else None
+        return None
+
     def get_token_usage(self) -> Dict[str, int]:
         return self._last_usage
 
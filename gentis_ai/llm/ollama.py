@@ -1,7 +1,13 @@
 from typing import List, Any, Dict, Optional, Union, Generator
 from ..types import Message
 from .base import BaseLLM
+from ..tools import execute_tool_calls, tool_name
+from ..streaming import StreamBuffer, close_stream
+from .. import metrics
+from .scheduling import ModelAffinityScheduler
+from ..context import check_deadline, current_cancel_token
 import os
+import time
 
 try:
     import ollama
@@ -9,7 +15,10 @@ except ImportError:
     ollama = None
 
 class OllamaLLM(BaseLLM):
-    def __init__(self, model_name: str = "llama3", host: Optional[str] = None, **kwargs):
+    # Load times reported below this are the server touching an already loaded model
+    model_load_threshold = 0.25
+
+    def __init__(self, model_name: str = "llama3", host: Optional[str] = None, max_tool_iterations: int = 5, tool_timeout: Optional[float] = None, keep_alive: Optional[Union[str, float]] = None, model_keep_alive: Optional[Dict[str, Union[str, float]]] = None, scheduler: Optional[ModelAffinityScheduler] = None, **kwargs):
         """
         Initialize the Ollama LLM.
         
@@ -17,6 +26,12 @@ class OllamaLLM(BaseLLM):
             model_name: The name of the model to use (e.g., "llama3", "mistral").
             host: Optional host URL (e.g., "http://localhost:11434"). 
                   If not provided, uses the OLLAMA_HOST env var or default.
+            max_tool_iterations: Maximum number of tool-call rounds per generate call.
+            tool_timeout: Optional per-tool timeout in seconds.
+            keep_alive: How long the server keeps a model loaded after a call (e.g. "30m", 3600, -1 = forever).
+                        None uses the server default (5 minutes).
+            model_keep_alive: Per-model keep_alive overrides, e.g. {"granite4:micro": -1}.
+            scheduler: Shared ModelAffinityScheduler grouping calls by model to limit model swaps.
             **kwargs: Additional arguments to pass to the client or store (e.g. temperature).
         """
         if not ollama:
@@ -25,9 +40,42 @@ class OllamaLLM(BaseLLM):
         self.model_name = model_name.strip()
         self.client = ollama.Client(host=host) if host else ollama.Client()
         self.options = kwargs
+        self.max_tool_iterations = max_tool_iterations
+        self.tool_timeout = tool_timeout
+        self.keep_alive = keep_alive
+        self.model_keep_alive = dict(model_keep_alive or {})
+        self.scheduler = scheduler
         self._last_usage = {"total": 0}
 
-    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, **kwargs) -> Union[str, Generator[str, None, None]]:
+    def _keep_alive(self, model: str) -> Optional[Union[str, float]]:
+        return self.model_keep_alive.get(model, self.keep_alive)
+
+    def _record_load(self, response: Any, model: str) -> None:
+        # Ollama reports load_duration in nanoseconds on the final response
+        seconds = (response.get("load_duration") or 0) / 1e9
+        if seconds >= self.model_load_threshold:
+            metrics.MODEL_LOAD_DURATION.observe(seconds, model=model)
+
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        """
+        Loads models ahead of the first real call (an empty prompt only loads the model),
+        applying their keep_alive. Returns the seconds spent per model.
+        """
+        timings = {}
+        for model in models or [self.model_name]:
+            started_at = time.perf_counter()
+            kwargs = {}
+            if self._keep_alive(model) is not None:
+                kwargs["keep_alive"] = self._keep_alive(model)
+            response = self.client.generate(model=model, prompt="", **kwargs)
+            self._record_load(response, model)
+            timings[model] = time.perf_counter() - started_at
+            if self.scheduler:
+                self.scheduler.mark_resident(model)
+        return timings
+
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, model: Optional[str] = None, **kwargs) -> Union[str, Generator[str, None, None]]:
+        model = model or self.model_name
         ollama_messages = []
         
         if system_prompt:
@@ -36,6 +84,8 @@ class OllamaLLM(BaseLLM):
         for msg in messages:
             ollama_messages.append({"role": msg.role, "content": msg.content})
 
+        self._last_tool_calls = []
+
         # Handle tools if provided
         api_kwargs = kwargs.copy()
         # Merge options from init (like temperature)
@@ -44,77 +94,78 @@ class OllamaLLM(BaseLLM):
                 api_kwargs["options"] = {}
             api_kwargs["options"].update(self.options)
 
+        # Sampling settings go in the request options, overriding the constructor's
+        sampling = {name: api_kwargs.pop(name, None) for name in ("temperature", "top_p", "top_k", "seed")}
+        sampling = {name: value for name, value in sampling.items() if value is not None}
+        if sampling:
+            api_kwargs["options"] = dict(api_kwargs.get("options") or {}, **sampling)
+
+        # Constrained output: token cap, stop sequences and JSON schema format
+        max_tokens = api_kwargs.pop("max_tokens", None)
+        stop = api_kwargs.pop("stop", None)
+        choices = api_kwargs.pop("choices", None)
+        multiple_choices = api_kwargs.pop("multiple_choices", False)
+        if max_tokens or stop:
+            api_kwargs["options"] = dict(api_kwargs.get("options") or {})
+            if max_tokens:
+                api_kwargs["options"]["num_predict"] = max_tokens
+            if stop and not choices:
+                api_kwargs["options"]["stop"] = stop
+        if choices:
+            api_kwargs["format"] = self._choices_schema(choices, multiple=multiple_choices)
+        if "keep_alive" not in api_kwargs and self._keep_alive(model) is not None:
+            api_kwargs["keep_alive"] = self._keep_alive(model)
+
         tool_map = {}
         if tools:
             api_kwargs["tools"] = tools
             # Create a mapping of function names to callables
             for t in tools:
                 if callable(t):
-                    tool_map[t.__name__] = t
+                    tool_map[tool_name(t)] = t
 
-        try:
-            if stream and not tools: # Streaming not supported with tools yet in this simple implementation
-                response_stream = self.client.chat(
-                    model=self.model_name,
-                    messages=ollama_messages,
-                    stream=True,
-                    **api_kwargs
-                )
-                def generator():
-                    full_content = ""
-                    for chunk in response_stream:
-                        content = chunk['message']['content']
-                        full_content += content
-                        yield content
-                    
-                    # Update usage after stream completes (if available in last chunk, otherwise estimate)
-                    # Ollama stream chunks might not have usage stats until the end
-                    self._last_usage["total"] = len(full_content) // 4 # Rough estimate for stream
-
-                return generator()
+        # The Ollama client has no per-request timeout: the deadline is only checked before the call
+        # (wrap the provider in ResilientLLM to bound the call itself)
+        check_deadline()
+        if stream:
+            # The stream takes the scheduler slot when it starts and releases it when it ends
+            return self._stream_with_tools(ollama_messages, api_kwargs, tool_map, model)
 
+        if self.scheduler:
+            self.scheduler.acquire(model)
+        started_at = time.perf_counter()
+        try:
             response = self.client.chat(
-                model=self.model_name,
+                model=model,
                 messages=ollama_messages,
                 **api_kwargs
             )
             
+            self._record_load(response, model)
             # Update usage
             if "eval_count" in response and "prompt_eval_count" in response:
                 self._last_usage["total"] = response.get("prompt_eval_count", 0) + response.get("eval_count", 0)
 
-            # Check for tool calls
-            if response['message'].get('tool_calls'):
+            # Tool loop: run every requested tool (concurrently), feed the results back, repeat
+            iterations = 0
+            while response['message'].get('tool_calls') and iterations < self.max_tool_iterations:
+                iterations += 1
                 # Add the assistant's message (with tool calls) to history
                 ollama_messages.append(response['message'])
-                
-                # Execute tools
-                for tool_call in response['message']['tool_calls']:
-                    function_name = tool_call['function']['name']
-                    arguments = tool_call['function']['arguments']
-                    
-                    if function_name in tool_map:
-                        function_to_call = tool_map[function_name]
-                        try:
-                            # Call the function
-                            result = function_to_call(**arguments)
-                        except Exception as e:
-                            result = f"Error executing tool: {e}"
-                        
-                        # Add result to history
-                        ollama_messages.append({
-                            'role': 'tool',
-                            'content': str(result),
-                        })
-                    else:
-                         ollama_messages.append({
-                            'role': 'tool',
-                            'content': f"Error: Tool '{function_name}' not found.",
-                        })
-                
+
+                calls = [(tc['function']['name'], tc['function']['arguments']) for tc in response['message']['tool_calls']]
+                results = execute_tool_calls(calls, tool_map, timeout=self.tool_timeout)
+                for result in results:
+                    self._last_tool_calls.append({"name": result["name"], "latency_ms": result["latency_ms"], "error": result["error"], "round": iterations})
+                    ollama_messages.append({
+                        'role': 'tool',
+                        'content': result["result"],
+                        'tool_name': result["name"],
+                    })
+
                 # Call LLM again with tool results
                 response = self.client.chat(
-                    model=self.model_name,
+                    model=model,
                     messages=ollama_messages,
                     **api_kwargs
                 )
@@ -123,11 +174,97 @@ class OllamaLLM(BaseLLM):
                 if "eval_count" in response:
                      self._last_usage["total"] += response.get("prompt_eval_count", 0) + response.get("eval_count", 0)
 
+            self._record_call(started_at, model=model)
+            if self.scheduler:
+                self.scheduler.release(model)
             return response['message']['content']
 
         except Exception as e:
+            self._record_call(started_at, "error", model)
+            if self.scheduler:
+                self.scheduler.release(model)
             raise e
 
+    def _stream_with_tools(self, ollama_messages: List[Dict[str, Any]], api_kwargs: Dict[str, Any], tool_map: Dict[str, Any], model: str) -> Generator[str, None, None]:
+        """
+        Streams the answer. Tool calls found in the stream are executed and the answer keeps streaming
+        from the follow-up request, for up to max_tool_iterations rounds.
+        The scheduler slot and the request are only taken once the stream is iterated, so a stream
+        that is never consumed holds nothing.
+        """
+        cancel = current_cancel_token()
+
+        def generator():
+            response_stream = None
+            # Kept here and published to the thread running the generator: a stream may be
+            # started in one thread (e.g. ResilientLLM's worker) and consumed in another
+            executed_tools = []
+            total_tokens = 0
+            iterations = 0
+            status = "ok"
+            if self.scheduler:
+                self.scheduler.acquire(model)
+            started_at = time.perf_counter()
+            try:
+                response_stream = self.client.chat(
+                    model=model,
+                    messages=ollama_messages,
+                    stream=True,
+                    **api_kwargs
+                )
+                while True:
+                    round_content = StreamBuffer()
+                    tool_calls = []
+                    usage_reported = False
+                    for chunk in response_stream:
+                        content = chunk['message'].get('content') or ""
+                        if content:
+                            round_content.append(content)
+                            yield content
+                            if cancel is not None and cancel.cancelled:
+                                status = "cancelled"
+                                break
+                        if chunk['message'].get('tool_calls'):
+                            tool_calls.extend(chunk['message']['tool_calls'])
+                        # The final chunk carries the usage stats
+                        if chunk.get('done'):
+                            self._record_load(chunk, model)
+                        if chunk.get('done') and chunk.get('eval_count') is not None:
+                            total_tokens += (chunk.get('prompt_eval_count') or 0) + chunk.get('eval_count', 0)
+                            usage_reported = True
+                    if not usage_reported:
+                        total_tokens += len(round_content) // 4 # Rough estimate for stream
+                    self._last_usage = {"total": total_tokens}
+
+                    if status == "cancelled" or not tool_calls or iterations >= self.max_tool_iterations:
+                        return
+
+                    iterations += 1
+                    ollama_messages.append({'role': 'assistant', 'content': round_content.text, 'tool_calls': tool_calls})
+                    calls = [(tc['function']['name'], tc['function']['arguments']) for tc in tool_calls]
+                    for result in execute_tool_calls(calls, tool_map, timeout=self.tool_timeout):
+                        executed_tools.append({"name": result["name"], "latency_ms": result["latency_ms"], "error": result["error"], "round": iterations})
+                        ollama_messages.append({'role': 'tool', 'content': result["result"], 'tool_name': result["name"]})
+
+                    response_stream = self.client.chat(
+                        model=model,
+                        messages=ollama_messages,
+                        stream=True,
+                        **api_kwargs
+                    )
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                # Also reached when the consumer closes the generator early: drop the connection
+                close_stream(response_stream)
+                self._last_tool_calls = executed_tools
+                self._record_call(started_at, status, model)
+                if self.scheduler:
+                    self.scheduler.release(model)
+
+        return generator()
+
     def get_token_usage(self) -> Dict[str, int]:
         return self._last_usage
 
@@ -0,0 +1,243 @@
+import time
+import random
+import threading
+from collections import OrderedDict
+from typing import List, Any, Dict, Optional, Union, Generator, Callable
+from ..types import Message
+from ..context import current_session_key
+from .. import metrics
+from .base import BaseLLM
+from ..streaming import close_stream
+
+
+def ping(llm: BaseLLM) -> bool:
+    """
+    Default health check: lists the models of the replica's server
+    (OpenAI-compatible /v1/models for vLLM, /api/tags for Ollama). Providers without a client are assumed healthy.
+    """
+    client = getattr(llm, "client", None)
+    if client is None:
+        return True
+    try:
+        if hasattr(client, "models"):
+            client.models.list()
+        else:
+            client.list()
+        return True
+    except Exception:
+        return False
+
+
+class Replica:
+    """One endpoint of a ReplicaPool and its load/health bookkeeping."""
+    def __init__(self, llm: BaseLLM, name: str):
+        self.llm = llm
+        self.name = name
+        self.outstanding = 0 # Requests in flight
+        self.ewma_ms: Optional[float] = None # Smoothed latency (time to first chunk for streams)
+        self.failures = 0 # Consecutive failures
+        self.healthy = True # Result of the last health check
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "outstanding": self.outstanding,
+            "ewma_ms": self.ewma_ms,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class ReplicaPool(BaseLLM):
+    """
+    Spreads calls over several replicas of the same model (e.g. one VLLMLLM or OllamaLLM per GPU server),
+    using the load the pool itself has in flight rather than round robin.
+
+    Strategies:
+    - "least_outstanding": the replica with the fewest requests in flight (ties broken at random).
+    - "ewma": the replica with the lowest smoothed latency x (requests in flight + 1); replicas
+      without a latency sample yet are tried first.
+
+    Replicas failing `failure_threshold` calls in a row are ejected for `eject_seconds`. A background
+    health check (every `health_check_interval` seconds) takes unreachable replicas out until they
+    answer again. With `sticky=True`, a conversation stays on the replica that served it
+    (while that replica is available), so the server's prefix cache keeps its history warm.
+
+    The pool doesn't retry; wrap it in ResilientLLM for retries and fallback.
+    """
+    STRATEGIES = ("least_outstanding", "ewma")
+
+    def __init__(self, replicas: List[BaseLLM], strategy: str = "least_outstanding", sticky: bool = False, names: Optional[List[str]] = None, failure_threshold: int = 3, eject_seconds: float = 30.0, health_check: Optional[Callable[[BaseLLM], bool]] = ping, health_check_interval: Optional[float] = 10.0, ewma_alpha: float = 0.3, max_sticky_sessions: int = 10000):
+        """
+        Args:
+            replicas: Providers serving the same model, one per endpoint.
+            strategy: "least_outstanding" or "ewma".
+            sticky: Keep each session (Flow user_id) on the same replica.
+            names: Replica labels for stats and metrics (default "<provider class>-<index>").
+            failure_threshold: Consecutive failures that eject a replica.
+            eject_seconds: How long a replica is left out after failing `failure_threshold` calls in a row.
+            health_check: Returns True if a replica is reachable. None disables active checks.
+            health_check_interval: Seconds between health check rounds (None = only on check_health() calls).
+            ewma_alpha: Weight of the newest latency sample.
+            max_sticky_sessions: Session-to-replica assignments kept (least recently used are forgotten).
+        """
+        if not replicas:
+            raise ValueError("ReplicaPool needs at least one replica")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {self.STRATEGIES}")
+        names = names or [f"{type(llm).__name__}-{i}" for i, llm in enumerate(replicas)]
+        self.replicas = [Replica(llm, name) for llm, name in zip(replicas, names)]
+        self.strategy = strategy
+        self.sticky = sticky
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.health_check = health_check
+        self.ewma_alpha = ewma_alpha
+        self.max_sticky_sessions = max_sticky_sessions
+        self._assignments: "OrderedDict[str, Replica]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._checker = None
+        if health_check is not None and health_check_interval:
+            self._checker = threading.Thread(target=self._check_loop, args=(health_check_interval,), name="gentis-replica-health", daemon=True)
+            self._checker.start()
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.replicas[0].llm, "model_name", "")
+
+    def _score(self, replica: Replica) -> tuple:
+        if self.strategy == "ewma":
+            return ((replica.ewma_ms or 0.0) * (replica.outstanding + 1), random.random())
+        return (replica.outstanding, random.random())
+
+    def _select(self) -> Replica:
+        now = time.monotonic()
+        key = current_session_key() if self.sticky else None
+        with self._lock:
+            if key is not None:
+                replica = self._assignments.get(key)
+                if replica is not None and replica.available(now):
+                    self._assignments.move_to_end(key)
+                    replica.outstanding += 1
+                    return replica
+            # With every replica out, try them anyway rather than failing without a call
+            candidates = [r for r in self.replicas if r.available(now)] or self.replicas
+            replica = min(candidates, key=self._score)
+            if key is not None:
+                self._assignments[key] = replica
+                self._assignments.move_to_end(key)
+                while len(self._assignments) > self.max_sticky_sessions:
+                    self._assignments.popitem(last=False)
+            replica.outstanding += 1
+        metrics.REPLICA_OUTSTANDING.set(replica.outstanding, replica=replica.name)
+        return replica
+
+    def _release(self, replica: Replica, ok: bool, latency_ms: Optional[float] = None) -> None:
+        eject = False
+        with self._lock:
+            replica.outstanding -= 1
+            replica.requests += 1
+            if latency_ms is not None:
+                replica.ewma_ms = latency_ms if replica.ewma_ms is None else self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * replica.ewma_ms
+            if ok:
+                replica.failures = 0
+            else:
+                replica.errors += 1
+                replica.failures += 1
+                if replica.failures >= self.failure_threshold and time.monotonic() >= replica.ejected_until:
+                    replica.ejected_until = time.monotonic() + self.eject_seconds
+                    eject = True
+        metrics.REPLICA_OUTSTANDING.set(replica.outstanding, replica=replica.name)
+        if eject:
+            metrics.REPLICA_EJECTIONS.inc(replica=replica.name)
+
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, **kwargs) -> Union[str, Generator[str, None, None]]:
+        replica = self._select()
+        self._thread_state().replica = replica
+        started_at = time.perf_counter()
+        try:
+            response = replica.llm.generate(messages=messages, system_prompt=system_prompt, tools=tools, stream=stream, **kwargs)
+        except Exception:
+            self._release(replica, ok=False)
+            raise
+        if isinstance(response, str):
+            self._release(replica, ok=True, latency_ms=(time.perf_counter() - started_at) * 1000)
+            return response
+
+        def generator():
+            # The stream counts as in flight until it ends; time to first chunk is the latency sample
+            # (the rest depends on the answer length, not on the replica's load)
+            first_chunk_ms = None
+            failed = False
+            try:
+                for chunk in response:
+                    if first_chunk_ms is None:
+                        first_chunk_ms = (time.perf_counter() - started_at) * 1000
+                    yield chunk
+            except Exception:
+                failed = True
+                raise
+            finally:
+                # A stream closed early by the consumer is not the replica's fault
+                close_stream(response)
+                self._release(replica, ok=not failed, latency_ms=first_chunk_ms)
+
+        return generator()
+
+    def check_health(self) -> None:
+        """Runs one health check round: unreachable replicas are taken out, reachable ones re-admitted."""
+        for replica in self.replicas:
+            healthy = bool(self.health_check(replica.llm)) if self.health_check else True
+            with self._lock:
+                readmitted = healthy and not replica.healthy
+                replica.healthy = healthy
+                if readmitted:
+                    replica.failures = 0
+            if readmitted:
+                metrics.REPLICA_READMISSIONS.inc(replica=replica.name)
+
+    def _check_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        """Warms every replica concurrently. Keys are "<replica>/<model>"."""
+        results: Dict[str, Dict[str, float]] = {}
+
+        def warm(replica: Replica):
+            results[replica.name] = replica.llm.warmup(models)
+
+        threads = [threading.Thread(target=warm, args=(replica,)) for replica in self.replicas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {f"{name}/{model}": seconds for name, timings in results.items() for model, seconds in timings.items()}
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [replica.to_dict() for replica in self.replicas]
+
+    def _last_replica(self) -> BaseLLM:
+        replica = getattr(self._thread_state(), "replica", None)
+        return replica.llm if replica is not None else self.replicas[0].llm
+
+    def get_token_usage(self) -> Dict[str, int]:
+        return self._last_replica().get_token_usage()
+
+    def get_tool_calls(self) -> List[Dict[str, Any]]:
+        return self._last_replica().get_tool_calls()
+
+    def count_tokens(self, text: str) -> int:
+        return self.replicas[0].llm.count_tokens(text)
+
+    def close(self) -> None:
+        self._stop.set()
@@ -0,0 +1,187 @@
+import time
+import heapq
+import itertools
+import threading
+from typing import List, Any, Dict, Optional, Union, Generator
+from ..types import Message
+from ..context import Priority, current_priority, remaining_time
+from .. import metrics
+from .base import BaseLLM
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call waited longer than the limiter's max_wait for quota."""
+
+
+class RateLimiter:
+    """
+    Token buckets for requests-per-minute and tokens-per-minute, shared by every provider wrapper
+    that draws on the same quota (e.g. one API key).
+
+    Callers that find the buckets empty queue up and are admitted in priority order (then FIFO),
+    so bursts are smoothed to the quota instead of being answered with 429s. Token costs are
+    estimated up front and corrected with the real usage once the call returns.
+    """
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, max_wait: Optional[float] = None, name: str = "default"):
+        """
+        Args:
+            requests_per_minute: Request quota (None = unlimited).
+            tokens_per_minute: Token quota, prompt + completion (None = unlimited).
+            max_wait: Seconds a call may wait before RateLimitTimeout is raised (None = wait as long as needed).
+            name: Label of the limiter in metrics.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.name = name
+        # Buckets start full, so a cold start can burst up to one minute of quota
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.waited = 0 # Calls that had to queue
+        self.total_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _time_until_available(self, tokens: float) -> float:
+        wait = 0.0
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60.0 / self.tokens_per_minute)
+        return wait
+
+    def acquire(self, tokens: int = 0, priority: Optional[Priority] = None) -> float:
+        """
+        Blocks until one request and `tokens` tokens are available. Returns the seconds spent waiting.
+        """
+        priority = current_priority() if priority is None else priority
+        if self.tokens_per_minute:
+            # A single call larger than the whole bucket would never fit
+            tokens = min(tokens, self.tokens_per_minute)
+        started_at = time.monotonic()
+        deadline = started_at + self.max_wait if self.max_wait is not None else None
+        remaining = remaining_time()
+        if remaining is not None:
+            # Don't wait for quota past the turn's deadline
+            deadline = min(deadline, started_at + remaining) if deadline is not None else started_at + remaining
+        entry = (int(priority), next(self._seq))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            metrics.RATE_LIMIT_QUEUE.set(len(self._waiters), limiter=self.name)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._time_until_available(tokens)
+                    if self._waiters[0] == entry and wait <= 0:
+                        break
+                    if deadline is not None and now >= deadline:
+                        raise RateLimitTimeout(f"Rate limiter '{self.name}' could not admit the call within {deadline - started_at:.2f}s")
+                    # Only the head of the queue knows how long to sleep, the others wait to be notified
+                    timeout = wait if self._waiters[0] == entry else None
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - now) if timeout is not None else deadline - now
+                    self._cond.wait(timeout)
+                heapq.heappop(self._waiters)
+                if self.requests_per_minute:
+                    self._requests -= 1
+                if self.tokens_per_minute:
+                    self._tokens -= tokens
+            finally:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                metrics.RATE_LIMIT_QUEUE.set(len(self._waiters), limiter=self.name)
+                # The next caller in line re-evaluates the buckets
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started_at
+        self.acquired += 1
+        if waited > 0.001:
+            self.waited += 1
+            self.total_wait += waited
+        metrics.RATE_LIMIT_WAIT.observe(waited, limiter=self.name, priority=priority.name.lower() if isinstance(priority, Priority) else str(priority))
+        return waited
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Corrects the token bucket once the real usage of a call is known (it may go negative)."""
+        if not self.tokens_per_minute or not actual:
+            return
+        with self._cond:
+            self._tokens -= actual - estimated
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "total_wait_seconds": self.total_wait,
+            "queued": len(self._waiters),
+        }
+
+
+class RateLimitedLLM(BaseLLM):
+    """
+    Wraps a provider so every call first takes its share of a RateLimiter quota.
+    Several wrappers (e.g. the router's and the experts' providers) can share one limiter.
+    """
+    def __init__(self, llm: BaseLLM, limiter: Optional[RateLimiter] = None, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, max_wait: Optional[float] = None, expected_output_tokens: int = 256):
+        """
+        Args:
+            llm: The provider to protect.
+            limiter: A shared limiter. If omitted, one is created from the quota arguments.
+            expected_output_tokens: Completion tokens assumed when estimating a call (unless max_tokens is given).
+        """
+        self.llm = llm
+        self.limiter = limiter or RateLimiter(requests_per_minute, tokens_per_minute, max_wait, name=type(llm).__name__)
+        self.expected_output_tokens = expected_output_tokens
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.llm, "model_name", "")
+
+    def estimate_tokens(self, messages: List[Message], system_prompt: Optional[str] = None, max_tokens: Optional[int] = None) -> int:
+        # Local character-based estimate: provider token counting may cost a network round trip
+        chars = len(system_prompt or "") + sum(len(m.content) for m in messages)
+        return chars // 4 + (max_tokens or self.expected_output_tokens)
+
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, **kwargs) -> Union[str, Generator[str, None, None]]:
+        estimated = self.estimate_tokens(messages, system_prompt, kwargs.get("max_tokens"))
+        self.limiter.acquire(estimated)
+        response = self.llm.generate(messages=messages, system_prompt=system_prompt, tools=tools, stream=stream, **kwargs)
+        if isinstance(response, str):
+            self.limiter.reconcile(estimated, self.llm.get_token_usage().get("total", 0))
+            return response
+
+        def generator():
+            try:
+                yield from response
+            finally:
+                self.limiter.reconcile(estimated, self.llm.get_token_usage().get("total", 0))
+
+        return generator()
+
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        # Warmup calls don't generate, so they don't take quota
+        return self.llm.warmup(models)
+
+    def get_token_usage(self) -> Dict[str, int]:
+        return self.llm.get_token_usage()
+
+    def get_tool_calls(self) -> List[Dict[str, Any]]:
+        return self.llm.get_tool_calls()
+
+    def count_tokens(self, text: str) -> int:
+        return self.llm.count_tokens(text)
@@ -0,0 +1,78 @@
+from typing import List, Any, Dict, Optional, Tuple, Union, Generator
+from ..types import Message
+from .base import BaseLLM
+
+
+class ModelRegistry(BaseLLM):
+    """
+    Routes each call to the provider and model it names, so experts, the router and the synthesizer
+    can each use their own model (a tiny one for routing, a bigger one only where needed).
+
+    Models are named "<provider>/<model>" (e.g. "ollama/granite4:micro", "gemini/gemini-2.0-flash"),
+    by an alias, or by a bare model name served by the default provider. One provider instance
+    (and so one client/connection pool) is shared by every model of a backend; the model is passed per call.
+
+    The registry is itself a BaseLLM: pass it to Flow and Router in place of a single provider.
+    """
+    def __init__(self, default: BaseLLM, providers: Optional[Dict[str, BaseLLM]] = None, aliases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            default: Provider used for calls without a model, or with a model of no registered provider.
+            providers: Provider instances by prefix, e.g. {"ollama": OllamaLLM(), "gemini": GeminiLLM()}.
+            aliases: Short names for full model names, e.g. {"fast": "ollama/granite4:micro"}.
+        """
+        self.default = default
+        self.providers: Dict[str, BaseLLM] = dict(providers or {})
+        self.aliases: Dict[str, str] = dict(aliases or {})
+
+    def register(self, name: str, llm: BaseLLM) -> None:
+        """Registers (or replaces) the provider serving "<name>/..." models."""
+        self.providers[name] = llm
+
+    def alias(self, name: str, model: str) -> None:
+        self.aliases[name] = model
+
+    def resolve(self, model: Optional[str]) -> Tuple[BaseLLM, Optional[str]]:
+        """
+        Returns (provider, model name for that provider). A None model name means the provider's default.
+        """
+        if not model:
+            return self.default, None
+        model = self.aliases.get(model, model)
+        prefix, sep, name = model.partition("/")
+        if sep and prefix in self.providers:
+            return self.providers[prefix], name or None
+        # Model names may contain slashes themselves (e.g. "meta-llama/Llama-3.1-8B" on vLLM)
+        return self.default, model
+
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, model: Optional[str] = None, **kwargs) -> Union[str, Generator[str, None, None]]:
+        provider, provider_model = self.resolve(model)
+        self._thread_state().provider = provider
+        return provider.generate(messages=messages, system_prompt=system_prompt, tools=tools, stream=stream, model=provider_model, **kwargs)
+
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        """Warms the providers serving `models` (default: the default provider's model)."""
+        by_provider: Dict[int, Tuple[BaseLLM, Dict[str, Optional[str]]]] = {}
+        for model in models or [None]:
+            provider, provider_model = self.resolve(model)
+            by_provider.setdefault(id(provider), (provider, {}))[1][model or getattr(provider, "model_name", "")] = provider_model
+        timings = {}
+        for provider, names in by_provider.values():
+            provider_models = [m or getattr(provider, "model_name", "") for m in names.values()]
+            provider_timings = provider.warmup(provider_models)
+            for name, provider_model in zip(names, provider_models):
+                if provider_model in provider_timings:
+                    timings[name] = provider_timings[provider_model]
+        return timings
+
+    def _last_provider(self) -> BaseLLM:
+        return getattr(self._thread_state(), "provider", None) or self.default
+
+    def get_token_usage(self) -> Dict[str, int]:
+        return self._last_provider().get_token_usage()
+
+    def get_tool_calls(self) -> List[Dict[str, Any]]:
+        return self._last_provider().get_tool_calls()
+
+    def count_tokens(self, text: str) -> int:
+        return self.default.count_tokens(text)
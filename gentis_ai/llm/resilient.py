@@ -0,0 +1,335 @@
+import time
+import random
+import threading
+import contextvars
+import concurrent.futures
+from collections import deque
+from typing import List, Any, Dict, Optional, Union, Generator, Callable
+from ..types import Message
+from ..context import remaining_time
+from .. import metrics
+from .base import BaseLLM
+from ..streaming import close_stream
+from ..tools import tools_are_idempotent
+
+
+class ProviderTimeout(Exception):
+    """A provider call took longer than the configured timeout."""
+
+
+class AllProvidersFailed(Exception):
+    """Every provider of a fallback chain failed (or had its circuit open)."""
+    def __init__(self, errors: List[tuple]):
+        self.errors = errors # [(provider name, exception)]
+        details = "; ".join(f"{name}: {error}" for name, error in errors) or "no provider available"
+        super().__init__(f"All providers failed ({details})")
+
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_MARKERS = ("429", "rate limit", "resource_exhausted", "unavailable", "overloaded", "deadline_exceeded", "timed out", "timeout", "temporarily", "connection")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    True for errors worth retrying: timeouts, connection errors, 408/409/429/5xx responses.
+    Bad requests and authentication errors are not retried.
+    """
+    if isinstance(error, (ProviderTimeout, TimeoutError, ConnectionError)):
+        return True
+    for attr in ("status_code", "code", "status"):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status in _RETRYABLE_STATUS
+    message = str(error).lower()
+    return any(marker in message for marker in _RETRYABLE_MARKERS)
+
+
+class CircuitBreaker:
+    """
+    Stops sending calls to a provider after `failure_threshold` consecutive failures.
+    After `reset_timeout` seconds one trial call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_rejected(self) -> None:
+        """The provider answered but refused the request (bad request, authentication): not a sign it is down."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick the hedging delay."""
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+class ResilientLLM(BaseLLM):
+    """
+    Wraps one provider, or an ordered fallback chain of providers, behind the BaseLLM interface:
+
+    - per-call timeout (time to first chunk when streaming),
+    - retries with full-jitter exponential backoff on retryable errors,
+    - a hedged duplicate request when a call is slower than the provider's recent latency percentile
+      (non-streaming calls; the first answer wins),
+    - fallback to the next provider of the chain, skipping providers whose circuit breaker is open.
+
+    Providers run the tool loop inside generate(), so a call whose tools are not all idempotent
+    (see `cached_tool`) is never hedged, retried or sent to a fallback once an attempt has started:
+    the tools would run again.
+
+    Timed-out and losing hedged requests can't be interrupted and finish in the background.
+    """
+    def __init__(self, providers: Union[BaseLLM, List[BaseLLM]], timeout: Optional[float] = 60.0, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0, hedge_percentile: Optional[float] = 95.0, hedge_min_samples: int = 20, failure_threshold: int = 5, reset_timeout: float = 30.0, retryable: Callable[[BaseException], bool] = is_retryable, max_workers: int = 32):
+        """
+        Args:
+            providers: A provider or a fallback chain, primary first (e.g. [GeminiLLM(), OllamaLLM()]).
+            timeout: Seconds before a call is abandoned (None = no timeout).
+            max_retries: Retries per provider before falling back to the next one.
+            backoff_base: First retry delay in seconds (doubled each retry, randomized with full jitter).
+            backoff_max: Upper bound of a retry delay.
+            hedge_percentile: Latency percentile after which a duplicate request is sent (None disables hedging).
+            hedge_min_samples: Successful calls observed before hedging starts.
+            failure_threshold: Consecutive failures that open a provider's circuit.
+            reset_timeout: Seconds before an open circuit lets a trial call through.
+            retryable: Decides which errors are retried.
+            max_workers: Threads running provider calls.
+        """
+        self.providers = list(providers) if isinstance(providers, (list, tuple)) else [providers]
+        if not self.providers:
+            raise ValueError("ResilientLLM needs at least one provider")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.breakers = [CircuitBreaker(failure_threshold, reset_timeout) for _ in self.providers]
+        self.latencies = [LatencyTracker() for _ in self.providers]
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gentis-resilient")
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.providers[0], "model_name", "")
+
+    @staticmethod
+    def _label(provider: BaseLLM) -> str:
+        return f"{type(provider).__name__}:{getattr(provider, 'model_name', '')}"
+
+    def _timeout(self) -> Optional[float]:
+        # The configured timeout, shortened to the time left before the turn's deadline
+        remaining = remaining_time()
+        if remaining is None:
+            return self.timeout
+        remaining = max(0.0, remaining)
+        return remaining if self.timeout is None else min(self.timeout, remaining)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _submit(self, fn, *args):
+        # Provider calls run in worker threads with the caller's context (tracing, priority)
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    @staticmethod
+    def _run_call(provider: BaseLLM, call: Dict[str, Any]) -> tuple:
+        # Usage is per thread on providers, so it is read here, in the thread that made the call
+        started_at = time.perf_counter()
+        text = provider.generate(**call)
+        if not isinstance(text, str):
+            text = "".join(text)
+        return text, dict(provider.get_token_usage()), provider.get_tool_calls(), time.perf_counter() - started_at
+
+    def _call_once(self, index: int, call: Dict[str, Any], hedge: bool = True) -> str:
+        """One non-streaming attempt on one provider, hedged (if `hedge`) when it runs slower than usual."""
+        provider = self.providers[index]
+        label = self._label(provider)
+        timeout = self._timeout()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pending = {self._submit(self._run_call, provider, call)}
+
+        hedge_after = None
+        if hedge and self.hedge_percentile is not None:
+            hedge_after = self.latencies[index].percentile(self.hedge_percentile, self.hedge_min_samples)
+        hedged = False
+        first = None
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            wait = remaining
+            if not hedged and hedge_after is not None:
+                wait = min(wait, hedge_after) if wait is not None else hedge_after
+            done, pending = concurrent.futures.wait(pending, timeout=wait, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text, usage, tool_calls, latency = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.latencies[index].record(latency)
+                if hedged:
+                    metrics.RESILIENCE_EVENTS.inc(provider=label, event="hedge_won" if future is not first else "hedge_lost")
+                self._last_usage = usage
+                self._last_tool_calls = list(tool_calls)
+                return text
+            if not done and not hedged and hedge_after is not None:
+                # Slower than the usual tail: race a duplicate request, first answer wins
+                hedged = True
+                metrics.RESILIENCE_EVENTS.inc(provider=label, event="hedge")
+                first = next(iter(pending))
+                pending.add(self._submit(self._run_call, provider, call))
+                hedge_after = None
+            elif not pending and error is not None:
+                raise error
+
+        metrics.RESILIENCE_EVENTS.inc(provider=label, event="timeout")
+        raise ProviderTimeout(f"{label} did not answer within {timeout:.2f}s")
+
+    def _stream_once(self, index: int, call: Dict[str, Any]) -> Generator[str, None, None]:
+        """
+        One streaming attempt: the call and its first chunk must arrive within the timeout.
+        Once a chunk has been handed out, errors are raised to the caller (no retry can undo it).
+        """
+        provider = self.providers[index]
+
+        def start():
+            response = provider.generate(**call)
+            if isinstance(response, str):
+                return response, None, dict(provider.get_token_usage()), provider.get_tool_calls()
+            iterator = iter(response)
+            return next(iterator, None), iterator, None, None
+
+        timeout = self._timeout()
+        future = self._submit(start)
+        try:
+            first, iterator, usage, tool_calls = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            metrics.RESILIENCE_EVENTS.inc(provider=self._label(provider), event="timeout")
+            raise ProviderTimeout(f"{self._label(provider)} sent nothing within {timeout:.2f}s")
+
+        def generator():
+            try:
+                if first is not None:
+                    yield first
+                if iterator is None:
+                    # Provider answered in one piece, its usage was recorded in the worker thread
+                    self._last_usage = usage
+                    self._last_tool_calls = list(tool_calls)
+                    return
+                yield from iterator
+                self._last_usage = dict(provider.get_token_usage())
+                self._last_tool_calls = provider.get_tool_calls()
+            finally:
+                # Closed early by the consumer: close the provider stream too
+                close_stream(iterator)
+
+        return generator()
+
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, stream: bool = False, model: Optional[str] = None, **kwargs) -> Union[str, Generator[str, None, None]]:
+        errors = []
+        # With tools that have side effects only one attempt may run (providers whose circuit is open are passed over)
+        replayable = tools_are_idempotent(tools)
+        for index, provider in enumerate(self.providers):
+            label = self._label(provider)
+            if not self.breakers[index].allow():
+                metrics.RESILIENCE_EVENTS.inc(provider=label, event="circuit_open")
+                errors.append((label, "circuit open"))
+                continue
+            # The requested model belongs to the primary provider, fallbacks use their own default
+            call = dict(kwargs, messages=messages, system_prompt=system_prompt, tools=tools, stream=stream, model=model if index == 0 else None)
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = self._stream_once(index, call) if stream else self._call_once(index, call, hedge=replayable)
+                    self.breakers[index].record_success()
+                    return result
+                except Exception as e:
+                    if self.retryable(e):
+                        self.breakers[index].record_failure()
+                    else:
+                        # Rejected requests (4xx, authentication) say nothing about the provider's health
+                        self.breakers[index].record_rejected()
+                    error = e
+                backoff = self._backoff(attempt)
+                remaining = remaining_time()
+                if remaining is not None and remaining <= backoff:
+                    # No time left for another attempt before the turn's deadline
+                    errors.append((label, error))
+                    raise AllProvidersFailed(errors)
+                if attempt < self.max_retries and replayable and self.retryable(error) and self.breakers[index].allow():
+                    metrics.RESILIENCE_EVENTS.inc(provider=label, event="retry")
+                    time.sleep(backoff)
+                    continue
+                break
+            errors.append((label, error))
+            if not replayable:
+                break
+            if index + 1 < len(self.providers):
+                metrics.RESILIENCE_EVENTS.inc(provider=label, event="fallback")
+        raise AllProvidersFailed(errors)
+
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        """Warms the primary provider with `models` and every fallback with its default model."""
+        timings = {}
+        for index, provider in enumerate(self.providers):
+            for model, seconds in provider.warmup(models if index == 0 else None).items():
+                timings[f"{self._label(provider)}/{model}" if index else model] = seconds
+        return timings
+
+    def get_token_usage(self) -> Dict[str, int]:
+        return self._last_usage
+
+    def count_tokens(self, text: str) -> int:
+        return self.providers[0].count_tokens(text)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,141 @@
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from .. import metrics
+
+
+class _Waiter:
+    __slots__ = ("model", "seq", "since")
+
+    def __init__(self, model: str, seq: int):
+        self.model = model
+        self.seq = seq
+        self.since = time.monotonic()
+
+
+class ModelAffinityScheduler:
+    """
+    Orders calls to a model server that can only keep a few models in memory (e.g. Ollama's
+    OLLAMA_MAX_LOADED_MODELS), so requests for the loaded models go first and swaps happen in batches
+    instead of on every interleaved request.
+
+    The scheduler tracks which models it believes are resident. A call for a resident model is admitted
+    right away. A call for another model waits until a resident model is idle (nothing in flight or queued
+    for it), or until it has waited `max_delay` seconds, then the least recently used model is evicted
+    from the scheduler's view and the swap is counted (loads into a free slot are counted as `loads`).
+    Share one scheduler between all providers talking to the same server.
+    """
+    def __init__(self, max_loaded_models: int = 1, max_delay: float = 2.0, max_concurrent: Optional[int] = None, name: str = "ollama"):
+        """
+        Args:
+            max_loaded_models: Models the server keeps in memory at once.
+            max_delay: Seconds a call may be held back to avoid a swap.
+            max_concurrent: Calls in flight at once, across models (None = unlimited).
+            name: Label of the scheduler in metrics.
+        """
+        self.max_loaded_models = max_loaded_models
+        self.max_delay = max_delay
+        self.max_concurrent = max_concurrent
+        self.name = name
+        self._resident: "OrderedDict[str, None]" = OrderedDict() # Least recently used first
+        self._inflight: Dict[str, int] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.swaps = 0 # Loads that evicted another model
+        self.loads = 0 # Loads into a free slot (e.g. the first load of each model)
+        self.admitted = 0
+        self.delayed = 0 # Calls held back to avoid a swap
+
+    @property
+    def resident_models(self) -> List[str]:
+        with self._cond:
+            return list(self._resident)
+
+    def mark_resident(self, model: str) -> None:
+        """Records a model as loaded (e.g. after a warmup call) without counting a load or swap."""
+        with self._cond:
+            self._make_resident(model, count=False)
+            self._cond.notify_all()
+
+    def _busy(self, model: str) -> bool:
+        return self._inflight.get(model, 0) > 0 or any(w.model == model for w in self._waiters)
+
+    def _make_resident(self, model: str, count: bool) -> None:
+        if model in self._resident:
+            self._resident.move_to_end(model)
+            return
+        victim = None
+        if len(self._resident) >= self.max_loaded_models:
+            # Prefer evicting an idle model; otherwise the least recently used one
+            idle = [m for m in self._resident if not self._busy(m)]
+            victim = idle[0] if idle else next(iter(self._resident))
+            del self._resident[victim]
+        self._resident[model] = None
+        if not count:
+            return
+        if victim is not None:
+            self.swaps += 1
+            metrics.MODEL_SWAPS.inc(scheduler=self.name, model=model)
+        else:
+            self.loads += 1
+            metrics.MODEL_LOADS.inc(scheduler=self.name, model=model)
+
+    def _admissible(self, waiter: _Waiter) -> bool:
+        if self.max_concurrent is not None and sum(self._inflight.values()) >= self.max_concurrent:
+            return False
+        if waiter.model in self._resident:
+            return True
+        # Only the oldest call for a non-resident model may trigger a load, the others follow it
+        first = next(w for w in self._waiters if w.model not in self._resident)
+        if first is not waiter:
+            return False
+        if len(self._resident) < self.max_loaded_models:
+            return True
+        if any(not self._busy(m) for m in self._resident):
+            return True
+        return time.monotonic() - waiter.since >= self.max_delay
+
+    def acquire(self, model: str) -> float:
+        """Blocks until a call for `model` may be sent. Returns the seconds spent waiting."""
+        waiter = _Waiter(model, next(self._seq))
+        with self._cond:
+            self._waiters.append(waiter)
+            try:
+                held_back = False
+                while not self._admissible(waiter):
+                    held_back = True
+                    timeout = None
+                    if model not in self._resident:
+                        timeout = max(0.0, self.max_delay - (time.monotonic() - waiter.since)) or None
+                    self._cond.wait(timeout)
+                self._make_resident(model, count=True)
+                self._inflight[model] = self._inflight.get(model, 0) + 1
+                self.admitted += 1
+                if held_back:
+                    self.delayed += 1
+            finally:
+                self._waiters.remove(waiter)
+                self._cond.notify_all()
+        waited = time.monotonic() - waiter.since
+        metrics.MODEL_SCHEDULER_WAIT.observe(waited, scheduler=self.name)
+        return waited
+
+    def release(self, model: str) -> None:
+        with self._cond:
+            self._inflight[model] = max(0, self._inflight.get(model, 0) - 1)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "resident": list(self._resident),
+                "inflight": {m: n for m, n in self._inflight.items() if n},
+                "queued": len(self._waiters),
+                "admitted": self.admitted,
+                "delayed": self.delayed,
+                "loads": self.loads,
+                "swaps": self.swaps,
+            }
@@ -1,6 +1,8 @@
+import time
 from typing import List, Any, Dict, Optional
 from ..types import Message
 from .base import BaseLLM
+from ..context import check_deadline
 import os
 
 try:
@@ -20,7 +22,8 @@ class VLLMLLM(BaseLLM):
         self.model_name = model_name
         self._last_usage = {"total": 0}
 
-    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, **kwargs) -> str:
+    def generate(self, messages: List[Message], system_prompt: str = None, tools: List[Any] = None, model: Optional[str] = None, **kwargs) -> str:
+        model = model or self.model_name
         openai_messages = []
         
         if system_prompt:
@@ -38,21 +41,53 @@ class VLLMLLM(BaseLLM):
         if tools:
             api_kwargs["tools"] = tools
 
+        # temperature, top_p, max_tokens, stop and seed are OpenAI parameters; top_k is a vLLM extension
+        top_k = api_kwargs.pop("top_k", None)
+        if top_k is not None:
+            api_kwargs["extra_body"] = dict(api_kwargs.get("extra_body") or {}, top_k=top_k)
+
+        # Constrained output: vLLM guided decoding (passed through the OpenAI client's extra_body)
+        choices = api_kwargs.pop("choices", None)
+        multiple_choices = api_kwargs.pop("multiple_choices", False)
+        if choices:
+            extra_body = dict(api_kwargs.get("extra_body") or {})
+            if multiple_choices:
+                extra_body["guided_json"] = self._choices_schema(choices, multiple=True)
+                api_kwargs.pop("stop", None) # A stop sequence could cut the JSON list
+            else:
+                extra_body["guided_choice"] = list(choices)
+            api_kwargs["extra_body"] = extra_body
+
+        # The turn's deadline bounds the HTTP request
+        remaining = check_deadline()
+        if remaining is not None and "timeout" not in api_kwargs:
+            api_kwargs["timeout"] = remaining
+
+        started_at = time.perf_counter()
         try:
             response = self.client.chat.completions.create(
-                model=self.model_name,
+                model=model,
                 messages=openai_messages,
                 **api_kwargs
             )
             
             if response.usage:
                 self._last_usage["total"] = response.usage.total_tokens
+            self._record_call(started_at, model=model)
                 
             return response.choices[0].message.content or ""
 
         except Exception as e:
+            self._record_call(started_at, "error", model)
             raise e
 
+    def warmup(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        # vLLM loads its model at startup; listing the models opens the connection and checks the server is up
+        started_at = time.perf_counter()
+        self.client.models.list()
+        elapsed = time.perf_counter() - started_at
+        return {model: elapsed for model in models or [self.model_name]}
+
     def get_token_usage(self) -> Dict[str, int]:
         return self._last_usage
 
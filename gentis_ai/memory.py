@@ -1,5 +1,17 @@
-from typing import List, Any
-from .types import Message
+import os
+import json
+import threading
+from urllib.parse import quote
+from typing import List, Any, Sequence, Optional, Dict, Tuple, Callable
+from .types import Message, GenerationConfig
+from .history import ConversationHistory, HistoryRecord
+from .index import BM25Index, VectorIndex
+from .synthesis import compress_answer
+from . import metrics
+from .context import Priority, priority
+
+# Embeds a batch of texts: embedder(["text", ...]) -> [[0.1, ...], ...]
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
 
 class PNNet:
     """
@@ -13,6 +25,10 @@ class PNNet:
         Keeps the history within a manageable size.
         """
         # Simple truncation for now, but can be enhanced with summarization
+        if len(history) > max_turns * 2:
+            metrics.PRUNED_MESSAGES.inc(len(history) - max_turns * 2)
+        if isinstance(history, ConversationHistory):
+            return history.keep_last(max_turns * 2)
         if len(history) > max_turns * 2:
             return history[-(max_turns * 2):]
         return history
@@ -23,29 +39,30 @@ class PNNet:
         Cleans up history when switching experts.
         Removes old system prompts or expert-specific hints to prevent confusion.
         """
-        clean_history = []
-        for msg in history:
-            # Skip system messages from previous turns (as we will inject a new one)
-            if msg.role == "system":
-                # Exception: Keep summaries
-                if msg.content.startswith("Previous conversation summary:"):
-                    clean_history.append(msg)
-                continue
-            
-            # Skip "Context hints" if they were injected as model messages
-            if msg.role == "model" and msg.content.startswith("Context hints:"):
-                continue
-                
-            clean_history.append(msg)
-            
-        return clean_history
+        if isinstance(history, ConversationHistory):
+            return history.filter(PNNet._keep_on_switch)
+        return [msg for msg in history if PNNet._keep_on_switch(msg)]
+
+    @staticmethod
+    def _keep_on_switch(msg: Any) -> bool:
+        # Skip system messages from previous turns (as we will inject a new one)
+        if msg.role == "system":
+            # Exception: Keep summaries
+            return msg.content.startswith("Previous conversation summary:")
+
+        # Skip "Context hints" if they were injected as model messages
+        if msg.role == "model" and msg.content.startswith("Context hints:"):
+            return False
+
+        return True
 
     @staticmethod
-    def summarize_if_needed(history: List[Message], llm: Any, token_limit: int = 500, target_tokens: int = 150) -> List[Message]:
+    def needs_summary(history: List[Message], llm: Any, token_limit: int = 500) -> bool:
         """
-        Checks if history exceeds token_limit. If so, summarizes the older part to target_tokens.
+        True if the history exceeds token_limit and has older turns to summarize (the last 2 turns are kept).
         """
-        # 1. Count tokens
+        if len(history) <= 4:
+            return False
         full_text = "\n".join([f"{msg.role}: {msg.content}" for msg in history])
         
         current_tokens = 0
@@ -54,13 +71,20 @@ class PNNet:
         else:
             current_tokens = len(full_text) // 4
             
-        if current_tokens <= token_limit:
+        return current_tokens > token_limit
+
+    @staticmethod
+    def summarize_if_needed(history: List[Message], llm: Any, token_limit: int = 500, target_tokens: int = 150, generation: Optional[GenerationConfig] = None) -> List[Message]:
+        """
+        Checks if history exceeds token_limit. If so, summarizes the older part to target_tokens
+        (with the `generation` settings, e.g. a max_tokens cap).
+        """
+        # 1. Count tokens
+        if not PNNet.needs_summary(history, llm, token_limit):
             return history
             
         # 2. Summarize
         # Keep last 2 turns (4 messages)
-        if len(history) <= 4:
-            return history
             
         messages_to_summarize = history[:-4]
         recent_messages = history[-4:]
@@ -70,15 +94,179 @@ class PNNet:
         prompt = f"Summarize the following conversation history into a concise summary of approximately {target_tokens} tokens. Preserve key information and context.\n\n{text_to_summarize}"
         
         try:
-            summary_text = llm.generate(
-                messages=[Message(role="user", content=prompt)],
-                system_prompt="You are a helpful assistant that summarizes conversation history."
-            )
+            # Nobody waits on the summary, so it yields to routing and answers under a rate limit
+            with priority(Priority.BACKGROUND):
+                summary_text = llm.generate(
+                    messages=[Message(role="user", content=prompt)],
+                    system_prompt="You are a helpful assistant that summarizes conversation history.",
+                    **GenerationConfig.combine(generation)
+                )
             
             # Create new history with summary
+            metrics.SUMMARIZATIONS.inc(status="ok")
             summary_msg = Message(role="system", content=f"Previous conversation summary: {summary_text}")
-            return [summary_msg] + recent_messages
+            if isinstance(history, ConversationHistory):
+                return ConversationHistory([summary_msg, *recent_messages])
+            return [summary_msg] + list(recent_messages)
             
         except Exception as e:
+            metrics.SUMMARIZATIONS.inc(status="error")
             print(f"Summarization failed: {e}")
             return history
+
+
+class SessionMemory:
+    """
+    Searchable long-term memory of one conversation. Each finished turn is indexed as it is added
+    (BM25, or cosine similarity of embeddings when an embedder is given) and, with a path,
+    appended to a JSONL file that is replayed on load (embeddings included, so they are not recomputed).
+    """
+    def __init__(self, embedder: Optional[Embedder] = None, path: Optional[str] = None):
+        self.embedder = embedder
+        self.path = path
+        self.index = VectorIndex() if embedder else BM25Index()
+        self.turns: List[str] = [] # Text per turn id (ids are positions)
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def _index(self, text: str, vector: Optional[Sequence[float]]) -> int:
+        turn_id = len(self.turns)
+        self.turns.append(text)
+        self.index.add(turn_id, vector if self.embedder else text)
+        return turn_id
+
+    def _load(self, path: str) -> None:
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    break # Last line torn by an interrupted write
+                valid_bytes += len(line)
+                vector = entry.get("embedding")
+                if self.embedder and vector is None:
+                    vector = self.embedder([entry["text"]])[0]
+                self._index(entry["text"], vector)
+        if valid_bytes < os.path.getsize(path):
+            # Cut the torn line, so the next appended turn starts on a line of its own
+            with open(path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    @staticmethod
+    def _entry(text: str, vector: Optional[Sequence[float]]) -> str:
+        entry = {"text": text}
+        if vector is not None:
+            entry["embedding"] = [float(x) for x in vector]
+        return json.dumps(entry, ensure_ascii=False) + "\n"
+
+    def add(self, text: str) -> int:
+        """Indexes one turn (and appends it to the file). Returns its id."""
+        vector = self.embedder([text])[0] if self.embedder else None
+        with self._lock:
+            turn_id = self._index(text, vector)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(self._entry(text, vector))
+        return turn_id
+
+    def search(self, query: str, k: int = 3, exclude_recent: int = 0) -> List[Tuple[str, float]]:
+        """
+        Returns up to `k` (turn text, score) pairs most relevant to `query`, best first,
+        leaving out the last `exclude_recent` turns (they are sent verbatim anyway).
+        """
+        if not self.turns or k <= 0:
+            return []
+        target = self.embedder([query])[0] if self.embedder else query
+        with self._lock:
+            limit = len(self.turns) - exclude_recent
+            # At most exclude_recent of the results are filtered out
+            matches = self.index.search(target, k + exclude_recent)
+            return [(self.turns[turn_id], score) for turn_id, score in matches if turn_id < limit][:k]
+
+    def save(self, path: str) -> None:
+        """Writes the whole memory to `path`, e.g. to persist a memory created without a path."""
+        vectors = [self.index.vector(turn_id) for turn_id in range(len(self.turns))] if self.embedder else [None] * len(self.turns)
+        tmp_path = path + ".tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            for text, vector in zip(self.turns, vectors):
+                f.write(self._entry(text, vector))
+        os.replace(tmp_path, path)
+
+
+class RetrievalMemory:
+    """
+    Long-term memory for Flow (`Flow(memory=RetrievalMemory())`): the finished turns of each session
+    are indexed, and expert calls get the `top_k` past turns most relevant to the new message
+    plus the last `recent_turns` turns, instead of the whole history. The prompt size stays flat
+    however long the session gets, and old details are still found.
+    """
+    SNIPPETS_HEADER = "Relevant earlier conversation:"
+
+    def __init__(self, top_k: int = 3, recent_turns: int = 2, embedder: Optional[Embedder] = None, storage_dir: Optional[str] = None, snippet_tokens: int = 150, min_score: float = 0.0):
+        """
+        Args:
+            top_k: Past turns recalled per expert call.
+            recent_turns: Latest turns always sent verbatim.
+            embedder: Batch embedding function; None = lexical (BM25) search.
+            storage_dir: Directory keeping one JSONL file per session, loaded back when the session returns
+                         (None = in memory only).
+            snippet_tokens: Recalled turns are cut to about this many tokens.
+            min_score: Recalled turns must score above this (BM25 score, or cosine similarity with an embedder).
+        """
+        self.top_k = top_k
+        self.recent_turns = recent_turns
+        self.embedder = embedder
+        self.storage_dir = storage_dir
+        self.snippet_tokens = snippet_tokens
+        self.min_score = min_score
+        self._sessions: Dict[Optional[str], SessionMemory] = {}
+        self._lock = threading.Lock()
+        if storage_dir:
+            os.makedirs(storage_dir, exist_ok=True)
+
+    def _path(self, user_id: Optional[str]) -> Optional[str]:
+        if not self.storage_dir:
+            return None
+        return os.path.join(self.storage_dir, quote(user_id or "default", safe="") + ".jsonl")
+
+    def session(self, user_id: Optional[str]) -> SessionMemory:
+        with self._lock:
+            memory = self._sessions.get(user_id)
+            if memory is None:
+                memory = self._sessions[user_id] = SessionMemory(self.embedder, self._path(user_id))
+            return memory
+
+    def remember(self, user_id: Optional[str], message: str, answer: str) -> None:
+        """Indexes a finished turn."""
+        self.session(user_id).add(f"user: {message}\nassistant: {answer}")
+
+    def recall(self, user_id: Optional[str], message: str) -> List[str]:
+        """Past turns relevant to `message`, best first (the recent turns excluded)."""
+        matches = self.session(user_id).search(message, self.top_k, exclude_recent=self.recent_turns)
+        return [compress_answer(text, self.snippet_tokens) for text, score in matches if score > self.min_score]
+
+    def context(self, user_id: Optional[str], history: ConversationHistory, message: str) -> ConversationHistory:
+        """
+        History to send with `message`: the recalled turns (as one user message: some providers, like Gemini,
+        drop system messages from the history), then the recent turns.
+        Summaries at the start of the history are kept. Records are shared with `history`, not copied.
+        """
+        recent = list(history.tail(self.recent_turns * 2))
+        summaries = [r for r in history[:len(history) - len(recent)] if r.role == "system" and r.content.startswith("Previous conversation summary:")]
+        snippets = self.recall(user_id, message)
+        records = summaries
+        if snippets:
+            records = records + [HistoryRecord("user", self.SNIPPETS_HEADER + "\n\n" + "\n\n".join(snippets))]
+        return ConversationHistory(records + recent)
+
+    def forget(self, user_id: Optional[str]) -> None:
+        """Drops the session's index from RAM (its file, if any, is kept and reloaded on the next turn)."""
+        with self._lock:
+            self._sessions.pop(user_id, None)
@@ -0,0 +1,283 @@
+import math
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1) # Last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+
+class _Metric:
+    """
+    A metric family: one child per label combination.
+    Children are created once (under a lock) and then updated with their own small lock,
+    so hot paths never contend on a registry-wide lock.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float, **labels) -> None:
+        self.labels(**labels).set(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(b for b in buckets if b != math.inf))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, gauges and fixed-bucket histograms.
+    Metrics are created on first use (get-or-create by name) and rendered in the
+    Prometheus text exposition format by `render()`.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, child in sorted(metric.children(), key=lambda kv: kv[0]):
+                labels = list(zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    counts, total, count = child.snapshot()
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(metric.buckets) + [math.inf], counts):
+                        cumulative += bucket_count
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {count}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Process-wide registry used by the built-in instrumentation
+REGISTRY = MetricsRegistry()
+
+
+def render_prometheus(registry: MetricsRegistry = REGISTRY) -> str:
+    """Returns the metrics of `registry` in the Prometheus text format (serve with CONTENT_TYPE)."""
+    return registry.render()
+
+
+def start_http_server(port: int = 9464, addr: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serves GET /metrics from a daemon thread. Returns the server (call .shutdown() to stop it).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=server.serve_forever, name="gentis-metrics", daemon=True).start()
+    return server
+
+
+# --- Built-in instrumentation ---
+
+TURNS = REGISTRY.counter("gentis_turns_total", "Conversation turns processed.", ["expert"])
+TURN_DURATION = REGISTRY.histogram("gentis_turn_duration_seconds", "End-to-end duration of Flow.process_turn.")
+EXPERT_SWITCHES = REGISTRY.counter("gentis_expert_switches_total", "Turns that switched to a different expert.")
+HYBRID_FANOUT = REGISTRY.histogram("gentis_hybrid_fanout", "Number of experts consulted per hybrid turn.", buckets=(2, 3, 4, 5, 6, 8, 10))
+EXPERT_TOKENS = REGISTRY.counter("gentis_expert_tokens_total", "Tokens used per answering expert.", ["expert"])
+ACTIVE_SESSIONS = REGISTRY.gauge("gentis_active_sessions", "Sessions currently held in memory.")
+ROUTING_CALLS = REGISTRY.counter("gentis_routing_llm_calls_total", "LLM calls made by the router.", ["status"])
+ROUTING_DURATION = REGISTRY.histogram("gentis_routing_duration_seconds", "Duration of Router.classify.")
+SUMMARIZATIONS = REGISTRY.counter("gentis_summarizations_total", "History summarizations.", ["status"])
+PRUNED_MESSAGES = REGISTRY.counter("gentis_pruned_messages_total", "Messages dropped by history pruning.")
+LLM_REQUESTS = REGISTRY.counter("gentis_llm_requests_total", "Provider calls.", ["provider", "model", "status"])
+LLM_DURATION = REGISTRY.histogram("gentis_llm_request_duration_seconds", "Provider call latency (full stream for streamed calls).", ["provider", "model"])
+LLM_TOKENS = REGISTRY.counter("gentis_llm_tokens_total", "Tokens reported by providers.", ["provider", "model"])
+TOOL_CALLS = REGISTRY.counter("gentis_tool_calls_total", "Tool executions.", ["tool", "status"])
+TOOL_DURATION = REGISTRY.histogram("gentis_tool_duration_seconds", "Tool execution latency.", ["tool"])
+SPECULATIONS = REGISTRY.counter("gentis_speculations_total", "Speculative generations by outcome (hit, miss, skipped).", ["outcome"])
+SPECULATION_WASTED_TOKENS = REGISTRY.counter("gentis_speculation_wasted_tokens_total", "Tokens spent on discarded speculative answers.")
+FUSED_TURNS = REGISTRY.counter("gentis_fused_routing_total", "Fused route-and-respond turns by outcome (answered, handoff).", ["outcome"])
+RATE_LIMIT_WAIT = REGISTRY.histogram("gentis_rate_limit_wait_seconds", "Time provider calls waited for rate-limit quota.", ["limiter", "priority"], buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+RATE_LIMIT_QUEUE = REGISTRY.gauge("gentis_rate_limit_queue_depth", "Calls currently waiting for rate-limit quota.", ["limiter"])
+RESILIENCE_EVENTS = REGISTRY.counter("gentis_resilience_events_total", "Resilient provider events (retry, timeout, hedge, hedge_won, hedge_lost, fallback, circuit_open).", ["provider", "event"])
+REPLICA_OUTSTANDING = REGISTRY.gauge("gentis_replica_outstanding_requests", "Requests in flight per replica of a ReplicaPool.", ["replica"])
+REPLICA_EJECTIONS = REGISTRY.counter("gentis_replica_ejections_total", "Replicas ejected after consecutive failures.", ["replica"])
+REPLICA_READMISSIONS = REGISTRY.counter("gentis_replica_readmissions_total", "Replicas re-admitted by a passing health check.", ["replica"])
+MODEL_SWAPS = REGISTRY.counter("gentis_model_swaps_total", "Model loads scheduled by a ModelAffinityScheduler that evicted another model (model = model loaded).", ["scheduler", "model"])
+MODEL_LOADS = REGISTRY.counter("gentis_model_loads_total", "Model loads scheduled by a ModelAffinityScheduler into a free slot, with no eviction (model = model loaded).", ["scheduler", "model"])
+MODEL_SCHEDULER_WAIT = REGISTRY.histogram("gentis_model_scheduler_wait_seconds", "Time calls were held back to group them by model.", ["scheduler"], buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+MODEL_LOAD_DURATION = REGISTRY.histogram("gentis_model_load_seconds", "Model load times reported by the server (loads of an already resident model are not counted).", ["model"], buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0))
+WARMUP_DURATION = REGISTRY.gauge("gentis_warmup_seconds", "Duration of the last warmup, per component.", ["component"])
+DEGRADATIONS = REGISTRY.counter("gentis_degradations_total", "Turn steps skipped or cut short to meet a deadline.", ["kind"])
+SYNTHESES = REGISTRY.counter("gentis_syntheses_total", "Hybrid answers merged, by synthesis strategy (llm, sectioned, winner, ...).", ["strategy"])
+CANCELLED_TURNS = REGISTRY.counter("gentis_cancelled_turns_total", "Streamed turns cut short because their consumer went away.")
+JOURNAL_BYTES = REGISTRY.counter("gentis_journal_bytes_total", "Bytes appended to the session journal.")
+JOURNAL_BATCH_SIZE = REGISTRY.histogram("gentis_journal_batch_records", "Turn records written per journal batch (one fsync each).", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024))
+JOURNAL_COMPACTIONS = REGISTRY.counter("gentis_journal_compactions_total", "Journal segments folded into a new snapshot.")
@@ -1,13 +1,47 @@
-from typing import List, Optional
-from .types import Expert, Message
+import re
+import json
+import time
+from typing import Dict, List, Optional, Tuple, Any
+from .types import Expert, Message, WarmupReport, GenerationConfig
 from .llm.base import BaseLLM
 from .utils import Colors
+from .streaming import StreamBuffer, close_stream
+from .index import BM25Index
+from . import tracing
+from . import metrics
+from .context import Priority, priority
+
+# Marker an expert emits instead of answering when fused routing hands the turn off
+HANDOFF_PREFIX = "<<handoff:"
+
+_HANDOFF_RE = re.compile(r"^\s*<<handoff:\s*([^>]*)>>")
+# A reply still without ">>" after this many characters is an answer that happens to start like a marker
+HANDOFF_MAX_CHARS = 256
+
+
+def _replay(head: List[str], response: Any):
+    """Yields the inspected chunks, then the rest of the stream (closed with this generator)."""
+    try:
+        yield from head
+        yield from response
+    finally:
+        close_stream(response)
 
 class Router:
-    def __init__(self, experts: List[Expert], llm: BaseLLM, default_expert: Optional[Expert] = None, enable_hybrid: bool = True):
+    def __init__(self, experts: List[Expert], llm: BaseLLM, default_expert: Optional[Expert] = None, enable_hybrid: bool = True, model_name: Optional[str] = None, structured: bool = False, categories: Optional[Dict[str, str]] = None, shortlist_size: Optional[int] = None, generation: Optional[GenerationConfig] = None):
         self.experts = {e.name: e for e in experts}
         self.llm = llm
         self.enable_hybrid = enable_hybrid
+        # Model used for classification, typically a small fast one (None = the provider's default)
+        self.model_name = model_name
+        # Structured routing: capped output, stop sequences and constrained decoding over the expert names
+        self.structured = structured
+        # Hierarchical routing for large rosters: category descriptions (experts declare their `category`)
+        # and/or the number of lexical matches the router LLM gets to choose from
+        self.categories = dict(categories or {})
+        self.shortlist_size = shortlist_size
+        # Generation settings of routing calls (e.g. temperature=0); structured routing constraints take precedence
+        self.generation = generation
         
         # 1. Orchestrator Default Mitigation
         # If no default expert is provided, we create a generic "Orchestrator"
@@ -27,13 +61,140 @@ class Router:
             if default_expert.name not in self.experts:
                 self.experts[default_expert.name] = default_expert
 
+        self._index_experts()
+
+    def _index_experts(self) -> None:
+        """
+        Precomputes what every classification needs: the name lookup, the prompt's expert list
+        and the output budget of structured routing, plus the category map and lexical index
+        of hierarchical routing. Call it again after changing `experts`.
+        """
+        self._name_index = {name.lower(): name for name in self.experts}
+        self._expert_names = list(self.experts)
+        self._experts_desc = self._describe(self._expert_names)
+        self._route_max_tokens = self._max_tokens(self._expert_names, self.enable_hybrid)
+
+        self._by_category: Dict[str, List[str]] = {}
+        for name, expert in self.experts.items():
+            if expert.category:
+                self._by_category.setdefault(expert.category, []).append(name)
+        self._category_index = {category.lower(): category for category in self.categories}
+        self._lexical = None
+        if self.shortlist_size:
+            self._lexical = BM25Index()
+            for name, expert in self.experts.items():
+                self._lexical.add(name, f"{name.replace('_', ' ')} {expert.description} {expert.category or ''}")
+
+    def _describe(self, names: List[str]) -> str:
+        return "\n".join([f"- '{name}': {self.experts[name].description}" for name in names])
+
+    @staticmethod
+    def _max_tokens(names: List[str], multiple: bool) -> int:
+        # Enough tokens for the longest name (or a short JSON list of names), and no more
+        name_tokens = max(len(name) for name in names) // 2 + 2
+        return name_tokens * min(len(names), 3) + 4 if multiple else name_tokens
+
     def classify(self, user_message: str, current_expert_name: str, recent_history: List[str] = None) -> List[str]:
         """
         Determines the best expert(s) to handle the user message.
         Returns a list of expert names.
         """
+        started_at = time.perf_counter()
+        with tracing.span("route", current_expert=current_expert_name, roster=len(self.experts)) as route_span, priority(Priority.ROUTING):
+            candidates = self._candidates(user_message, current_expert_name, recent_history)
+            experts = self._classify(user_message, current_expert_name, recent_history, candidates)
+            metrics.ROUTING_DURATION.observe(time.perf_counter() - started_at)
+            if route_span.recording:
+                route_span.set_attributes({
+                    "candidates": len(candidates) if candidates is not None else len(self.experts),
+                    "experts": ",".join(experts),
+                    "tokens.total": self.llm.get_token_usage().get("total", 0),
+                })
+            return experts
+
+    def _candidates(self, user_message: str, current_expert_name: str, recent_history: List[str] = None) -> Optional[List[str]]:
+        """
+        Hierarchical routing: narrows the roster down to a small candidate set, first to the experts of the
+        categories picked by the LLM (if `categories` are set), then to the `shortlist_size` best lexical matches
+        of the message. Returns None for flat routing over every expert.
+        """
+        if not self.categories and not self.shortlist_size:
+            return None
+        pool = self._expert_names
+        if self.categories:
+            chosen = self._select_categories(user_message, current_expert_name, recent_history)
+            if chosen:
+                pool = [name for category in chosen for name in self._by_category.get(category, [])]
+        if self.shortlist_size and len(pool) > self.shortlist_size:
+            pool = [name for name, _ in self._lexical.search(user_message, k=self.shortlist_size, allowed=pool)]
+        # Staying and falling back to the default expert must always remain possible
+        fixed = [name for name in (current_expert_name, self.default_expert.name) if name in self.experts]
+        return list(dict.fromkeys(fixed + pool))
+
+    def _select_categories(self, user_message: str, current_expert_name: str, recent_history: List[str] = None) -> List[str]:
+        categories_desc = "\n".join([f"- '{name}': {description}" for name, description in self.categories.items()])
+        current = self.experts.get(current_expert_name)
+        current_category = current.category if current and current.category else "none"
+
+        history_text = ""
+        if recent_history:
+            history_text = "\nRecent Context:\n" + "\n".join([f"- {msg}" for msg in recent_history[-5:]])
+
+        prompt = f"""
+        You are an Intent Router.
+        
+        Current Expert: {current_expert_name} (category: {current_category})
+        {history_text}
+        User Message: "{user_message}"
+        
+        Available Categories:
+        {categories_desc}
+        
+        Task: Pick the category of experts that should handle the user message. If the request spans several categories, list them all.
+        
+        Output ONLY the category name(s), separated by commas if multiple.
+        """
+        try:
+            response_text = self._generate(prompt, list(self.categories), multiple=True)
+        except Exception:
+            print(f"{Colors.YELLOW}Router warning: Failed to pick a category. Considering every expert.{Colors.ENDC}")
+            return []
+        return self._match_categories(response_text)
+
+    def _match_categories(self, text: str) -> List[str]:
+        """
+        Maps the category stage's answer to category names. An expert name counts as its category.
+        """
+        chosen = []
+        for raw_name in self._split_names(text):
+            category = self._category_index.get(raw_name.lower())
+            if category is None and raw_name.lower() in self._name_index:
+                category = self.experts[self._name_index[raw_name.lower()]].category
+            if category and category not in chosen:
+                chosen.append(category)
+        return chosen
+
+    def _generate(self, prompt: str, choices: List[str], multiple: bool) -> str:
+        """Sends one routing prompt and returns the raw answer text."""
+        # We wrap the prompt in a Message object
+        messages = [Message(role="user", content=prompt)]
+        
+        try:
+            kwargs = dict(GenerationConfig.combine(self.generation), **self._routing_constraints(choices, multiple))
+            response_text = self.llm.generate(messages=messages, model=self.model_name, **kwargs)
+            metrics.ROUTING_CALLS.inc(status="ok")
+        except Exception:
+            metrics.ROUTING_CALLS.inc(status="error")
+            raise
+        
+        # Handle generator if streaming is enabled by default (though classify shouldn't stream)
+        if hasattr(response_text, '__iter__') and not isinstance(response_text, str):
+            response_text = StreamBuffer().consume(response_text)
+        return response_text
+
+    def _classify(self, user_message: str, current_expert_name: str, recent_history: List[str] = None, candidates: Optional[List[str]] = None) -> List[str]:
         # Construct the classification prompt
-        experts_desc = "\n".join([f"- '{name}': {expert.description}" for name, expert in self.experts.items()])
+        experts_desc = self._experts_desc if candidates is None else self._describe(candidates)
         
         history_text = ""
         if recent_history:
@@ -43,6 +204,8 @@ class Router:
             task_instruction = "Task: Determine if the user's intent requires switching to a different expert, or multiple experts."
             rule_3 = "3. If the user's request involves topics from multiple experts (e.g. history AND math, or coding AND math), YOU MUST list them all (comma-separated)."
             output_instruction = 'Output ONLY the expert name(s), separated by commas if multiple.\n        Example: "history, math" or "coding, math"'
+            if self.structured:
+                output_instruction = 'Output ONLY a JSON list of expert names.\n        Example: ["history", "math"] or ["coding"]'
         else:
             task_instruction = "Task: Determine the SINGLE best expert to handle the user message."
             rule_3 = "3. Select the one expert that best matches the user's intent."
@@ -70,29 +233,9 @@ class Router:
         """
 
         try:
-            # We wrap the prompt in a Message object
-            messages = [Message(role="user", content=prompt)]
-            
-            response_text = self.llm.generate(messages=messages)
-            
-            # Handle generator if streaming is enabled by default (though classify shouldn't stream)
-            if hasattr(response_text, '__iter__') and not isinstance(response_text, str):
-                full_text = ""
-                for chunk in response_text:
-                    full_text += chunk
-                response_text = full_text
-
-            raw_experts = response_text.strip().split(',')
-            valid_experts = []
-            
-            # Validate
-            for raw_name in raw_experts:
-                clean_name = raw_name.strip().lower()
-                # We do a loose match or exact match
-                for name in self.experts.keys():
-                    if name.lower() == clean_name:
-                        valid_experts.append(name)
-                        break
+            response_text = self._generate(prompt, candidates or self._expert_names, self.enable_hybrid)
+
+            valid_experts = self._match_experts(response_text)
             
             if not valid_experts:
                 return [current_expert_name]
@@ -105,5 +248,121 @@ class Router:
             print(f"{Colors.YELLOW}Router warning: Failed to classify intent. Staying with {current_expert_name}.{Colors.ENDC}")
             return [current_expert_name]
 
+    def _routing_constraints(self, choices: List[str], multiple: bool) -> dict:
+        """
+        Generation constraints of a structured routing call. Providers map them to their native
+        options (Gemini enum/JSON schema, vLLM guided decoding, Ollama format); others ignore them.
+        """
+        if not self.structured:
+            return {}
+        return {
+            "max_tokens": self._route_max_tokens if choices is self._expert_names else self._max_tokens(choices, multiple),
+            "stop": ["\n"],
+            "choices": choices,
+            "multiple_choices": multiple,
+        }
+
+    @staticmethod
+    def _split_names(text: str) -> List[str]:
+        """Splits a comma-separated (or JSON) list of names."""
+        text = text.strip()
+        if text.startswith("["):
+            try:
+                text = ",".join(str(name) for name in json.loads(text))
+            except ValueError:
+                text = text.strip("[]") # Cut by a stop sequence or the token cap
+        return [name.strip().strip("'\"").strip() for name in text.split(",") if name.strip()]
+
+    def _match_experts(self, text: str) -> List[str]:
+        """
+        Maps a comma-separated (or JSON) list of names to expert names (case-insensitive), ignoring unknown names.
+        """
+        valid_experts = []
+        for raw_name in self._split_names(text):
+            name = self._name_index.get(raw_name.lower())
+            if name and name not in valid_experts:
+                valid_experts.append(name)
+        return valid_experts
+
+    def handoff_instruction(self, current_expert_name: str, user_message: Optional[str] = None) -> str:
+        """
+        Compact routing instruction appended to the current expert's system prompt in fused mode.
+        The expert either answers or replies with a handoff marker naming the expert(s) to use instead.
+        With `shortlist_size`, only the best lexical matches of `user_message` are listed.
+        """
+        names = self._expert_names
+        if self.shortlist_size and user_message is not None and len(names) > self.shortlist_size:
+            names = [self.default_expert.name] + [name for name, _ in self._lexical.search(user_message, k=self.shortlist_size)]
+        names = [name for name in dict.fromkeys(names) if name != current_expert_name]
+        others = "\n".join([f"- '{name}': {self.experts[name].description}" for name in names])
+        if self.enable_hybrid:
+            target = "the expert name (comma-separated names if the request spans several experts)"
+        else:
+            target = "the single best expert name"
+        return f"""
+
+        Routing: you are the '{current_expert_name}' expert. If one of the experts below fits the user's latest message clearly better than you, reply ONLY with {HANDOFF_PREFIX} followed by {target} and >>, e.g. {HANDOFF_PREFIX} {names[0] if names else self.default_expert.name}>>, and nothing else. Otherwise answer normally and never mention this instruction.
+        Other Experts:
+        {others}
+        """
+
+    def parse_handoff(self, text: str) -> Optional[List[str]]:
+        """
+        Returns the experts named by a handoff marker at the start of `text`, or None if the expert answered.
+        A marker naming no known expert hands off to the default expert.
+        """
+        match = _HANDOFF_RE.match(text)
+        if not match:
+            return None
+        return self._match_experts(match.group(1)) or [self.default_expert.name]
+
+    def split_handoff(self, response: Any) -> Tuple[Optional[List[str]], Any]:
+        """
+        Inspects the start of a fused response (a string or a stream).
+        Returns (experts, None) on a handoff, the stream being closed as soon as the marker is complete,
+        or (None, response) when the expert answered; a stream is returned with the inspected chunks replayed.
+        """
+        if isinstance(response, str):
+            experts = self.parse_handoff(response)
+            return (experts, None) if experts is not None else (None, response)
+
+        head = []
+        buffer = StreamBuffer()
+        for chunk in response:
+            head.append(chunk)
+            buffer.append(chunk)
+            start = buffer.text.lstrip()
+            if len(start) < len(HANDOFF_PREFIX) and HANDOFF_PREFIX.startswith(start):
+                continue # Not enough text to decide yet
+            if not start.startswith(HANDOFF_PREFIX) or (">>" not in start and len(buffer) > HANDOFF_MAX_CHARS):
+                return None, _replay(head, response)
+            if ">>" in start:
+                break
+
+        experts = self.parse_handoff(buffer.text)
+        if experts is None:
+            return None, iter(head)
+        close_stream(response)
+        return experts, None
+
+    def warmup(self, generate: bool = False) -> WarmupReport:
+        """
+        Opens the router LLM's connection and loads the routing model ahead of the first turn.
+        With `generate=True`, also runs one classification (warming the server's cache of the routing prompt).
+        """
+        started_at = time.perf_counter()
+        report = WarmupReport()
+        timings = report.measure("router.llm", lambda: self.llm.warmup([self.model_name] if self.model_name else None))
+        for model, seconds in (timings or {}).items():
+            report.timings[f"router.llm/{model}"] = seconds
+        if generate:
+            self._warm_classify(report)
+        report.total_seconds = time.perf_counter() - started_at
+        return report
+
+    def _warm_classify(self, report: WarmupReport) -> None:
+        name = self.default_expert.name
+        report.measure("router.classify", lambda: self._classify("Hello", name, [], self._candidates("Hello", name)))
+
     def get_expert(self, name: str) -> Expert:
         return self.experts.get(name, self.default_expert)
@@ -1,155 +1,511 @@
-import os
-import json
-import datetime
+import time
+import contextvars
 import concurrent.futures
-from typing import Dict, List, Any, Optional
-from .types import Expert, Message, TurnResponse
+from typing import Dict, List, Any, Optional, Iterable, Union, Callable
+from .types import Expert, Message, TurnResponse, WarmupReport, GenerationConfig
 from .router import Router
-from .memory import PNNet
+from .memory import PNNet, RetrievalMemory
+from .history import ConversationHistory, HistoryRecord
 from .llm.base import BaseLLM
 from .llm.mock import MockLLM
 from .utils import Colors
+from .streaming import StreamBuffer, close_stream
+from .batch import BatchReport, process_batch
+from .debug_log import DebugLogWriter
+from .journal import SessionJournal
+from .tracing import Tracer, NOOP_TRACER, span
+from .speculation import SpeculativeGeneration, SpeculationStats, can_speculate
+from .synthesis import SynthesisStrategy, LLMSynthesis, EXPERT_ERROR_PREFIX, is_failed_answer
+from .context import session_key, deadline_after, remaining_time, CancelToken, cancel_scope, current_cancel_token
+from . import metrics
 
 class Flow:
-    def __init__(self, router: Router, llm: BaseLLM, debug: bool = False, optimize: bool = False, parallel_execution: bool = False):
+    # Assumed stage durations (seconds) until the flow has timed its own, used to plan turns with a deadline
+    DEFAULT_STAGE_SECONDS = {"routing": 0.5, "expert": 2.0, "synthesis": 2.0, "summarize": 1.5}
+
+    def __init__(self, router: Router, llm: BaseLLM, debug: bool = False, optimize: bool = False, parallel_execution: bool = False, debug_writer: Optional[DebugLogWriter] = None, tracer: Optional[Tracer] = None, speculative: bool = False, fused_routing: bool = False, synthesis_model: Optional[str] = None, turn_deadline: Optional[float] = None, synthesis_generation: Optional[GenerationConfig] = None, summary_generation: Optional[GenerationConfig] = None, synthesis: Optional[SynthesisStrategy] = None, memory: Optional[RetrievalMemory] = None, journal: Optional[SessionJournal] = None):
         self.router = router
+        self.tracer = tracer or NOOP_TRACER
         self.llm = llm
         self.debug = debug
         self.optimize = optimize
         self.parallel_execution = parallel_execution
         self._mock_notice_shown = False
+
+        # Speculative mode: the current expert starts answering while the router classifies
+        self.speculative = speculative
+        self.speculation_stats = SpeculationStats()
+        self._speculation_executor = None
+
+        # Fused routing: the current expert answers or hands off, no separate router call
+        self.fused_routing = fused_routing
+
+        # How hybrid answers are merged (default: the default expert writes a synthesis,
+        # with synthesis_model if given, None = the default expert's model)
+        self.synthesis = synthesis or LLMSynthesis(model=synthesis_model)
+        self.synthesis_model = self.synthesis.model
+        # Generation settings of the synthesis (on top of the default expert's) and of history summaries
+        self.synthesis_generation = synthesis_generation
+        self.summary_generation = summary_generation
+
+        # Long-term memory: experts get the relevant past turns plus the recent ones instead of the whole history
+        self.memory = memory
+
+        # Default time budget of a turn in seconds (None = no deadline), and the observed stage durations
+        self.turn_deadline = turn_deadline
+        self._stage_seconds: Dict[str, float] = {}
             
         # In-memory storage for demo purposes. 
         # In production, this should be replaced by a persistent store (Redis/Mongo).
         self._sessions: Dict[str, Dict[str, Any]] = {} 
+        # Crash-safe persistence: each turn is appended to the journal, sessions are restored from it on first use
+        self.journal = journal
         
-        # Ensure debug cache directory exists
+        # Debug traces are appended to debug-cache/ by a background writer
+        self._debug_writer = None
         if self.debug:
-            os.makedirs("debug-cache", exist_ok=True)
+            self._debug_writer = debug_writer or DebugLogWriter()
+
+    def _restore_session(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Rebuilds a session from the journal (None if it has no record there)."""
+        if self.journal is None:
+            return None
+        state = self.journal.load(user_id)
+        if state is None:
+            return None
+        expert_name = state["current_expert"]
+        if expert_name not in self.router.experts:
+            expert_name = self.router.default_expert.name
+        session = self._sessions[user_id] = {
+            "history": ConversationHistory(state["history"]),
+            "current_expert": expert_name
+        }
+        metrics.ACTIVE_SESSIONS.inc()
+        return session
 
     def _get_session(self, user_id: str) -> Dict[str, Any]:
-        if user_id not in self._sessions:
+        if user_id not in self._sessions and self._restore_session(user_id) is None:
             self._sessions[user_id] = {
-                "history": [],
+                "history": ConversationHistory(),
                 "current_expert": self.router.default_expert.name
             }
+            metrics.ACTIVE_SESSIONS.inc()
         return self._sessions[user_id]
 
-    def _log_debug_memory(self, user_id: str, expert_name: str, history: List[Message]):
+    def _drop_session(self, user_id: str) -> None:
+        if self._sessions.pop(user_id, None) is not None:
+            metrics.ACTIVE_SESSIONS.dec()
+        if self.memory is not None:
+            self.memory.forget(user_id)
+
+    def _log_debug_turn(self, user_id: str, expert_name: str, routed: List[str], switched: bool, sanitized: bool, new_messages: List[HistoryRecord], history: ConversationHistory, summary: Optional[str]):
         """
-        Logs the memory context to a file for debugging purposes.
-        Overwrites the file for the same user to keep a single debug file.
+        Queues the changes of this turn for the background debug writer.
+        Only the new messages and the routing decision are logged; use
+        gentis_ai.debug_log.load_debug_session to rebuild the full state of a session.
         """
-        if not self.debug:
+        if not self.debug or self._debug_writer is None:
             return
 
-        filename = f"debug-cache/{user_id}_debug.json"
-        
+        self._debug_writer.log_turn(user_id, {
+            "expert": expert_name,
+            "routed": routed,
+            "switched": switched,
+            "sanitized": sanitized,
+            "messages": [{"role": m.role, "content": m.content, "expert": m.expert} for m in new_messages],
+            "history_len": len(history),
+            "summary": summary,
+        })
+
+    def close(self):
+        """
+        Flushes and stops background workers (debug log writer, session journal, speculative generations).
+        """
+        if self._debug_writer is not None:
+            self._debug_writer.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self._speculation_executor is not None:
+            self._speculation_executor.shutdown(wait=False)
+            self._speculation_executor = None
+
+    def warmup(self, generate: bool = False, concurrency: int = 8) -> WarmupReport:
+        """
+        Prepares what the first turn would otherwise pay for: provider connections, model loads
+        (the default model, every expert's model and the synthesis model) and the router.
+        With `generate=True`, also runs one routing call and a one-token answer per expert, concurrently,
+        which warms the server-side caches of each system prompt.
+
+        Returns per-component timings; `report.ready` is False if a component failed (e.g. for readiness probes).
+        """
+        started_at = time.perf_counter()
+        report = WarmupReport()
+        models = {e.model_name for e in self.router.experts.values() if e.model_name}
+        if self.synthesis.uses_llm and self.synthesis.model:
+            models.add(self.synthesis.model)
+
+        def warm_llm():
+            timings = dict(self.llm.warmup())
+            if models:
+                timings.update(self.llm.warmup(sorted(models)))
+            return timings
+
+        def answer(expert: Expert):
+            kwargs = GenerationConfig.combine(expert.generation, GenerationConfig(max_tokens=1))
+            return self.llm.generate([Message(role="user", content="Hello")], system_prompt=expert.system_prompt, model=expert.model_name, **kwargs)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # 1. Connections and models first, so the generations below don't pay for them
+            llm_future = executor.submit(contextvars.copy_context().run, report.measure, "llm", warm_llm)
+            router_report = executor.submit(contextvars.copy_context().run, self.router.warmup, False).result()
+            for model, seconds in (llm_future.result() or {}).items():
+                report.timings[f"llm/{model}"] = seconds
+            report.merge(router_report)
+
+            # 2. Optional dry runs: one routing call and one answer per expert
+            if generate:
+                futures = [executor.submit(contextvars.copy_context().run, self.router._warm_classify, report)]
+                futures += [executor.submit(contextvars.copy_context().run, report.measure, f"expert:{name}", lambda expert=expert: answer(expert)) for name, expert in self.router.experts.items()]
+                concurrent.futures.wait(futures)
+
+        report.total_seconds = time.perf_counter() - started_at
+        for component, seconds in report.timings.items():
+            metrics.WARMUP_DURATION.set(seconds, component=component)
+        if self.debug:
+            print(f"{Colors.GREEN}Warmup done in {report.total_seconds:.2f}s{Colors.ENDC}" if report.ready else f"{Colors.YELLOW}Warmup failed for {list(report.errors)}{Colors.ENDC}")
+        return report
+
+    def _speculate(self, expert_name: str, history: ConversationHistory, message: str, stream: bool, generation: Optional[GenerationConfig] = None) -> Optional[SpeculativeGeneration]:
+        """
+        Starts answering with the current expert before routing is known.
+        Returns None when the expert has tools with side effects.
+        """
+        expert = self.router.get_expert(expert_name)
+        if not can_speculate(expert):
+            self.speculation_stats.record("skipped")
+            return None
+        if self._speculation_executor is None:
+            self._speculation_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="gentis-speculation")
+        msgs = history.view((HistoryRecord("user", message),))
+        return SpeculativeGeneration(self.llm, expert, msgs, stream=stream, generation_kwargs=GenerationConfig.combine(expert.generation, generation)).start(self._speculation_executor)
+
+    def _observe_stage(self, stage: str, seconds: float) -> None:
+        previous = self._stage_seconds.get(stage)
+        self._stage_seconds[stage] = seconds if previous is None else 0.3 * seconds + 0.7 * previous
+
+    def _expected_seconds(self, *stages: str) -> float:
+        # Merging without an LLM call takes no time worth planning for
+        return sum(0.0 if stage == "synthesis" and not self.synthesis.uses_llm else self._stage_seconds.get(stage, self.DEFAULT_STAGE_SECONDS[stage]) for stage in stages)
+
+    def _fits(self, *stages: str) -> bool:
+        """True if the turn's deadline leaves time for `stages` (always True without a deadline)."""
+        remaining = remaining_time()
+        return remaining is None or remaining >= self._expected_seconds(*stages)
+
+    def _plan_fanout(self, names: List[str], degradations: List[str]) -> List[str]:
+        """Cuts a hybrid fan-out down to what the turn's deadline leaves time for."""
+        if not self._fits("expert", "synthesis"):
+            # No time to consult several experts and merge their answers: the best match answers alone
+            degradations.append("synthesis_skipped")
+            return names[:1]
+        remaining = remaining_time()
+        if remaining is not None and not self.parallel_execution:
+            fit = int((remaining - self._expected_seconds("synthesis")) // self._expected_seconds("expert"))
+            if fit < 2:
+                degradations.append("synthesis_skipped")
+                return names[:1]
+            if fit < len(names):
+                degradations.append("fanout_capped")
+                return names[:fit]
+        return names
+
+    def _drain_stream(self, response_stream, started_at: Optional[float] = None, on_chunk: Optional[Callable[[str], Any]] = None) -> tuple:
+        """
+        Consumes a response generator, passing each chunk to on_chunk, or by default printing it to stdout
+        immediately (this gives the visual effect of streaming in the console).
+        Stops early, closing the stream, when the turn is cancelled or on_chunk raises (the consumer went away).
+        Returns the text received, the stream timing and whether the text was cut short.
+        """
+        buffer = StreamBuffer(track_timing=True, started_at=started_at)
+        cancel = current_cancel_token()
         try:
-            # Convert Message objects to serializable dicts
-            serializable_history = [msg.model_dump() for msg in history]
-            
-            # Wrap in a dict to include metadata since we removed it from filename
-            debug_data = {
-                "last_updated": datetime.datetime.now().isoformat(),
-                "current_expert": expert_name,
-                "history": serializable_history
-            }
+            for chunk in response_stream:
+                buffer.append(chunk)
+                if on_chunk is None:
+                    print(chunk, end="", flush=True)
+                else:
+                    try:
+                        on_chunk(chunk)
+                    except Exception as e:
+                        if cancel is None:
+                            raise
+                        cancel.cancel(f"consumer failed: {e}")
+                if cancel is not None and cancel.cancelled:
+                    break
+        finally:
+            close_stream(response_stream)
+        if on_chunk is None:
+            print() # Newline at the end
+        # A provider that saw the token ends its stream early on its own
+        truncated = cancel is not None and cancel.cancelled
+        return buffer.text, buffer.timing(), truncated
+
+    def _query_expert(self, name: str, history: ConversationHistory, message: str, generation: Optional[GenerationConfig] = None):
+        """
+        Asks one expert of a hybrid turn. Returns (name, response, tool_calls, token_usage).
+        """
+        expert = self.router.get_expert(name)
+        # Shared, copy-free view: History + New Message
+        msgs = history.view((HistoryRecord("user", message),))
+        with span("expert", expert=name, hybrid=True) as expert_span:
+            try:
+                # No streaming for sub-tasks, we need the full text to synthesize
+                started_at = time.perf_counter()
+                resp = self.llm.generate(messages=msgs, system_prompt=expert.system_prompt, tools=expert.tools, stream=False, model=expert.model_name, **GenerationConfig.combine(expert.generation, generation))
+                self._observe_stage("expert", time.perf_counter() - started_at)
+                calls = [dict(call, expert=name) for call in self.llm.get_tool_calls()]
+                # Read here: usage is per thread, and parallel experts run in worker threads
+                usage = dict(self.llm.get_token_usage())
+                self._annotate_llm_span(expert_span, usage, calls)
+                return name, resp, calls, usage
+            except Exception as e:
+                expert_span.record_error(e)
+                return name, f"{EXPERT_ERROR_PREFIX}{e}", [], {"total": 0}
+
+    def _fused_route(self, expert_name: str, history: ConversationHistory, message: str, stream: bool, generation: Optional[GenerationConfig] = None) -> tuple:
+        """
+        Sends the turn to the current expert with a compact routing instruction.
+        Returns (experts, answer): answer is the text or stream to use, or None if the expert handed off.
+        """
+        expert = self.router.get_expert(expert_name)
+        msgs = history.view((HistoryRecord("user", message),))
+        with span("route", current_expert=expert_name, fused=True) as route_span:
+            try:
+                response = self.llm.generate(
+                    messages=msgs,
+                    system_prompt=expert.system_prompt + self.router.handoff_instruction(expert_name, message),
+                    tools=expert.tools,
+                    stream=stream,
+                    model=expert.model_name,
+                    **GenerationConfig.combine(expert.generation, generation)
+                )
+                handoff, answer = self.router.split_handoff(response)
+            except Exception as e:
+                route_span.record_error(e)
+                print(f"{Colors.YELLOW}Router warning: Fused routing failed. Staying with {expert_name}.{Colors.ENDC}")
+                return [expert_name], None
+            route_span.set_attribute("experts", ",".join(handoff or [expert_name]))
+
+        metrics.FUSED_TURNS.inc(outcome="handoff" if handoff else "answered")
+        if handoff:
+            return handoff, None
+        return [expert_name], answer
+
+    @staticmethod
+    def _annotate_llm_span(llm_span, token_usage: Dict[str, int], tool_calls: List[Dict[str, Any]] = None, stream_timing: Optional[Dict[str, Any]] = None):
+        if not llm_span.recording:
+            return
+        llm_span.set_attribute("tokens.total", token_usage.get("total", 0))
+        if tool_calls:
+            llm_span.set_attribute("tool_calls", len(tool_calls))
+        if stream_timing:
+            llm_span.set_attribute("time_to_first_token_ms", stream_timing["time_to_first_chunk_ms"])
+
+    def process_turn(self, message: str, user_id: Optional[str] = None, stream: bool = False, deadline: Optional[float] = None, generation: Optional[GenerationConfig] = None, cancel: Optional[CancelToken] = None, on_chunk: Optional[Callable[[str], Any]] = None) -> TurnResponse:
+        """
+        Routes the message and answers it.
 
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(debug_data, f, indent=2)
-        except Exception as e:
-            print(f"Debug Log Error: {e}")
+        Args:
+            deadline: Seconds the turn may take (default: the flow's turn_deadline). When time runs short the turn
+                      degrades (skips routing, consults fewer experts, skips synthesis, defers summarization)
+                      and lists what it skipped in `TurnResponse.degradations`. Provider calls, rate-limit waits
+                      and tools are bounded by the time left.
+            generation: Settings overriding the experts' (and synthesis') generation config for this turn.
+            cancel: Token the consumer sets when it stops reading (e.g. its client disconnected). The streamed answer
+                    stops at the next chunk and its provider connection is closed; the text received so far is kept
+                    in the history and the response is flagged `truncated`.
+            on_chunk: Called with each chunk of a streamed answer instead of printing it. If it raises, the turn is
+                      cancelled as above.
+        """
+        started_at = time.perf_counter()
+        budget = deadline if deadline is not None else self.turn_deadline
+        cancel = cancel or current_cancel_token() or CancelToken()
+        with self.tracer.span("turn", **{"session.id": user_id, "stream": stream}) as turn_span, session_key(user_id), deadline_after(budget), cancel_scope(cancel):
+            response = self._process_turn(message, user_id, stream, generation, on_chunk)
+            turn_span.set_attributes({"expert": response.agent_name, "switched": response.switched_context, "tokens.total": response.token_usage.get("total", 0)})
+            if response.degradations:
+                turn_span.set_attribute("degradations", ",".join(response.degradations))
+            if response.truncated:
+                turn_span.set_attribute("truncated", True)
+            if response.error:
+                turn_span.set_attribute("error", response.error)
+
+        metrics.TURN_DURATION.observe(time.perf_counter() - started_at)
+        metrics.TURNS.inc(expert=response.agent_name)
+        metrics.EXPERT_TOKENS.inc(response.token_usage.get("total", 0), expert=response.agent_name)
+        if response.switched_context:
+            metrics.EXPERT_SWITCHES.inc()
+        for kind in response.degradations:
+            metrics.DEGRADATIONS.inc(kind=kind)
+        if response.truncated:
+            metrics.CANCELLED_TURNS.inc()
+        if turn_span.recording:
+            response.spans = [s.to_dict() for s in turn_span.trace_spans]
+        return response
 
-    def process_turn(self, message: str, user_id: Optional[str] = None, stream: bool = False) -> TurnResponse:
+    def _process_turn(self, message: str, user_id: Optional[str], stream: bool, generation: Optional[GenerationConfig] = None, on_chunk: Optional[Callable[[str], Any]] = None) -> TurnResponse:
         session = self._get_session(user_id)
         current_expert_name = session["current_expert"]
         history = session["history"]
+        # What the experts see of the history (with a long-term memory: recalled and recent turns only)
+        context = self.memory.context(user_id, history, message) if self.memory is not None else history
 
         # 1. Classify / Route
         # Extract simple text history for the router
         text_history = [f"{m.role}: {m.content}" for m in history[-5:]]
-        next_experts_names = self.router.classify(message, current_expert_name, text_history)
+        fused_answer = None
+        fused_outcome = None
+        speculation = None
+        degradations: List[str] = []
+        if self.fused_routing and len(self.router.experts) > 1:
+            fused_started_at = time.perf_counter()
+            next_experts_names, fused_answer = self._fused_route(current_expert_name, context, message, stream, generation)
+            fused_outcome = "answered" if fused_answer is not None else "handoff"
+        elif len(self.router.experts) > 1 and not self._fits("routing", "expert"):
+            # Not enough time left to route and then answer: the current expert answers
+            next_experts_names = [current_expert_name]
+            degradations.append("routing_skipped")
+        else:
+            if self.speculative:
+                speculation = self._speculate(current_expert_name, context, message, stream, generation)
+            # Routing may not use the time the answer needs
+            remaining = remaining_time()
+            routing_budget = max(0.0, remaining - self._expected_seconds("expert")) if remaining is not None else None
+            routing_started_at = time.perf_counter()
+            with deadline_after(routing_budget):
+                next_experts_names = self.router.classify(message, current_expert_name, text_history)
+            self._observe_stage("routing", time.perf_counter() - routing_started_at)
+
+        # The speculative answer is kept only if the router confirms the current expert
+        speculation_outcome = None
+        if speculation is not None:
+            if next_experts_names == [current_expert_name]:
+                speculation_outcome = "hit"
+                self.speculation_stats.record("hit", saved_ms=(time.perf_counter() - speculation.started_at) * 1000)
+            else:
+                speculation_outcome = "miss"
+                speculation.cancel(self.speculation_stats)
+                self.speculation_stats.record("miss")
+                speculation = None
+        elif self.speculative and not fused_outcome:
+            speculation_outcome = "skipped"
         
         response_text = ""
         token_usage = {"total": 0}
+        tool_calls = []
+        stream_timing = None
+        truncated = False
+        synthesis_strategy = None
         switched = False
+        sanitized = False
+        error = None
+
+        if len(next_experts_names) > 1:
+            next_experts_names = self._plan_fanout(next_experts_names, degradations)
         
         # --- Hybrid Routing Logic ---
         if len(next_experts_names) > 1:
             print(f"{Colors.CYAN}--------Hybrid Routing: Consulting {next_experts_names}------{Colors.ENDC}")
+            metrics.HYBRID_FANOUT.observe(len(next_experts_names))
             
             expert_responses = []
             
             if self.parallel_execution:
                 print(f"{Colors.BLUE}--- Executing in Parallel ---{Colors.ENDC}")
-                
-                def query_expert(name):
-                    expert = self.router.get_expert(name)
-                    msgs = history.copy()
-                    msgs.append(Message(role="user", content=message))
-                    try:
-                        # No streaming for sub-tasks
-                        resp = self.llm.generate(messages=msgs, system_prompt=expert.system_prompt, tools=expert.tools, stream=False)
-                        return f"[{name}]: {resp}"
-                    except Exception as e:
-                        return f"[{name}]: Error - {e}"
-
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    results = executor.map(query_expert, next_experts_names)
-                    expert_responses = list(results)
+                executor = concurrent.futures.ThreadPoolExecutor()
+                try:
+                    # Each expert runs in a copy of the current context so its span nests under the turn
+                    futures = [executor.submit(contextvars.copy_context().run, self._query_expert, name, context, message, generation) for name in next_experts_names]
+                    remaining = remaining_time()
+                    if remaining is not None:
+                        # Keep time to synthesize: experts still answering then are left out
+                        concurrent.futures.wait(futures, timeout=max(0.0, remaining - self._expected_seconds("synthesis")))
+                        if not any(f.done() for f in futures):
+                            concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                        if not all(f.done() for f in futures):
+                            degradations.append("fanout_capped")
+                    results = [f.result() for f in futures if f.done()]
+                finally:
+                    executor.shutdown(wait=False)
             else:
-                # 1. Collect responses from all experts (Sequential)
+                # 1. Collect responses from all experts (Sequential), while there is time to synthesize
+                results = []
                 for name in next_experts_names:
-                    expert = self.router.get_expert(name)
-                    # Prepare messages for this expert
-                    msgs = history.copy()
-                    msgs.append(Message(role="user", content=message))
-                    
-                    try:
-                        # No streaming for sub-tasks, we need the full text to synthesize
-                        resp = self.llm.generate(messages=msgs, system_prompt=expert.system_prompt, tools=expert.tools, stream=False)
-                        expert_responses.append(f"[{name}]: {resp}")
-                    except Exception as e:
-                        expert_responses.append(f"[{name}]: Error - {e}")
-            
-            # 2. Synthesize
-            synthesis_input = f"User Query: {message}\n\nExpert Opinions:\n" + "\n\n".join(expert_responses) + "\n\nSynthesize a helpful answer based on these opinions."
-            
-            # Use default expert (Orchestrator) for synthesis
-            synthesizer = self.router.default_expert
+                    if results and not self._fits("expert", "synthesis"):
+                        degradations.append("fanout_capped")
+                        break
+                    results.append(self._query_expert(name, context, message, generation))
+
+            # The turn's cost: every expert consulted, plus the synthesis call below
+            token_usage = {}
+            for name, response, calls, usage in results:
+                expert_responses.append((name, response))
+                tool_calls.extend(calls)
+                for key, value in usage.items():
+                    token_usage[key] = token_usage.get(key, 0) + value
+            if all(is_failed_answer(r[1]) for r in results):
+                error = results[0][1][len(EXPERT_ERROR_PREFIX):]
             
-            # Switch context to synthesizer if needed
-            if current_expert_name != synthesizer.name:
-                switched = True
-                session["current_expert"] = synthesizer.name
-                current_expert_name = synthesizer.name
+            if len(results) == 1 or not self._fits("synthesis"):
+                # Out of time to merge the answers: the best-ranked expert that answered replies alone
+                degradations.append("synthesis_skipped")
+                answered = [r for r in results if not is_failed_answer(r[1])] or results
+                next_expert_name, response_text, _, _ = answered[0]
+            else:
+                # 2. Synthesize (by default the default expert (Orchestrator) merges the answers)
+                synthesizer = self.router.default_expert
+                next_expert_name = synthesizer.name
+                synthesis_strategy = self.synthesis.name
+                metrics.SYNTHESES.inc(strategy=synthesis_strategy)
             
-            try:
-                # We pass the synthesis task to the LLM
-                synth_msgs = [Message(role="user", content=synthesis_input)]
-                
-                response_content = self.llm.generate(
-                    messages=synth_msgs,
-                    system_prompt=synthesizer.system_prompt,
-                    stream=stream
-                )
-                
-                if stream and hasattr(response_content, '__iter__') and not isinstance(response_content, str):
-                    full_text = ""
-                    for chunk in response_content:
-                        print(chunk, end="", flush=True)
-                        full_text += chunk
-                    print()
-                    response_text = full_text
-                else:
-                    response_text = response_content
-                    
-                token_usage = self.llm.get_token_usage()
+                with span("synthesis", expert=synthesizer.name, fan_out=len(next_experts_names), strategy=self.synthesis.name) as synthesis_span:
+                    try:
+                        started_at = time.perf_counter()
+                        next_expert_name, response_content = self.synthesis.synthesize(
+                            message,
+                            expert_responses,
+                            self.llm,
+                            synthesizer,
+                            stream=stream,
+                            **GenerationConfig.combine(synthesizer.generation, self.synthesis_generation, generation)
+                        )
                     
-            except Exception as e:
-                print(f"{Colors.RED}Synthesis Error: {e}{Colors.ENDC}")
-                response_text = f"Error during synthesis: {e}"
+                        if stream and isinstance(response_content, str):
+                            # Merged without an LLM: still handed to the consumer as one chunk
+                            response_content = iter((response_content,))
+                        if stream and hasattr(response_content, '__iter__') and not isinstance(response_content, str):
+                            response_text, stream_timing, truncated = self._drain_stream(response_content, started_at, on_chunk)
+                        else:
+                            response_text = response_content
+                        
+                        synthesis_usage = {"total": 0}
+                        if self.synthesis.uses_llm:
+                            self._observe_stage("synthesis", time.perf_counter() - started_at)
+                            synthesis_usage = self.llm.get_token_usage()
+                            for key, value in synthesis_usage.items():
+                                token_usage[key] = token_usage.get(key, 0) + value
+                        self._annotate_llm_span(synthesis_span, synthesis_usage, stream_timing=stream_timing)
+                        
+                    except Exception as e:
+                        synthesis_span.record_error(e)
+                        print(f"{Colors.RED}Synthesis Error: {e}{Colors.ENDC}")
+                        response_text = f"Error during synthesis: {e}"
+                        error = str(e)
+
+            # Switch context to whoever replied (the synthesizer, or a single expert)
+            switched = next_expert_name != current_expert_name
+            session["current_expert"] = next_expert_name
+            current_expert_name = next_expert_name
 
         else:
             # --- Single Expert Logic ---
@@ -160,6 +516,8 @@ class Flow:
                 print(f"{Colors.CYAN}--------Switched context from {current_expert_name} to {next_expert_name}------{Colors.ENDC}")
                 # Prune history to remove old system prompts
                 history = PNNet.sanitize_for_switch(history)
+                context = PNNet.sanitize_for_switch(context) if self.memory is not None else history
+                sanitized = True
                 session["current_expert"] = next_expert_name
                 current_expert_name = next_expert_name
 
@@ -171,55 +529,111 @@ class Flow:
             # Note: In a real chat session, we might not want to append system prompt to history list permanently
             # but send it as part of the request.
             
-            # 2.5 Debug Logging
-            # We log the history before appending the new message for debugging state
-            self._log_debug_memory(user_id, current_expert_name, history)
-
             # 3. Generate Response
-            try:
-                # Prepare messages for generation: History + New Message
-                # We don't modify the persistent history yet
-                messages_for_llm = history.copy()
-                messages_for_llm.append(Message(role="user", content=message))
-                
-                response_content = self.llm.generate(
-                    messages=messages_for_llm,
-                    system_prompt=current_expert.system_prompt,
-                    tools=current_expert.tools,
-                    stream=stream
-                )
-                
-                if stream and hasattr(response_content, '__iter__') and not isinstance(response_content, str):
-                    # If streaming, we consume the generator and print chunks to stdout immediately
-                    # This gives the visual effect of streaming in the console.
-                    full_text = ""
-                    for chunk in response_content:
-                        print(chunk, end="", flush=True) # <--- Print chunk immediately
-                        full_text += chunk
-                    print() # Newline at the end
-                    response_text = full_text
-                else:
-                    response_text = response_content
-                
-                token_usage = self.llm.get_token_usage()
+            if speculation is not None:
+                # The answer is already being generated (and its span recorded) in the background
+                try:
+                    if stream:
+                        response_text, stream_timing, truncated = self._drain_stream(speculation.chunks(), speculation.started_at, on_chunk)
+                    else:
+                        response_text = speculation.result()
+                    speculation.future.result()
+                    token_usage = speculation.token_usage
+                    tool_calls.extend(speculation.tool_calls)
+                except Exception as e:
+                    print(f"{Colors.RED}Error generating response: {e}{Colors.ENDC}")
+                    response_text = "I encountered a system error. Please check the console logs."
+                    error = str(e)
+            elif fused_answer is not None:
+                # The expert answered the fused request directly, the start of the stream was already read
+                with span("expert", expert=current_expert_name, hybrid=False, fused=True) as expert_span:
+                    try:
+                        if isinstance(fused_answer, str):
+                            response_text = fused_answer
+                        else:
+                            response_text, stream_timing, truncated = self._drain_stream(fused_answer, fused_started_at, on_chunk)
+                        token_usage = self.llm.get_token_usage()
+                        tool_calls.extend(self.llm.get_tool_calls())
+                        self._annotate_llm_span(expert_span, token_usage, tool_calls, stream_timing)
+                    except Exception as e:
+                        expert_span.record_error(e)
+                        print(f"{Colors.RED}Error generating response: {e}{Colors.ENDC}")
+                        response_text = "I encountered a system error. Please check the console logs."
+                        error = str(e)
+            else:
+                with span("expert", expert=current_expert_name, hybrid=False) as expert_span:
+                    try:
+                        # Prepare messages for generation: History + New Message
+                        # We don't modify the persistent history yet (the view copies nothing)
+                        messages_for_llm = context.view((HistoryRecord("user", message),))
+                    
+                        started_at = time.perf_counter()
+                        response_content = self.llm.generate(
+                            messages=messages_for_llm,
+                            system_prompt=current_expert.system_prompt,
+                            tools=current_expert.tools,
+                            stream=stream,
+                            model=current_expert.model_name,
+                            **GenerationConfig.combine(current_expert.generation, generation)
+                        )
+                    
+                        if stream and hasattr(response_content, '__iter__') and not isinstance(response_content, str):
+                            response_text, stream_timing, truncated = self._drain_stream(response_content, started_at, on_chunk)
+                        else:
+                            response_text = response_content
+                        self._observe_stage("expert", time.perf_counter() - started_at)
+                    
+                        token_usage = self.llm.get_token_usage()
+                        tool_calls.extend(self.llm.get_tool_calls())
+                        self._annotate_llm_span(expert_span, token_usage, tool_calls, stream_timing)
 
-            except Exception as e:
-                print(f"{Colors.RED}Error generating response: {e}{Colors.ENDC}")
-                if "API_KEY_INVALID" in str(e) or "API key not valid" in str(e):
-                    print(f"{Colors.YELLOW}API key is required. Provide it directly or set GOOGLE_API_KEY in the environment. \nIf you don't have one, create one for free at https://aistudio.google.com/api-keys/{Colors.ENDC}")
-                response_text = "I encountered a system error. Please check the console logs."
+                    except Exception as e:
+                        expert_span.record_error(e)
+                        print(f"{Colors.RED}Error generating response: {e}{Colors.ENDC}")
+                        if "API_KEY_INVALID" in str(e) or "API key not valid" in str(e):
+                            print(f"{Colors.YELLOW}API key is required. Provide it directly or set GOOGLE_API_KEY in the environment. \nIf you don't have one, create one for free at https://aistudio.google.com/api-keys/{Colors.ENDC}")
+                        response_text = "I encountered a system error. Please check the console logs."
+                        error = str(e)
 
         # 4. Update History
         # We append the user message and the assistant response to our internal history
-        history.append(Message(role="user", content=message, metadata={"expert": current_expert_name}))
-        history.append(Message(role="assistant", content=response_text, metadata={"expert": current_expert_name}))
+        new_messages = [
+            history.append("user", message, expert=current_expert_name),
+            # A cut-short answer is kept as sent, flagged so the next turns (and logs) can tell
+            history.append("assistant", response_text, expert=current_expert_name, **({"truncated": True} if truncated else {})),
+        ]
         
+        if self.memory is not None:
+            self.memory.remember(user_id, message, response_text)
+
         # Prune if too long
-        session["history"] = PNNet.prune(history)
+        with span("prune", before=len(history)) as prune_span:
+            session["history"] = PNNet.prune(history)
+            prune_span.set_attribute("after", len(session["history"]))
 
         # Summarize if optimize is enabled
-        if self.optimize:
-             session["history"] = PNNet.summarize_if_needed(session["history"], self.llm)
+        summary = None
+        if self.optimize and not self._fits("summarize") and PNNet.needs_summary(session["history"], self.llm):
+            # The history is checked again at the end of the next turn
+            degradations.append("summarization_deferred")
+        elif self.optimize:
+            with span("summarize") as summarize_span:
+                pruned = session["history"]
+                started_at = time.perf_counter()
+                session["history"] = PNNet.summarize_if_needed(pruned, self.llm, generation=self.summary_generation)
+                if session["history"] is not pruned:
+                    summary = session["history"][0].content
+                    self._observe_stage("summarize", time.perf_counter() - started_at)
+                summarize_span.set_attribute("summarized", summary is not None)
+
+        # Debug Logging (non-blocking)
+        self._log_debug_turn(user_id, current_expert_name, next_experts_names, switched, sanitized, new_messages, session["history"], summary)
+
+        if self.journal is not None:
+            try:
+                self.journal.record_turn(user_id, session["current_expert"], new_messages, sanitized, len(session["history"]), summary)
+            except Exception as e:
+                print(f"{Colors.RED}Journal Error: {e}{Colors.ENDC}")
 
         # Check for MockLLM notice (Show only once)
         if isinstance(self.llm, MockLLM) and not self._mock_notice_shown:
@@ -241,9 +655,50 @@ class Flow:
              print(f"└────────────────────────────────────────────────────────────────────────┘{Colors.ENDC}")
              self._mock_notice_shown = True
 
+        metadata = {}
+        if speculation_outcome:
+            metadata["speculation"] = speculation_outcome
+        if fused_outcome:
+            metadata["fused_routing"] = fused_outcome
+        if synthesis_strategy:
+            metadata["synthesis"] = synthesis_strategy
+        if tool_calls:
+            metadata["tool_calls"] = tool_calls
+        if stream_timing:
+            metadata["stream"] = stream_timing
+
         return TurnResponse(
             content=response_text,
             agent_name=current_expert_name,
             switched_context=switched,
-            token_usage=token_usage
+            token_usage=token_usage,
+            metadata=metadata,
+            degradations=degradations,
+            truncated=truncated,
+            error=error
         )
+
+    def get_history(self, user_id: Optional[str] = None) -> List[Message]:
+        """
+        Returns the conversation history of a session as Message objects.
+        """
+        session = self._sessions.get(user_id) or self._restore_session(user_id)
+        return session["history"].to_messages() if session else []
+
+    def process_batch(self, conversations: Union[str, Iterable[Dict[str, Any]]], output_path: Optional[str] = None, concurrency: int = 4, resume: bool = True, keep_sessions: bool = False, on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> BatchReport:
+        """
+        Replays many independent conversations (offline evaluation).
+
+        Args:
+            conversations: Path to a JSONL file ({"id": ..., "turns": [...]} per line) or an iterable of such dicts.
+            output_path: Optional JSONL file where one result line is appended per finished conversation.
+                         It also serves as the checkpoint: with resume=True, conversations already in it are skipped.
+            concurrency: Maximum number of conversations processed at the same time.
+            resume: Skip conversations already completed in output_path.
+            keep_sessions: Keep the sessions in memory after their conversation ends (dropped by default).
+            on_result: Optional callback receiving each conversation result as it completes.
+
+        Returns:
+            A BatchReport with throughput and token totals.
+        """
+        return process_batch(self, conversations, output_path=output_path, concurrency=concurrency, resume=resume, keep_sessions=keep_sessions, on_result=on_result)
@@ -0,0 +1,146 @@
+import time
+import queue
+import threading
+import contextvars
+import concurrent.futures
+from typing import Dict, List, Any, Iterator, Optional
+from .types import Expert
+from .llm.base import BaseLLM
+from .streaming import StreamBuffer, close_stream
+from .tools import tools_are_idempotent
+from . import tracing
+from . import metrics
+from .context import is_cancelled
+
+_DONE = object()
+
+
+def can_speculate(expert: Expert) -> bool:
+    """
+    An expert can answer before routing is confirmed only if a discarded answer has no side effects,
+    i.e. it has no tools or all its tools are declared idempotent (see `cached_tool`).
+    """
+    return tools_are_idempotent(expert.tools)
+
+
+class SpeculationStats:
+    """
+    Outcome counters of a Flow running in speculative mode.
+    """
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0 # Turns where the current expert has non-idempotent tools
+        self.wasted_tokens = 0 # Tokens spent on discarded answers
+        self.saved_ms = 0.0 # Routing time hidden behind generation on hits
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def record(self, outcome: str, saved_ms: float = 0.0) -> None:
+        with self._lock:
+            if outcome == "skipped":
+                self.skipped += 1
+            else:
+                self.attempts += 1
+                if outcome == "hit":
+                    self.hits += 1
+                    self.saved_ms += saved_ms
+                else:
+                    self.misses += 1
+        metrics.SPECULATIONS.inc(outcome=outcome)
+
+    def record_waste(self, tokens: int) -> None:
+        with self._lock:
+            self.wasted_tokens += tokens
+        metrics.SPECULATION_WASTED_TOKENS.inc(tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": self.hit_rate,
+                "wasted_tokens": self.wasted_tokens,
+                "saved_ms": self.saved_ms,
+            }
+
+
+class SpeculativeGeneration:
+    """
+    Generates the current expert's answer in the background while the router classifies the message.
+    Chunks are buffered in a queue: on a hit they are replayed (and the rest streamed) by the turn,
+    on a miss `cancel()` stops reading the provider stream and the answer is dropped.
+    """
+    def __init__(self, llm: BaseLLM, expert: Expert, messages: List[Any], stream: bool = False, generation_kwargs: Optional[Dict[str, Any]] = None):
+        self.llm = llm
+        self.expert = expert
+        self.messages = messages
+        self.stream = stream
+        self.generation_kwargs = generation_kwargs or {}
+        self.started_at = time.perf_counter()
+        self.token_usage: Dict[str, int] = {"total": 0}
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.future: Optional[concurrent.futures.Future] = None
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._cancelled = threading.Event()
+        self._span = tracing.NOOP_SPAN
+
+    def start(self, executor: concurrent.futures.Executor) -> "SpeculativeGeneration":
+        # Runs in a copy of the current context so the span nests under the turn
+        self.future = executor.submit(contextvars.copy_context().run, self._run)
+        return self
+
+    def _run(self) -> None:
+        with tracing.span("expert", expert=self.expert.name, hybrid=False, speculative=True) as spec_span:
+            self._span = spec_span
+            try:
+                response = self.llm.generate(messages=self.messages, system_prompt=self.expert.system_prompt, tools=self.expert.tools, stream=self.stream, model=self.expert.model_name, **self.generation_kwargs)
+                if isinstance(response, str):
+                    self._queue.put(response)
+                else:
+                    try:
+                        for chunk in response:
+                            if self._cancelled.is_set() or is_cancelled():
+                                break
+                            self._queue.put(chunk)
+                    finally:
+                        # Closing the generator drops the provider connection, so a cancelled stream stops generating
+                        close_stream(response)
+                self.token_usage = dict(self.llm.get_token_usage())
+                self.tool_calls = list(self.llm.get_tool_calls())
+                if spec_span.recording:
+                    spec_span.set_attribute("tokens.total", self.token_usage.get("total", 0))
+            except Exception as e:
+                spec_span.record_error(e)
+                self._queue.put(e)
+            finally:
+                self._queue.put(_DONE)
+
+    def chunks(self) -> Iterator[str]:
+        """Yields the answer chunks as they are produced. Provider errors are re-raised here."""
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def result(self) -> str:
+        """Blocks until the answer is complete and returns it."""
+        return StreamBuffer().consume(self.chunks())
+
+    def cancel(self, stats: Optional[SpeculationStats] = None) -> None:
+        """
+        Discards the answer. Tokens spent so far are added to `stats` once the provider call returns.
+        """
+        self._cancelled.set()
+        self._span.set_attribute("discarded", True)
+        if stats is not None and self.future is not None:
+            self.future.add_done_callback(lambda _: stats.record_waste(self.token_usage.get("total", 0)))
@@ -0,0 +1,91 @@
+import time
+from typing import List, Optional, Iterable, Iterator, Callable, Any
+
+
+def close_stream(stream: Any) -> None:
+    """
+    Closes a response stream if it supports it. Closing a provider generator runs its cleanup,
+    which drops the HTTP connection so the server stops generating.
+    """
+    close = getattr(stream, "close", None)
+    if close is not None:
+        close()
+
+
+class StreamBuffer:
+    """
+    Collects streamed text chunks without repeated string concatenation.
+    Chunks are kept in a list and joined only when the text is read; optional per-chunk
+    timestamps give time-to-first-chunk and inter-chunk latencies.
+    """
+    __slots__ = ("_chunks", "_length", "track_timing", "started_at", "chunk_times")
+
+    def __init__(self, track_timing: bool = False, started_at: Optional[float] = None):
+        """
+        Args:
+            track_timing: Record a timestamp per chunk.
+            started_at: time.perf_counter() value the request started at (defaults to now).
+        """
+        self._chunks: List[str] = []
+        self._length = 0
+        self.track_timing = track_timing
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.chunk_times: List[float] = []
+
+    def append(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        if self.track_timing:
+            self.chunk_times.append(time.perf_counter())
+
+    @property
+    def text(self) -> str:
+        """The text received so far (joined lazily, then cached as a single chunk)."""
+        if len(self._chunks) > 1:
+            self._chunks[:] = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    @property
+    def time_to_first_chunk(self) -> Optional[float]:
+        """Seconds between started_at and the first non-empty chunk (requires track_timing)."""
+        if not self.chunk_times:
+            return None
+        return self.chunk_times[0] - self.started_at
+
+    def chunk_latencies(self) -> List[float]:
+        """Seconds between consecutive chunks (requires track_timing)."""
+        times = self.chunk_times
+        return [b - a for a, b in zip(times, times[1:])]
+
+    def timing(self) -> dict:
+        """Summary of the stream timing in milliseconds, suitable for metadata and metrics."""
+        ttfc = self.time_to_first_chunk
+        gaps = self.chunk_latencies()
+        return {
+            "time_to_first_chunk_ms": ttfc * 1000 if ttfc is not None else None,
+            "chunks": len(self.chunk_times),
+            "max_chunk_gap_ms": max(gaps) * 1000 if gaps else 0.0,
+            "duration_ms": (self.chunk_times[-1] - self.started_at) * 1000 if self.chunk_times else 0.0,
+        }
+
+    def wrap(self, stream: Iterable[str]) -> Iterator[str]:
+        """Yields the chunks of `stream` while recording them."""
+        for chunk in stream:
+            self.append(chunk)
+            yield chunk
+
+    def consume(self, stream: Iterable[str], on_chunk: Optional[Callable[[str], Any]] = None) -> str:
+        """Drains `stream` (calling on_chunk for each chunk) and returns the full text."""
+        for chunk in stream:
+            self.append(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+        return self.text
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        return self.text
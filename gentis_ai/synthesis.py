@@ -0,0 +1,169 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Union, Iterator, Callable
+from .types import Expert, Message
+from .llm.base import BaseLLM
+from .index import BM25Index
+
+# (expert name, answer) pairs of a hybrid turn, best-ranked expert first
+Answers = List[Tuple[str, str]]
+# Answer recorded for an expert whose call failed (followed by the error)
+EXPERT_ERROR_PREFIX = "Error - "
+
+
+def is_failed_answer(text: str) -> bool:
+    return text.startswith(EXPERT_ERROR_PREFIX)
+
+
+def successful_answers(answers: Answers) -> Answers:
+    """The answers of the experts whose call succeeded (all of them if every call failed)."""
+    return [(name, answer) for name, answer in answers if not is_failed_answer(answer)] or answers
+
+
+def compress_answer(text: str, max_tokens: int) -> str:
+    """
+    Cuts `text` to about `max_tokens` tokens (4 characters each), ending on a sentence boundary
+    when one is close enough, so the kept part still reads as whole sentences.
+    """
+    max_chars = max(0, max_tokens) * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if end >= max_chars // 2:
+        cut = cut[:end + 1]
+    return cut.rstrip() + " …"
+
+
+def split_budget(lengths: List[int], budget: int) -> List[int]:
+    """
+    Shares `budget` tokens among answers of the given lengths (in tokens): short answers keep their full
+    length and what they leave unused goes to the longer ones. Returns the budget of each answer.
+    """
+    shares = [0] * len(lengths)
+    remaining = budget
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        fair = remaining // (len(order) - position)
+        shares[i] = min(lengths[i], fair)
+        remaining -= shares[i]
+    return shares
+
+
+class SynthesisStrategy(ABC):
+    """
+    Merges the answers of the experts consulted by a hybrid turn into the turn's reply.
+    """
+    name = "base"
+    uses_llm = False # Whether synthesize() calls a provider (deadline planning skips the synthesis time otherwise)
+    model: Optional[str] = None # Model of that call (None = the synthesizer expert's model)
+
+    @abstractmethod
+    def synthesize(self, message: str, answers: Answers, llm: BaseLLM, synthesizer: Expert, stream: bool = False, **kwargs) -> Tuple[str, Union[str, Iterator[str]]]:
+        """
+        Args:
+            message: The user's message.
+            answers: (expert name, answer) pairs, best-ranked expert first.
+            synthesizer: The router's default expert, which replies for merged answers.
+            kwargs: Generation settings of the synthesis call.
+
+        Returns:
+            The name of the expert the reply is attributed to, and the reply (a stream if stream=True and an LLM writes it).
+            Answers of failed experts (see is_failed_answer) should be left out.
+        """
+        pass
+
+
+class LLMSynthesis(SynthesisStrategy):
+    """
+    The synthesizer expert writes one reply from the experts' answers (the default strategy).
+    With `answer_budget`, the answers are cut to that many tokens in total before they are sent,
+    so the synthesis prompt no longer grows with the fan-out and the length of every answer.
+    """
+    name = "llm"
+    uses_llm = True
+
+    def __init__(self, model: Optional[str] = None, answer_budget: Optional[int] = None):
+        """
+        Args:
+            model: Model writing the synthesis, e.g. a smaller one than the experts' (None = the synthesizer expert's model).
+            answer_budget: Tokens of expert answers included in the prompt, shared among the experts (None = no limit).
+        """
+        self.model = model
+        self.answer_budget = answer_budget
+
+    def build_prompt(self, message: str, answers: Answers) -> str:
+        answers = successful_answers(answers)
+        if self.answer_budget is not None:
+            budgets = split_budget([len(answer) // 4 for _, answer in answers], self.answer_budget)
+            answers = [(name, compress_answer(answer, budget)) for (name, answer), budget in zip(answers, budgets)]
+        opinions = "\n\n".join(f"[{name}]: {answer}" for name, answer in answers)
+        return f"User Query: {message}\n\nExpert Opinions:\n{opinions}\n\nSynthesize a helpful answer based on these opinions."
+
+    def synthesize(self, message: str, answers: Answers, llm: BaseLLM, synthesizer: Expert, stream: bool = False, **kwargs) -> Tuple[str, Union[str, Iterator[str]]]:
+        response = llm.generate(
+            messages=[Message(role="user", content=self.build_prompt(message, answers))],
+            system_prompt=synthesizer.system_prompt,
+            stream=stream,
+            model=self.model or synthesizer.model_name,
+            **kwargs
+        )
+        return synthesizer.name, response
+
+
+class SectionedMerge(SynthesisStrategy):
+    """
+    No LLM call: the reply has one titled section per expert, in ranking order.
+    Paragraphs already given by a better-ranked expert are left out.
+    """
+    name = "sectioned"
+
+    def __init__(self, titles: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            titles: Section title per expert name (default: the name, e.g. "tech_support" -> "Tech Support").
+        """
+        self.titles = titles or {}
+
+    def synthesize(self, message: str, answers: Answers, llm: BaseLLM, synthesizer: Expert, stream: bool = False, **kwargs) -> Tuple[str, Union[str, Iterator[str]]]:
+        seen = set()
+        sections = []
+        for name, answer in successful_answers(answers):
+            paragraphs = []
+            for paragraph in answer.split("\n\n"):
+                key = " ".join(paragraph.split()).lower()
+                if key and key not in seen:
+                    seen.add(key)
+                    paragraphs.append(paragraph.strip())
+            if paragraphs:
+                title = self.titles.get(name) or name.replace("_", " ").title()
+                sections.append(f"**{title}**\n" + "\n\n".join(paragraphs))
+        return synthesizer.name, "\n\n".join(sections)
+
+
+class WinnerSynthesis(SynthesisStrategy):
+    """
+    No LLM call: the turn is answered by the single answer that best matches the message
+    (lexical BM25 score by default); ties go to the router's ranking. The winning expert keeps the conversation.
+    """
+    name = "winner"
+
+    def __init__(self, scorer: Optional[Callable[[str, str, str], float]] = None):
+        """
+        Args:
+            scorer: scorer(message, expert_name, answer) -> score, higher is better (default: BM25 of the message over the answers).
+        """
+        self.scorer = scorer
+
+    def synthesize(self, message: str, answers: Answers, llm: BaseLLM, synthesizer: Expert, stream: bool = False, **kwargs) -> Tuple[str, Union[str, Iterator[str]]]:
+        answers = successful_answers(answers)
+        if self.scorer is not None:
+            scores = [self.scorer(message, name, answer) for name, answer in answers]
+        else:
+            index = BM25Index()
+            for rank, (_, answer) in enumerate(answers):
+                index.add(rank, answer)
+            matches = dict(index.search(message, k=len(answers)))
+            scores = [matches.get(rank, 0.0) for rank in range(len(answers))]
+        # max() keeps the first (best-ranked) of equal scores
+        best = max(range(len(answers)), key=lambda rank: scores[rank])
+        return answers[best]
@@ -0,0 +1,280 @@
+import json
+import time
+import asyncio
+import inspect
+import functools
+import threading
+import contextvars
+import concurrent.futures
+from collections import OrderedDict
+from typing import List, Any, Dict, Optional, Callable, Tuple, Hashable
+from . import tracing
+from . import metrics
+from .context import remaining_time
+
+
+def tool_name(func: Callable) -> str:
+    """Returns the name a provider advertises for a tool callable."""
+    return getattr(func, "__name__", type(func).__name__)
+
+
+def tools_are_idempotent(tools: Optional[List[Callable]]) -> bool:
+    """True if running the tools again has no further side effects: there are none, or all are declared idempotent (see `cached_tool`)."""
+    return all(getattr(tool, "idempotent", False) for tool in tools or [])
+
+
+def run_tool(func: Callable, arguments: Dict[str, Any]) -> Any:
+    """
+    Calls a tool with keyword arguments.
+    Async tools are run to completion on a private event loop.
+    """
+    if inspect.iscoroutinefunction(func):
+        return asyncio.run(func(**arguments))
+    result = func(**arguments)
+    if inspect.isawaitable(result):
+        return asyncio.run(result)
+    return result
+
+
+def _timed_call(name: str, func: Callable, arguments: Dict[str, Any]) -> Tuple[Any, Optional[str], float]:
+    start = time.perf_counter()
+    with tracing.span("tool", **{"tool.name": name}) as span:
+        try:
+            result = run_tool(func, arguments)
+            error = None
+        except Exception as e:
+            result = f"Error executing tool: {e}"
+            error = str(e)
+            span.record_error(e)
+    elapsed = time.perf_counter() - start
+    metrics.TOOL_CALLS.inc(tool=name, status="error" if error else "ok")
+    metrics.TOOL_DURATION.observe(elapsed, tool=name)
+    return result, error, elapsed * 1000
+
+
+def execute_tool_calls(calls: List[Tuple[str, Any]], tool_map: Dict[str, Callable], timeout: Optional[float] = None, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Executes the tool calls requested by a model in one round.
+    Independent calls run concurrently; results come back in request order.
+
+    Args:
+        calls: (function_name, arguments) pairs. Arguments may be a dict or a JSON string.
+        tool_map: Mapping of function names to callables.
+        timeout: Optional per-tool timeout in seconds. A timed-out tool reports an error result.
+                 Tools never get more than the time left before the turn's deadline.
+        max_workers: Maximum number of tools running at the same time (defaults to len(calls)).
+
+    Returns:
+        One dict per call: {"name", "result" (str), "error" (str or None), "latency_ms"}.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+    jobs = []
+    for i, (name, arguments) in enumerate(calls):
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments.strip() else {}
+            except json.JSONDecodeError:
+                arguments = {}
+        arguments = dict(arguments or {})
+        if name not in tool_map:
+            results[i] = {"name": name, "result": f"Error: Tool '{name}' not found.", "error": "not_found", "latency_ms": 0.0}
+            continue
+        jobs.append((i, name, tool_map[name], arguments))
+
+    remaining = remaining_time()
+    if remaining is not None:
+        timeout = max(0.0, remaining) if timeout is None else min(timeout, max(0.0, remaining))
+
+    # A single call without a timeout doesn't need a thread
+    if len(jobs) == 1 and timeout is None:
+        i, name, func, arguments = jobs[0]
+        result, error, latency = _timed_call(name, func, arguments)
+        results[i] = {"name": name, "result": str(result), "error": error, "latency_ms": latency}
+        return results
+
+    if jobs:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(jobs))
+        try:
+            start = time.perf_counter()
+            # Each tool runs in a copy of the caller's context so its span nests under the current one
+            futures = [(i, name, executor.submit(contextvars.copy_context().run, _timed_call, name, func, arguments)) for i, name, func, arguments in jobs]
+            for i, name, future in futures:
+                remaining = None
+                if timeout is not None:
+                    # Tools started together, so each one gets `timeout` from the common start
+                    remaining = max(0.0, timeout - (time.perf_counter() - start))
+                try:
+                    result, error, latency = future.result(timeout=remaining)
+                    results[i] = {"name": name, "result": str(result), "error": error, "latency_ms": latency}
+                except concurrent.futures.TimeoutError:
+                    metrics.TOOL_CALLS.inc(tool=name, status="timeout")
+                    results[i] = {"name": name, "result": f"Error: Tool '{name}' timed out after {timeout}s.", "error": "timeout", "latency_ms": timeout * 1000}
+        finally:
+            # Don't block the turn on tools that timed out
+            executor.shutdown(wait=False)
+    return results
+
+
+class ToolCache:
+    """
+    Bounded, thread-safe cache of tool results with per-entry TTL.
+    Shared across sessions and providers; concurrent identical calls are coalesced into one backend call.
+    """
+    _MISSING = object()
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    def _count(self, tool: str, field: str) -> None:
+        stats = self._stats.setdefault(tool, {"hits": 0, "misses": 0})
+        stats[field] += 1
+
+    def _lookup(self, key: Hashable) -> Any:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return self._MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, tool: str, key: Hashable) -> Any:
+        """Returns the cached value or ToolCache._MISSING, updating hit/miss statistics."""
+        with self._lock:
+            value = self._lookup(key)
+            self._count(tool, "misses" if value is self._MISSING else "hits")
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_call(self, tool: str, key: Hashable, ttl: float, func: Callable[[], Any]) -> Any:
+        """
+        Returns the cached result for `key`, or calls `func` once and caches its result.
+        Callers asking for a key that is already being computed wait for that result.
+        Exceptions are propagated and never cached.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not self._MISSING:
+                self._count(tool, "hits")
+            else:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = concurrent.futures.Future()
+                    self._count(tool, "misses")
+                else:
+                    # Coalesced with a running call, the backend is not hit again
+                    self._count(tool, "hits")
+        if value is not self._MISSING:
+            tracing.current_span().set_attribute("cache.hit", True)
+            return value
+        tracing.current_span().set_attribute("cache.hit", not owner)
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit/miss statistics, overall and per tool.
+        """
+        with self._lock:
+            hits = sum(s["hits"] for s in self._stats.values())
+            misses = sum(s["misses"] for s in self._stats.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if (hits + misses) else 0.0,
+                "size": len(self._entries),
+                "evictions": self.evictions,
+                "tools": {name: dict(s) for name, s in self._stats.items()},
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every cached tool that doesn't bring its own cache
+default_tool_cache = ToolCache()
+
+
+def _default_key(args: tuple, kwargs: Dict[str, Any]) -> str:
+    return json.dumps([args, kwargs], sort_keys=True, default=repr)
+
+
+def cached_tool(ttl: float = 60.0, key: Optional[Callable[..., Hashable]] = None, cache: Optional[ToolCache] = None):
+    """
+    Declares a tool idempotent and caches its results for `ttl` seconds.
+
+    The wrapped function keeps its name, signature and docstring, so it can be passed in `Expert.tools`
+    for both Gemini automatic function calling and Ollama.
+
+    Args:
+        ttl: Time-to-live of a cached result, in seconds.
+        key: Optional function receiving the tool arguments and returning a hashable cache key
+             (defaults to the JSON of all arguments).
+        cache: The ToolCache to use (defaults to the shared `default_tool_cache`).
+
+    Example:
+        @cached_tool(ttl=300)
+        def get_plan_prices(plan: str) -> str:
+            ...
+    """
+    def decorator(func: Callable) -> Callable:
+        name = tool_name(func)
+        target = cache if cache is not None else default_tool_cache
+
+        def make_key(args, kwargs):
+            return (name, key(*args, **kwargs) if key else _default_key(args, kwargs))
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = make_key(args, kwargs)
+                value = target.get(name, cache_key)
+                tracing.current_span().set_attribute("cache.hit", value is not ToolCache._MISSING)
+                if value is not ToolCache._MISSING:
+                    return value
+                value = await func(*args, **kwargs)
+                target.set(cache_key, value, ttl)
+                return value
+            wrapper = async_wrapper
+        else:
+            @functools.wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                return target.get_or_call(name, make_key(args, kwargs), ttl, lambda: func(*args, **kwargs))
+            wrapper = sync_wrapper
+
+        wrapper.idempotent = True
+        wrapper.cache_ttl = ttl
+        wrapper.tool_cache = target
+        return wrapper
+    return decorator
@@ -0,0 +1,242 @@
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from typing import List, Any, Dict, Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("gentis_current_span", default=None)
+_current_tracer: contextvars.ContextVar = contextvars.ContextVar("gentis_current_tracer", default=None)
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    """
+    A timed unit of work (routing, an expert call, a tool call, ...).
+    The dict form follows the OpenTelemetry span data model (trace/span ids, parent, unix-nano times,
+    attributes, events, status) so it can be forwarded to any OTel-compatible backend.
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "events", "status", "trace_spans", "_tracer", "_tokens")
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = "OK"
+        self.trace_spans: List["Span"] = [] # Filled on root spans once the trace is finished
+        self._tracer = tracer
+        self._tokens = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.add_event("exception", type=type(error).__name__, message=str(error))
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self._tracer._on_end(self)
+
+    def __enter__(self) -> "Span":
+        self._tokens = (_current_span.set(self), _current_tracer.set(self._tracer))
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record_error(exc)
+        span_token, tracer_token = self._tokens
+        _current_span.reset(span_token)
+        _current_tracer.reset(tracer_token)
+        self.end()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": dict(self.attributes),
+            "events": list(self.events),
+            "status": self.status,
+        }
+
+
+class _NoOpSpan:
+    """Shared stand-in used when tracing is disabled. Every method does nothing."""
+    __slots__ = ()
+    recording = False
+    trace_spans = ()
+    duration_ms = None
+
+    def set_attribute(self, key, value): pass
+    def set_attributes(self, attributes): pass
+    def add_event(self, name, **attributes): pass
+    def record_error(self, error): pass
+    def end(self): pass
+    def to_dict(self): return {}
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb): pass
+
+
+NOOP_SPAN = _NoOpSpan()
+
+
+class SpanExporter:
+    """
+    Receives the spans of each finished trace (one trace per turn).
+    Subclass and override `export` to ship spans elsewhere.
+    """
+    def export(self, spans: List[Span]) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the most recent spans in memory (handy for tests and debugging)."""
+    def __init__(self, max_spans: int = 10000):
+        self.spans: deque = deque(maxlen=max_spans)
+
+    def export(self, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+
+
+class ConsoleExporter(SpanExporter):
+    """Prints one line per span, indented under its parent."""
+    def export(self, spans: List[Span]) -> None:
+        depth = {}
+        for span in sorted(spans, key=lambda s: s.start_ns):
+            level = depth.get(span.parent_id, -1) + 1
+            depth[span.span_id] = level
+            print(f"{'  ' * level}{span.name} {span.duration_ms:.1f}ms {span.attributes}")
+
+
+class OpenTelemetryExporter(SpanExporter):
+    """
+    Replays finished spans into an OpenTelemetry tracer (requires `opentelemetry-api`),
+    keeping their original timings and parent/child structure.
+    """
+    def __init__(self, tracer_provider: Any = None, name: str = "gentis_ai"):
+        if not otel_trace:
+            raise ImportError("opentelemetry-api package is required for OpenTelemetryExporter. Install it with `pip install opentelemetry-api`.")
+        provider = tracer_provider or otel_trace.get_tracer_provider()
+        self.tracer = provider.get_tracer(name)
+
+    def export(self, spans: List[Span]) -> None:
+        otel_spans = {}
+        for span in sorted(spans, key=lambda s: s.start_ns):
+            parent = otel_spans.get(span.parent_id)
+            context = otel_trace.set_span_in_context(parent) if parent is not None else None
+            otel_span = self.tracer.start_span(span.name, context=context, attributes=_otel_attributes(span.attributes), start_time=span.start_ns)
+            for event in span.events:
+                otel_span.add_event(event["name"], attributes=_otel_attributes(event["attributes"]), timestamp=event["time_unix_nano"])
+            if span.status == "ERROR":
+                otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+            otel_spans[span.span_id] = otel_span
+        for span in spans:
+            otel_spans[span.span_id].end(end_time=span.end_ns)
+
+
+def _otel_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # OTel only accepts primitives (and sequences of primitives)
+    return {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in attributes.items() if v is not None}
+
+
+class Tracer:
+    """
+    Creates spans and hands each finished trace to the exporter.
+
+    A disabled tracer (the default, see NOOP_TRACER) returns a shared no-op span, so the instrumentation
+    left in the code costs a function call and nothing else.
+    """
+    def __init__(self, exporter: Optional[SpanExporter] = None, enabled: bool = True):
+        self.exporter = exporter or SpanExporter()
+        self.enabled = enabled
+        self._open: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes) -> Span:
+        """
+        Starts a span, child of the current span if there is one. Use it as a context manager.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        if parent is not None and parent._tracer is not self:
+            parent = None
+        new_span = Span(self, name, parent, attributes)
+        if parent is None:
+            with self._lock:
+                self._open[new_span.trace_id] = []
+        return new_span
+
+    def _on_end(self, span: Span) -> None:
+        with self._lock:
+            spans = self._open.get(span.trace_id)
+            if spans is None:
+                # Child that outlived its trace (e.g. a timed-out tool), dropped
+                return
+            spans.append(span)
+            if span.parent_id is not None:
+                return
+            del self._open[span.trace_id]
+        span.trace_spans = spans
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            print(f"Trace Export Error: {e}")
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+
+NOOP_TRACER = Tracer(enabled=False)
+
+
+def current_tracer() -> Tracer:
+    return _current_tracer.get() or NOOP_TRACER
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def span(name: str, **attributes):
+    """Starts a span on the tracer of the current trace (no-op outside a traced turn)."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, **attributes)
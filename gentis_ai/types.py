@@ -1,5 +1,30 @@
+import time
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Callable
+
+class GenerationConfig(BaseModel):
+    """
+    Sampling and output settings of a generation call, mapped by each provider to its native parameters.
+    Unset fields keep the provider's defaults.
+    """
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    max_tokens: Optional[int] = None # Output cap (Gemini max_output_tokens, Ollama num_predict)
+    stop: Optional[List[str]] = None # Stop sequences
+    seed: Optional[int] = None
+
+    def to_kwargs(self) -> Dict[str, Any]:
+        return self.model_dump(exclude_none=True)
+
+    @staticmethod
+    def combine(*configs: Optional["GenerationConfig"]) -> Dict[str, Any]:
+        """Generate kwargs of several configs, later ones overriding the fields they set (None entries are skipped)."""
+        kwargs: Dict[str, Any] = {}
+        for config in configs:
+            if config is not None:
+                kwargs.update(config.to_kwargs())
+        return kwargs
 
 class Expert(BaseModel):
     """
@@ -8,8 +33,10 @@ class Expert(BaseModel):
     name: str
     system_prompt: str
     description: str
-    model_name: str = "gemini-2.0-flash" # Default model for this agent
+    model_name: Optional[str] = None # Model for this expert, e.g. "ollama/granite4:micro" with a ModelRegistry (None = the provider's default)
     tools: Optional[List[Any]] = None # List of callable tools
+    category: Optional[str] = None # Group used by hierarchical routing (see Router categories)
+    generation: Optional[GenerationConfig] = None # Sampling/output settings of this expert's answers
 
 class Message(BaseModel):
     """
@@ -27,3 +54,35 @@ class TurnResponse(BaseModel):
     agent_name: str
     switched_context: bool
     token_usage: Dict[str, int] = Field(default_factory=lambda: {"total": 0})
+    metadata: Dict[str, Any] = Field(default_factory=dict) # e.g. {"tool_calls": [{"name", "latency_ms", "error", ...}]}
+    spans: List[Dict[str, Any]] = Field(default_factory=list) # Timing spans of the turn (empty unless Flow has a tracer)
+    degradations: List[str] = Field(default_factory=list) # Steps cut short to meet the turn's deadline, e.g. ["routing_skipped"]
+    truncated: bool = False # The streamed answer was cut short because its consumer went away (see Flow.process_turn's cancel)
+    error: Optional[str] = None # Why the answer could not be produced (content is then a fallback message)
+
+class WarmupReport(BaseModel):
+    """
+    Result of Flow.warmup() / Router.warmup(): seconds spent per component, and the components that failed.
+    """
+    timings: Dict[str, float] = Field(default_factory=dict) # e.g. {"llm:gemini-2.0-flash": 0.42, "expert:sales": 0.8}
+    errors: Dict[str, str] = Field(default_factory=dict)
+    total_seconds: float = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return not self.errors
+
+    def measure(self, component: str, fn: Callable[[], Any]) -> Any:
+        """Runs one warmup step, recording its duration, or its error (the error is not raised)."""
+        started_at = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.errors[component] = str(e)
+            return None
+        self.timings[component] = time.perf_counter() - started_at
+        return result
+
+    def merge(self, other: "WarmupReport") -> None:
+        self.timings.update(other.timings)
+        self.errors.update(other.errors)
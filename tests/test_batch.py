@@ -0,0 +1,100 @@
+import os
+import json
+import tempfile
+import unittest
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys")
+        ]
+        self.mock_llm = MockLLM(
+            responses={"hello": "Hello there!", "buy": "Sure, what do you want?"},
+            routing_rules={"buy": "sales", "hello": "orchestrator"}
+        )
+        self.router = Router(self.experts, self.mock_llm)
+        self.flow = Flow(self.router, self.mock_llm)
+        self.conversations = [
+            {"id": f"conv-{i}", "turns": ["hello", "I want to buy"]} for i in range(6)
+        ]
+
+    def test_process_batch_keeps_turn_order(self):
+        results = []
+        report = self.flow.process_batch(self.conversations, concurrency=3, on_result=results.append)
+
+        self.assertEqual(report.conversations, 6)
+        self.assertEqual(report.turns, 12)
+        self.assertEqual(report.errors, 0)
+        self.assertGreater(report.token_usage["total"], 0)
+        for result in results:
+            self.assertEqual([t["agent_name"] for t in result["turns"]], ["orchestrator", "sales"])
+        # Sessions are dropped once their conversation is done
+        self.assertEqual(self.flow._sessions, {})
+
+    def test_process_batch_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, "input.jsonl")
+            output_path = os.path.join(tmp, "output.jsonl")
+            with open(input_path, "w", encoding="utf-8") as f:
+                for conv in self.conversations:
+                    f.write(json.dumps(conv) + "\n")
+
+            first = self.flow.process_batch(self.conversations[:4], output_path=output_path, concurrency=2)
+            self.assertEqual(first.conversations, 4)
+
+            second = self.flow.process_batch(input_path, output_path=output_path, concurrency=2)
+            self.assertEqual(second.skipped, 4)
+            self.assertEqual(second.conversations, 2)
+
+            with open(output_path, "r", encoding="utf-8") as f:
+                ids = {json.loads(line)["id"] for line in f}
+            self.assertEqual(ids, {c["id"] for c in self.conversations})
+
+    def test_conversations_without_id_get_a_fallback(self):
+        conversations = [{"turns": ["hello"]}, {"id": "conv-x", "turns": ["hello"]}, {"turns": ["I want to buy"]}]
+        results = []
+        report = self.flow.process_batch(conversations, concurrency=2, on_result=results.append)
+        self.assertEqual(report.conversations, 3)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual({r["id"] for r in results}, {"item-1", "conv-x", "item-3"})
+        self.assertNotIn("id", conversations[0])
+
+    def test_failed_turns_are_not_checkpointed(self):
+        class FlakyLLM(MockLLM):
+            down = True
+
+            def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+                if self.down and "buy" in messages[-1].content and "Intent Router" not in messages[-1].content:
+                    raise ConnectionError("provider down")
+                return super().generate(messages, system_prompt, tools, **kwargs)
+
+        llm = FlakyLLM(responses={"hello": "Hello there!"}, routing_rules={"buy": "sales"})
+        flow = Flow(Router(self.experts, llm), llm)
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "output.jsonl")
+            results = []
+            report = flow.process_batch(self.conversations[:2], output_path=output_path, on_result=results.append)
+            self.assertEqual(report.errors, 2)
+            self.assertEqual({r["error"] for r in results}, {"provider down"})
+            self.assertEqual(results[0]["turns"][-1]["error"], "provider down")
+
+            llm.down = False
+            second = flow.process_batch(self.conversations[:2], output_path=output_path)
+            self.assertEqual(second.skipped, 0) # Retried on resume
+            self.assertEqual(second.errors, 0)
+
+    def test_duplicate_ids_run_once(self):
+        conversations = [{"id": "same", "turns": ["hello"]}, {"id": "same", "turns": ["I want to buy"]}, {"id": "other", "turns": ["hello"]}]
+        results = []
+        report = self.flow.process_batch(conversations, concurrency=2, on_result=results.append)
+        self.assertEqual(report.conversations, 2)
+        self.assertEqual(report.duplicates, 1)
+        self.assertEqual([t["content"] for r in results if r["id"] == "same" for t in r["turns"]], ["Hello there!"])
+
+if __name__ == '__main__':
+    unittest.main()
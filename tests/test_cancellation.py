@@ -0,0 +1,141 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.types import Expert, Message
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.context import CancelToken, cancel_scope
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.ollama import OllamaLLM
+from gentis_ai.llm.pool import ReplicaPool
+from gentis_ai.metrics import LLM_REQUESTS
+
+
+class Upstream:
+    """A server stream: counts the chunks it produced and whether its connection was closed."""
+    def __init__(self, chunks=50):
+        self.chunks = chunks
+        self.produced = 0
+        self.closed = False
+
+    def __iter__(self):
+        try:
+            for i in range(self.chunks):
+                self.produced += 1
+                yield f"w{i} "
+        finally:
+            self.closed = True
+
+
+class StreamingLLM(MockLLM):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.upstreams = []
+
+    def generate(self, messages, system_prompt=None, tools=None, stream=False, **kwargs):
+        if not stream:
+            return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+        upstream = Upstream()
+        self.upstreams.append(upstream)
+        return iter(upstream)
+
+
+def make_flow(llm):
+    experts = [
+        Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt"),
+        Expert(name="sales", description="Sales", system_prompt="sales prompt"),
+    ]
+    return Flow(Router(experts, MockLLM(routing_rules={"buy": "sales"})), llm)
+
+
+class TestFlowCancellation(unittest.TestCase):
+    def test_consumer_failure_cancels_and_keeps_partial_text(self):
+        llm = StreamingLLM()
+        flow = make_flow(llm)
+        sent = []
+
+        def send(chunk):
+            if len(sent) == 3:
+                raise BrokenPipeError("client disconnected")
+            sent.append(chunk)
+
+        response = flow.process_turn("I want to buy", user_id="u", stream=True, on_chunk=send)
+        upstream = llm.upstreams[-1]
+        self.assertTrue(response.truncated)
+        self.assertTrue(upstream.closed)
+        self.assertLess(upstream.produced, upstream.chunks)
+        self.assertEqual(response.content, "w0 w1 w2 w3 ") # Includes the chunk the consumer failed to send
+        last = flow.get_history("u")[-1]
+        self.assertEqual(last.content, response.content)
+        self.assertTrue(last.metadata["truncated"])
+
+    def test_cancel_token_from_another_thread(self):
+        llm = StreamingLLM()
+        flow = make_flow(llm)
+        token = CancelToken()
+        first_chunk = threading.Event()
+        watcher = threading.Thread(target=lambda: first_chunk.wait(1.0) and token.cancel("disconnected"))
+        watcher.start()
+
+        def send(chunk):
+            first_chunk.set()
+            token.wait(1.0) # The client is slow to take the chunk, meanwhile it disconnects
+
+        response = flow.process_turn("I want to buy", user_id="u", stream=True, cancel=token, on_chunk=send)
+        watcher.join()
+        self.assertTrue(response.truncated)
+        self.assertEqual(response.content, "w0 ")
+        self.assertTrue(llm.upstreams[-1].closed)
+        self.assertEqual(token.reason, "disconnected")
+
+    def test_complete_stream_is_not_truncated(self):
+        llm = StreamingLLM()
+        response = make_flow(llm).process_turn("I want to buy", user_id="u", stream=True, on_chunk=lambda chunk: None)
+        self.assertFalse(response.truncated)
+        self.assertEqual(llm.upstreams[-1].produced, 50)
+
+
+class FakeOllamaClient:
+    def __init__(self):
+        self.upstream = None
+
+    def chat(self, **kwargs):
+        if not kwargs.get("stream"):
+            return {"message": {"content": "ok"}}
+        self.upstream = Upstream()
+        return ({"message": {"content": text}} for text in self.upstream)
+
+
+class TestProviderCancellation(unittest.TestCase):
+    def make_ollama(self):
+        with patch("gentis_ai.llm.ollama.ollama", SimpleNamespace(Client=lambda **_: FakeOllamaClient())):
+            return OllamaLLM("llama3")
+
+    def test_ollama_stops_reading_once_cancelled(self):
+        llm = self.make_ollama()
+        token = CancelToken()
+        cancelled_before = LLM_REQUESTS.labels(provider="OllamaLLM", model="llama3", status="cancelled").value
+        with cancel_scope(token):
+            stream = llm.generate([Message(role="user", content="hi")], stream=True)
+        received = []
+        for chunk in stream:
+            received.append(chunk)
+            token.cancel()
+        self.assertEqual(received, ["w0 "])
+        self.assertTrue(llm.client.upstream.closed)
+        self.assertEqual(LLM_REQUESTS.labels(provider="OllamaLLM", model="llama3", status="cancelled").value, cancelled_before + 1)
+
+    def test_early_close_reaches_the_upstream(self):
+        llm = self.make_ollama()
+        pool = ReplicaPool([llm], health_check=None)
+        stream = pool.generate([Message(role="user", content="hi")], stream=True)
+        next(stream)
+        stream.close() # The consumer stops iterating
+        self.assertTrue(llm.client.upstream.closed)
+        self.assertEqual(pool.stats()[0]["outstanding"], 0)
+        pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import time
+import unittest
+from gentis_ai.context import deadline_after, remaining_time, check_deadline, DeadlineExceeded
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.resilient import ResilientLLM, AllProvidersFailed
+from gentis_ai.tools import execute_tool_calls
+
+
+def make_flow(**kwargs):
+    experts = [
+        Expert(name="orchestrator", description="General", system_prompt="You are the orchestrator."),
+        Expert(name="sales", description="Sales", system_prompt="You are sales."),
+        Expert(name="support", description="Support", system_prompt="You are support."),
+        Expert(name="billing", description="Billing", system_prompt="You are billing."),
+    ]
+    rules = {"buy": "sales", "everything": "sales, support, billing"}
+    router_llm = MockLLM(routing_rules=rules)
+    return Flow(Router(experts, router_llm), MockLLM(responses={"buy": "Sales answer"}), **kwargs)
+
+
+class TestDeadlineContext(unittest.TestCase):
+    def test_nested_deadlines_only_shorten(self):
+        self.assertIsNone(remaining_time())
+        with deadline_after(1.0):
+            with deadline_after(10.0):
+                self.assertLessEqual(remaining_time(), 1.0)
+            with deadline_after(0.0):
+                with self.assertRaises(DeadlineExceeded):
+                    check_deadline()
+        self.assertIsNone(remaining_time())
+
+    def test_tools_bounded_by_deadline(self):
+        def slow_tool():
+            time.sleep(0.5)
+            return "done"
+
+        with deadline_after(0.05):
+            results = execute_tool_calls([("slow_tool", {})], {"slow_tool": slow_tool})
+        self.assertEqual(results[0]["error"], "timeout")
+
+    def test_resilient_timeout_bounded_by_deadline(self):
+        class Slow(MockLLM):
+            def generate(self, messages, **kwargs):
+                time.sleep(0.5)
+                return "late"
+
+        llm = ResilientLLM(Slow(), timeout=None)
+        started = time.perf_counter()
+        with deadline_after(0.05), self.assertRaises(AllProvidersFailed):
+            llm.generate([])
+        self.assertLess(time.perf_counter() - started, 0.4)
+
+
+class TestTurnDeadline(unittest.TestCase):
+    def test_no_deadline_no_degradation(self):
+        response = make_flow().process_turn("I want to buy", user_id="u")
+        self.assertEqual(response.agent_name, "sales")
+        self.assertEqual(response.degradations, [])
+
+    def test_routing_skipped(self):
+        response = make_flow().process_turn("I want to buy", user_id="u", deadline=0.1)
+        self.assertEqual(response.agent_name, "orchestrator")
+        self.assertEqual(response.degradations, ["routing_skipped"])
+
+    def test_synthesis_skipped(self):
+        flow = make_flow()
+        flow._stage_seconds.update({"routing": 0.01, "expert": 0.01, "synthesis": 10.0})
+        response = flow.process_turn("tell me everything", user_id="u", deadline=1.0)
+        self.assertEqual(response.agent_name, "sales")
+        self.assertIn("synthesis_skipped", response.degradations)
+
+    def test_synthesis_skipped_after_a_failed_expert(self):
+        class ExpertsLLM(MockLLM):
+            def generate(self, messages, system_prompt=None, **kwargs):
+                if system_prompt == "You are sales.":
+                    raise ConnectionError("sales is down")
+                if system_prompt == "You are support.":
+                    time.sleep(0.8)
+                    return super().generate(messages, system_prompt=system_prompt, **kwargs) + " from support"
+                return super().generate(messages, system_prompt=system_prompt, **kwargs)
+
+        experts = [Expert(name=n, description=n, system_prompt=f"You are {n}.") for n in ("sales", "support", "billing")]
+        flow = Flow(Router([Expert(name="orchestrator", description="General", system_prompt="You are the orchestrator.")] + experts, MockLLM(routing_rules={"everything": "sales, support, billing"})), ExpertsLLM())
+        flow._stage_seconds.update({"routing": 0.01, "expert": 0.01, "synthesis": 0.3})
+        response = flow.process_turn("tell me everything", user_id="u", deadline=1.0)
+        self.assertIn("synthesis_skipped", response.degradations)
+        self.assertEqual(response.agent_name, "support") # Not the failed best-ranked expert
+        self.assertTrue(response.content.endswith("from support"))
+        self.assertGreater(response.token_usage["total"], 0)
+
+    def test_fanout_capped(self):
+        flow = make_flow(turn_deadline=0.75)
+        flow._stage_seconds.update({"routing": 0.01, "expert": 0.3, "synthesis": 0.1})
+        response = flow.process_turn("tell me everything", user_id="u")
+        self.assertEqual(response.degradations, ["fanout_capped"])
+        self.assertEqual(response.agent_name, "orchestrator") # Synthesized
+
+    def test_summarization_deferred(self):
+        flow = make_flow(optimize=True)
+        flow._stage_seconds.update({"routing": 0.01, "expert": 0.01, "summarize": 10.0})
+        for _ in range(3):
+            response = flow.process_turn("hello " + "x" * 1000, user_id="u", deadline=1.0)
+        self.assertEqual(response.degradations, ["summarization_deferred"])
+        response = flow.process_turn("hello", user_id="u")
+        self.assertEqual(response.degradations, [])
+        self.assertEqual(flow.get_history("u")[0].role, "system") # Summarized once time allowed
+
+
+if __name__ == "__main__":
+    unittest.main()
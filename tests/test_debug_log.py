@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.debug_log import DebugLogWriter, load_debug_session
+
+class TestDebugLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys")
+        ]
+        self.mock_llm = MockLLM(
+            responses={"hello": "Hello there!", "buy": "Sure, what do you want?"},
+            routing_rules={"buy": "sales", "hello": "orchestrator"}
+        )
+        self.router = Router(self.experts, self.mock_llm)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reader_rebuilds_session_state(self):
+        writer = DebugLogWriter(directory=self.tmp.name, flush_interval=0.01, max_bytes=2000)
+        flow = Flow(self.router, self.mock_llm, debug=True, debug_writer=writer)
+        for text in ["hello", "I want to buy", "hello again", "buy more"] * 3:
+            flow.process_turn(text, user_id="user1")
+        flow.process_turn("hello", user_id="user2")
+        flow.close()
+
+        state = load_debug_session("user1", directory=self.tmp.name)
+        expected = [m.model_dump() for m in flow.get_history("user1")]
+        self.assertEqual(state["history"], expected)
+        self.assertEqual(state["current_expert"], "sales")
+        self.assertEqual(len(state["turns"]), 12)
+        # Small max_bytes forces rotation
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "debug.jsonl.1")))
+
+    def test_sampling_is_per_session(self):
+        writer = DebugLogWriter(directory=self.tmp.name, sample_rate=0.0)
+        self.assertFalse(writer.log_turn("user1", {"messages": []}))
+        writer.close()
+        self.assertEqual(writer.written, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+
+
+class CountingMockLLM(MockLLM):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def generate(self, messages, system_prompt=None, tools=None, stream=False, **kwargs):
+        self.calls += 1
+        text = super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+        if not stream:
+            return text
+        return iter([text[i:i + 3] for i in range(0, len(text), 3)])
+
+
+class TestFusedRouting(unittest.TestCase):
+    def setUp(self):
+        self.experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys"),
+            Expert(name="tech", description="Tech expert", system_prompt="tech sys")
+        ]
+        self.llm = CountingMockLLM(
+            responses={"hello": "Hello there!", "buy": "Sure, what do you want?"},
+            routing_rules={"buy": "sales", "laptop": "sales,tech"}
+        )
+        self.flow = Flow(Router(self.experts, self.llm), self.llm, fused_routing=True)
+
+    def test_staying_turn_makes_one_call(self):
+        response = self.flow.process_turn("hello", user_id="u1")
+        self.assertEqual(response.content, "Hello there!")
+        self.assertEqual(response.agent_name, "orchestrator")
+        self.assertEqual(response.metadata["fused_routing"], "answered")
+        self.assertEqual(self.llm.calls, 1)
+
+    def test_handoff_redispatches(self):
+        response = self.flow.process_turn("I want to buy", user_id="u1")
+        self.assertEqual(response.agent_name, "sales")
+        self.assertTrue(response.switched_context)
+        self.assertEqual(response.content, "Sure, what do you want?")
+        self.assertEqual(response.metadata["fused_routing"], "handoff")
+        self.assertEqual(self.llm.calls, 2)
+        # The handoff marker never reaches the history
+        self.assertNotIn("<<handoff", " ".join(m.content for m in self.flow.get_history("u1")))
+
+        # Next turn stays with sales in a single call
+        self.flow.process_turn("I want to buy more", user_id="u1")
+        self.assertEqual(self.llm.calls, 3)
+
+    def test_handoff_to_several_experts_is_hybrid(self):
+        response = self.flow.process_turn("which laptop?", user_id="u1")
+        self.assertEqual(response.agent_name, "orchestrator")
+        self.assertEqual(self.llm.calls, 4) # handoff, two experts, synthesis
+
+    def test_streamed_answer_and_handoff(self):
+        response = self.flow.process_turn("hello", user_id="u1", stream=True)
+        self.assertEqual(response.content, "Hello there!")
+        self.assertIn("stream", response.metadata)
+
+        response = self.flow.process_turn("I want to buy", user_id="u1", stream=True)
+        self.assertEqual(response.agent_name, "sales")
+        self.assertEqual(response.content, "Sure, what do you want?")
+
+    def test_split_handoff(self):
+        router = self.flow.router
+        self.assertEqual(router.split_handoff(iter(["  <<hand", "off: Sales, tech", ">>", "ignored"]))[0], ["sales", "tech"])
+        self.assertEqual(router.split_handoff("<<handoff: unknown>>")[0], ["orchestrator"])
+        experts, stream = router.split_handoff(iter(["<", "b>bold</b>"]))
+        self.assertIsNone(experts)
+        self.assertEqual("".join(stream), "<b>bold</b>")
+
+    def test_unclosed_marker_is_not_buffered_to_the_end(self):
+        consumed = []
+
+        def chunks():
+            yield "<<handoff: sales"
+            for i in range(1000):
+                consumed.append(i)
+                yield " and more text"
+
+        experts, stream = self.flow.router.split_handoff(chunks())
+        self.assertIsNone(experts)
+        self.assertLess(len(consumed), 50) # Forwarded once the cap is reached, not at the end of the stream
+        self.assertTrue("".join(stream).startswith("<<handoff: sales and more text"))
+
+if __name__ == '__main__':
+    unittest.main()
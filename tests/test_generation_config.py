@@ -0,0 +1,104 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.types import Expert, GenerationConfig, Message
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.memory import PNNet
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.ollama import OllamaLLM
+from gentis_ai.llm.vllm import VLLMLLM
+
+
+class RecordingLLM(MockLLM):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.calls.append((system_prompt, kwargs))
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+class FakeClient:
+    """Records the requests a provider sends to its client library."""
+    def __init__(self, response):
+        self.requests = []
+        self.response = response
+        self.chat = self
+        self.completions = self
+
+    def __call__(self, **kwargs): # ollama.Client.chat
+        self.requests.append(kwargs)
+        return self.response
+
+    def create(self, **kwargs): # OpenAI chat.completions.create
+        self.requests.append(kwargs)
+        return self.response
+
+
+def make_experts():
+    return [
+        Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt"),
+        Expert(name="sales", description="Sales", system_prompt="sales prompt", generation=GenerationConfig(temperature=0.2, max_tokens=64, stop=["END"])),
+        Expert(name="support", description="Support", system_prompt="support prompt"),
+    ]
+
+
+class TestGenerationConfig(unittest.TestCase):
+    def test_combine(self):
+        kwargs = GenerationConfig.combine(GenerationConfig(temperature=0.2, max_tokens=64), None, GenerationConfig(max_tokens=8))
+        self.assertEqual(kwargs, {"temperature": 0.2, "max_tokens": 8})
+
+    def test_expert_config_and_turn_override(self):
+        llm = RecordingLLM()
+        flow = Flow(Router(make_experts(), MockLLM(routing_rules={"buy": "sales"})), llm)
+        flow.process_turn("I want to buy", user_id="u")
+        self.assertEqual(llm.calls[-1][1], {"stream": False, "model": None, "temperature": 0.2, "max_tokens": 64, "stop": ["END"]})
+        flow.process_turn("buy more", user_id="u", generation=GenerationConfig(max_tokens=16))
+        self.assertEqual(llm.calls[-1][1]["max_tokens"], 16)
+        self.assertEqual(llm.calls[-1][1]["temperature"], 0.2)
+
+    def test_router_and_synthesis_configs(self):
+        router_llm = RecordingLLM(routing_rules={"both": "sales, support"})
+        router = Router(make_experts(), router_llm, generation=GenerationConfig(temperature=0.0, max_tokens=100), structured=True)
+        llm = RecordingLLM()
+        flow = Flow(router, llm, synthesis_generation=GenerationConfig(max_tokens=300))
+        flow.process_turn("I need both", user_id="u")
+        routing_kwargs = router_llm.calls[-1][1]
+        self.assertEqual(routing_kwargs["temperature"], 0.0)
+        self.assertLess(routing_kwargs["max_tokens"], 100) # Structured routing's own cap wins
+        synthesis_kwargs = llm.calls[-1][1]
+        self.assertEqual(synthesis_kwargs["max_tokens"], 300)
+
+    def test_summary_config(self):
+        llm = RecordingLLM()
+        history = [Message(role="user", content="x" * 600) for _ in range(6)]
+        PNNet.summarize_if_needed(history, llm, generation=GenerationConfig(max_tokens=120))
+        self.assertEqual(llm.calls[-1][1], {"max_tokens": 120})
+
+
+class TestProviderMapping(unittest.TestCase):
+    def test_ollama_options(self):
+        with patch("gentis_ai.llm.ollama.ollama", SimpleNamespace(Client=lambda **_: FakeClient({"message": {"content": "ok"}}))):
+            llm = OllamaLLM("llama3", temperature=0.9)
+        llm.generate([Message(role="user", content="hi")], **GenerationConfig(temperature=0.1, top_k=20, max_tokens=32, seed=7).to_kwargs())
+        request = llm.client.requests[-1]
+        self.assertEqual(request["options"], {"temperature": 0.1, "top_k": 20, "seed": 7, "num_predict": 32})
+        self.assertNotIn("temperature", request)
+
+    def test_vllm_parameters(self):
+        class Response:
+            usage = None
+            choices = [type("Choice", (), {"message": type("Msg", (), {"content": "ok"})()})()]
+
+        with patch("gentis_ai.llm.vllm.OpenAI", lambda **_: FakeClient(Response())):
+            llm = VLLMLLM(model_name="model")
+        llm.generate([Message(role="user", content="hi")], **GenerationConfig(temperature=0.1, top_k=20, max_tokens=32, stop=["\n"]).to_kwargs())
+        request = llm.client.requests[-1]
+        self.assertEqual((request["temperature"], request["max_tokens"], request["stop"]), (0.1, 32, ["\n"]))
+        self.assertEqual(request["extra_body"], {"top_k": 20})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from gentis_ai.history import ConversationHistory, HistoryRecord
+from gentis_ai.memory import PNNet
+from gentis_ai.types import Message
+
+class TestConversationHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = ConversationHistory()
+        for i in range(5):
+            self.history.append("user", f"q{i}", expert="sales")
+            self.history.append("assistant", f"a{i}", expert="sales")
+
+    def test_records_quack_like_messages(self):
+        record = self.history[-1]
+        self.assertEqual((record.role, record.content), ("assistant", "a4"))
+        self.assertEqual(record.metadata, {"expert": "sales"})
+        self.assertEqual(record.to_message(), Message(role="assistant", content="a4", metadata={"expert": "sales"}))
+        # Role and expert names are interned
+        self.assertIs(self.history[0].expert, self.history[1].expert)
+
+    def test_view_is_immutable_snapshot(self):
+        view = self.history.view((HistoryRecord("user", "new"),))
+        self.assertEqual(len(view), 11)
+        self.assertEqual(view[-1].content, "new")
+
+        self.history.append("user", "later")
+        PNNet.prune(self.history, max_turns=1)
+        self.assertEqual(len(self.history), 2)
+        # The view still sees the history as it was
+        self.assertEqual([m.content for m in view][:2], ["q0", "a0"])
+        self.assertEqual(len(view), 11)
+
+    def test_pnnet_on_compact_history(self):
+        self.history.append("system", "Old system prompt")
+        self.history.append("system", "Previous conversation summary: s")
+        sanitized = PNNet.sanitize_for_switch(self.history)
+        self.assertIsInstance(sanitized, ConversationHistory)
+        self.assertEqual(len(sanitized), 11)
+        self.assertEqual(sanitized[-1].content, "Previous conversation summary: s")
+
+    def test_to_messages(self):
+        messages = self.history.to_messages()
+        self.assertEqual(len(messages), 10)
+        self.assertIsInstance(messages[0], Message)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from gentis_ai.index import BM25Index, tokenize
+
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add("refunds", "Refunds of payments and returned orders")
+        self.index.add("invoices", "Invoices, billing addresses and VAT numbers")
+        self.index.add("laptops", "Laptop hardware, batteries and screens")
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The Refunds of my payments"), ["refund", "payment"])
+
+    def test_search_ranks_matching_documents(self):
+        results = self.index.search("where is my refund?", k=2)
+        self.assertEqual([doc for doc, _ in results], ["refunds"])
+        self.assertEqual(self.index.search("nothing relevant here"), [])
+
+    def test_allowed_subset(self):
+        self.assertEqual(self.index.search("refund invoice", allowed=["invoices"])[0][0], "invoices")
+
+    def test_replace_and_remove(self):
+        self.index.add("laptops", "Gaming consoles")
+        self.assertEqual(self.index.search("battery"), [])
+        self.index.remove("laptops")
+        self.assertNotIn("laptops", self.index)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.search("console"), [])
+
+if __name__ == '__main__':
+    unittest.main()
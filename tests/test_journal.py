@@ -0,0 +1,199 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.journal import SessionJournal
+from gentis_ai.history import HistoryRecord
+from gentis_ai.llm.mock import MockLLM
+
+
+def make_flow(journal):
+    experts = [
+        Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt"),
+        Expert(name="billing", description="Billing", system_prompt="billing prompt"),
+    ]
+    router = Router(experts, MockLLM(routing_rules={"invoice": "billing"}))
+    return Flow(router, MockLLM(default_response="A fairly long answer that makes the history grow quickly. " * 3), optimize=True, journal=journal)
+
+
+class TestSessionJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def contents(self, records):
+        return [(r.role, r.content, r.expert, r.extra) for r in records]
+
+    def test_restart_restores_sessions(self):
+        flow = make_flow(SessionJournal(self.dir))
+        for i in range(12):
+            flow.process_turn(f"question {i} about my invoice" if i % 3 == 0 else f"question {i}", user_id="alice")
+            flow.process_turn(f"hello {i}", user_id="bob")
+        expected = {user: (self.contents(flow._sessions[user]["history"]), flow._sessions[user]["current_expert"]) for user in ("alice", "bob")}
+        self.assertTrue(any(r[1].startswith("Previous conversation summary:") for r in expected["alice"][0]))
+        flow.close()
+
+        flow = make_flow(SessionJournal(self.dir))
+        self.assertEqual(flow._sessions, {}) # Nothing is decoded until a session is used
+        for user, (history, expert) in expected.items():
+            self.assertEqual([m.content for m in flow.get_history(user)], [r[1] for r in history])
+            self.assertEqual(self.contents(flow._sessions[user]["history"]), history)
+            self.assertEqual(flow._sessions[user]["current_expert"], expert)
+        flow.process_turn("one more", user_id="alice")
+        flow.close()
+
+    def test_replay_applies_switch_and_summary(self):
+        journal = SessionJournal(self.dir)
+        journal.record_turn("u", "orchestrator", [HistoryRecord("system", "Context note"), HistoryRecord("user", "hi", "orchestrator")], history_len=2)
+        journal.record_turn("u", "billing", [HistoryRecord("user", "bill", "billing"), HistoryRecord("assistant", "ok", "billing", {"truncated": True})], sanitized=True, history_len=3)
+        self.assertEqual(self.contents(journal.load("u")["history"]), [
+            ("user", "hi", "orchestrator", None), ("user", "bill", "billing", None), ("assistant", "ok", "billing", {"truncated": True}),
+        ])
+        journal.record_turn("u", "billing", [HistoryRecord("user", "q", "billing"), HistoryRecord("assistant", "a", "billing")], history_len=3, summary="Previous conversation summary: s")
+        state = journal.load("u")
+        self.assertEqual([r.content for r in state["history"]], ["Previous conversation summary: s", "q", "a"])
+        self.assertEqual(state["current_expert"], "billing")
+        self.assertIsNone(journal.load("nobody"))
+        journal.close()
+
+    def test_torn_tail_is_dropped(self):
+        journal = SessionJournal(self.dir)
+        journal.record_turn("u", "orchestrator", [HistoryRecord("user", "first")], history_len=1)
+        journal.record_turn("u", "orchestrator", [HistoryRecord("user", "second")], history_len=2)
+        journal.close()
+        segment = os.path.join(self.dir, sorted(os.listdir(self.dir))[-1])
+        with open(segment, "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x12\x34\x56\x78\x01partial") # Crash in the middle of an append
+
+        journal = SessionJournal(self.dir)
+        self.assertEqual([r.content for r in journal.load("u")["history"]], ["first", "second"])
+        journal.record_turn("u", "orchestrator", [HistoryRecord("user", "third")], history_len=3)
+        journal.close()
+        journal = SessionJournal(self.dir)
+        self.assertEqual([r.content for r in journal.load("u")["history"]], ["first", "second", "third"])
+        journal.close()
+
+    def test_damaged_record_in_the_middle_is_skipped(self):
+        journal = SessionJournal(self.dir)
+        for i in range(10):
+            journal.record_turn("u", "orchestrator", [HistoryRecord("user", f"turn {i}")], history_len=100)
+        journal.close()
+        segment = os.path.join(self.dir, [n for n in sorted(os.listdir(self.dir)) if os.path.getsize(os.path.join(self.dir, n))][0])
+        size = os.path.getsize(segment)
+        with open(segment, "r+b") as f:
+            f.seek(size // 3)
+            byte = f.read(1)
+            f.seek(size // 3)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        journal = SessionJournal(self.dir)
+        contents = [r.content for r in journal.load("u")["history"]]
+        self.assertEqual(len(contents), 9) # Only the damaged turn is lost
+        self.assertEqual(contents[-1], "turn 9")
+        self.assertEqual(os.path.getsize(segment), size) # Acknowledged records after it are kept
+        self.assertTrue(os.path.exists(segment + ".corrupt"))
+        self.assertEqual(journal.damaged_ranges, 1)
+        journal.close()
+
+    def test_failed_write_is_rolled_back(self):
+        journal = SessionJournal(self.dir)
+        journal.record_turn("u", "orchestrator", [HistoryRecord("user", "first")], history_len=100)
+
+        class FailingFile:
+            """Writes part of the batch, then fails (e.g. disk full)."""
+            def __init__(self, file):
+                self.file = file
+
+            def write(self, data):
+                self.file.write(bytes(data[:5]))
+                raise OSError("No space left on device")
+
+            def __getattr__(self, name):
+                return getattr(self.file, name)
+
+        real = journal._file
+        journal._file = FailingFile(real)
+        with self.assertRaises(OSError):
+            journal.record_turn("u", "orchestrator", [HistoryRecord("user", "lost")], history_len=100)
+        journal._file = real
+        journal.record_turn("u", "orchestrator", [HistoryRecord("user", "second")], history_len=100)
+        journal.close()
+
+        journal = SessionJournal(self.dir)
+        self.assertEqual([r.content for r in journal.load("u")["history"]], ["first", "second"])
+        self.assertEqual(journal.damaged_ranges, 0)
+        journal.close()
+
+    def test_writer_failure_releases_turns(self):
+        journal = SessionJournal(self.dir, segment_bytes=1)
+
+        def no_segment():
+            raise OSError("Read-only file system")
+
+        journal._open_segment = no_segment # The next rotation fails
+        errors = []
+
+        def turn():
+            try:
+                journal.record_turn("u", "orchestrator", [HistoryRecord("user", "hi")], history_len=1)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=turn)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive()) # Released, not left waiting on a dead writer
+        self.assertIsInstance(errors[0], OSError)
+        with self.assertRaises(RuntimeError):
+            journal.record_turn("u", "orchestrator", [HistoryRecord("user", "again")], history_len=1)
+        with self.assertRaises(OSError):
+            journal.flush()
+        journal.close()
+
+    def test_compaction(self):
+        journal = SessionJournal(self.dir, segment_bytes=200, compact_segments=0)
+        for i in range(30):
+            journal.record_turn(f"user{i % 3}", "orchestrator", [HistoryRecord("user", f"message {i}")], history_len=4)
+        before = {user: self.contents(journal.load(user)["history"]) for user in journal.sessions()}
+        self.assertGreater(len(os.listdir(self.dir)), 5)
+        journal.compact()
+        self.assertEqual(len([n for n in os.listdir(self.dir) if n.endswith(".snap")]), 1)
+        self.assertEqual(len(os.listdir(self.dir)), 2) # The snapshot and the active segment
+        self.assertEqual({user: self.contents(journal.load(user)["history"]) for user in journal.sessions()}, before)
+        journal.record_turn("user0", "orchestrator", [HistoryRecord("user", "after")], history_len=4)
+        journal.close()
+
+        journal = SessionJournal(self.dir)
+        states = journal.load_all()
+        self.assertEqual(self.contents(states["user1"]["history"]), before["user1"])
+        self.assertEqual(states["user0"]["history"][-1].content, "after")
+        journal.close()
+
+    def test_concurrent_turns_are_all_durable(self):
+        journal = SessionJournal(self.dir)
+
+        def session(n):
+            for i in range(20):
+                journal.record_turn(f"s{n}", "orchestrator", [HistoryRecord("user", f"{n}-{i}")], history_len=100)
+
+        threads = [threading.Thread(target=session, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(journal.records_written, 160)
+        self.assertLessEqual(journal.batches_written, 160)
+        journal.close()
+        journal = SessionJournal(self.dir)
+        self.assertEqual([r.content for r in journal.load("s3")["history"]], [f"3-{i}" for i in range(20)])
+        journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import urllib.request
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.metrics import MetricsRegistry, REGISTRY, TURNS, LLM_REQUESTS, CONTENT_TYPE, start_http_server
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counter_and_gauge_rendering(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("app_requests_total", "Requests.", ["path"])
+        requests.inc(path="/a")
+        requests.inc(2, path='/b"x')
+        registry.gauge("app_sessions", "Sessions.").set(3)
+
+        text = registry.render()
+        self.assertIn("# TYPE app_requests_total counter", text)
+        self.assertIn('app_requests_total{path="/a"} 1', text)
+        self.assertIn('app_requests_total{path="/b\\"x"} 2', text)
+        self.assertIn("# TYPE app_sessions gauge", text)
+        self.assertIn("app_sessions 3", text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("app_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5.0):
+            latency.observe(value)
+
+        text = registry.render()
+        self.assertIn('app_latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('app_latency_seconds_bucket{le="1"} 3', text)
+        self.assertIn('app_latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("app_latency_seconds_count 4", text)
+        self.assertIn("app_latency_seconds_sum 6.25", text)
+
+    def test_same_name_returns_same_metric(self):
+        registry = MetricsRegistry()
+        self.assertIs(registry.counter("x_total", "X."), registry.counter("x_total", "X."))
+        with self.assertRaises(ValueError):
+            registry.gauge("x_total", "X.")
+
+    def test_http_endpoint(self):
+        registry = MetricsRegistry()
+        registry.counter("app_up_total", "Up.").inc()
+        server = start_http_server(port=0, addr="127.0.0.1", registry=registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.headers["Content-Type"], CONTENT_TYPE)
+                self.assertIn("app_up_total 1", response.read().decode("utf-8"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestFlowMetrics(unittest.TestCase):
+    def test_turn_updates_builtin_metrics(self):
+        experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys")
+        ]
+        llm = MockLLM(responses={"buy": "Sure"}, routing_rules={"buy": "sales"})
+        flow = Flow(Router(experts, llm), llm)
+
+        turns_before = TURNS.labels(expert="sales").value
+        calls_before = LLM_REQUESTS.labels(provider="MockLLM", model="", status="ok").value
+        flow.process_turn("I want to buy", user_id="metrics-user")
+
+        self.assertEqual(TURNS.labels(expert="sales").value, turns_before + 1)
+        self.assertGreater(LLM_REQUESTS.labels(provider="MockLLM", model="", status="ok").value, calls_before)
+        self.assertIn("gentis_turn_duration_seconds_bucket", REGISTRY.render())
+
+if __name__ == '__main__':
+    unittest.main()
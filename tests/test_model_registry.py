@@ -0,0 +1,62 @@
+import unittest
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.registry import ModelRegistry
+
+
+class RecordingMockLLM(MockLLM):
+    """MockLLM remembering which model each call asked for."""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.models = []
+
+    def generate(self, messages, system_prompt=None, tools=None, model=None, **kwargs):
+        self.models.append(model)
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, model=model, **kwargs)
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        rules = {"buy": "sales", "laptop": "sales,tech"}
+        self.default = RecordingMockLLM(routing_rules=rules, default_response="default")
+        self.small = RecordingMockLLM(routing_rules=rules, default_response="small")
+        self.big = RecordingMockLLM(routing_rules=rules, default_response="big")
+        self.registry = ModelRegistry(self.default, providers={"local": self.small, "cloud": self.big}, aliases={"fast": "local/tiny"})
+
+    def test_resolve(self):
+        self.assertEqual(self.registry.resolve(None), (self.default, None))
+        self.assertEqual(self.registry.resolve("cloud/large"), (self.big, "large"))
+        self.assertEqual(self.registry.resolve("fast"), (self.small, "tiny"))
+        # Unknown prefixes are part of the model name of the default provider
+        self.assertEqual(self.registry.resolve("meta-llama/Llama-3.1-8B"), (self.default, "meta-llama/Llama-3.1-8B"))
+
+    def test_each_component_uses_its_model(self):
+        experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys", model_name="cloud/large"),
+            Expert(name="tech", description="Tech expert", system_prompt="tech sys", model_name="fast")
+        ]
+        router = Router(experts, self.registry, model_name="fast")
+        flow = Flow(router, self.registry, synthesis_model="cloud/synth")
+
+        response = flow.process_turn("I want to buy", user_id="u1")
+        self.assertEqual(response.content, "big")
+        self.assertEqual(self.small.models, ["tiny"]) # routing
+        self.assertEqual(self.big.models, ["large"])
+        self.assertGreater(response.token_usage["total"], 0)
+
+        flow.process_turn("which laptop?", user_id="u1")
+        self.assertEqual(self.small.models, ["tiny", "tiny", "tiny"]) # routing, tech expert
+        self.assertEqual(self.big.models, ["large", "large", "synth"]) # sales expert, synthesis
+        self.assertEqual(self.default.models, [])
+
+    def test_expert_without_model_uses_default_provider(self):
+        experts = [Expert(name="orchestrator", description="General", system_prompt="sys")]
+        flow = Flow(Router(experts, self.registry), self.registry)
+        self.assertEqual(flow.process_turn("hello", user_id="u1").content, "default")
+        self.assertEqual(self.default.models, [None, None])
+
+if __name__ == '__main__':
+    unittest.main()
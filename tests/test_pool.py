@@ -0,0 +1,105 @@
+import time
+import threading
+import unittest
+from collections import Counter
+from gentis_ai.context import session_key
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.pool import ReplicaPool
+from gentis_ai.types import Message, Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+
+MESSAGES = [Message(role="user", content="hello")]
+
+
+class ReplicaLLM(MockLLM):
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__(default_response=name)
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("connection refused")
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+class TestReplicaPool(unittest.TestCase):
+    def test_least_outstanding_spreads_concurrent_calls(self):
+        replicas = [ReplicaLLM(f"r{i}", delay=0.1) for i in range(3)]
+        pool = ReplicaPool(replicas, health_check=None)
+        threads = [threading.Thread(target=pool.generate, args=(MESSAGES,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([r.calls for r in replicas], [1, 1, 1])
+        self.assertEqual([r["outstanding"] for r in pool.stats()], [0, 0, 0])
+
+    def test_ewma_prefers_fast_replica(self):
+        slow, fast = ReplicaLLM("slow", delay=0.05), ReplicaLLM("fast")
+        pool = ReplicaPool([slow, fast], strategy="ewma", health_check=None)
+        answers = Counter(pool.generate(MESSAGES) for _ in range(10))
+        self.assertEqual(slow.calls, 1) # Tried once, then avoided
+        self.assertEqual(answers["fast"], 9)
+
+    def test_eject_and_readmit(self):
+        broken, healthy = ReplicaLLM("broken", fail=True), ReplicaLLM("healthy")
+        pool = ReplicaPool([broken, healthy], failure_threshold=2, eject_seconds=0.1, health_check=None)
+        # Force the broken replica to be picked until it is ejected
+        pool.replicas[1].outstanding = 100
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                pool.generate(MESSAGES)
+        self.assertTrue(pool.stats()[0]["ejected"])
+        self.assertEqual(pool.generate(MESSAGES), "healthy")
+        time.sleep(0.12)
+        broken.fail = False
+        self.assertEqual(pool.generate(MESSAGES), "broken")
+
+    def test_health_check_takes_replica_out(self):
+        down = set()
+        replicas = [ReplicaLLM("a"), ReplicaLLM("b")]
+        pool = ReplicaPool(replicas, health_check=lambda llm: llm not in down, health_check_interval=None)
+        down.add(replicas[0])
+        pool.check_health()
+        self.assertEqual({pool.generate(MESSAGES) for _ in range(5)}, {"b"})
+        down.clear()
+        pool.check_health()
+        self.assertTrue(pool.stats()[0]["healthy"])
+
+    def test_sticky_sessions(self):
+        replicas = [ReplicaLLM(f"r{i}") for i in range(4)]
+        pool = ReplicaPool(replicas, sticky=True, health_check=None)
+        for user in ("alice", "bob", "carol"):
+            with session_key(user):
+                served = {pool.generate(MESSAGES) for _ in range(5)}
+            self.assertEqual(len(served), 1)
+
+    def test_flow_sets_session_key(self):
+        replicas = [ReplicaLLM(f"r{i}") for i in range(4)]
+        pool = ReplicaPool(replicas, sticky=True, health_check=None)
+        experts = [Expert(name="orchestrator", description="General", system_prompt="sys")]
+        flow = Flow(Router(experts, MockLLM()), pool)
+        answers = {flow.process_turn("hi", user_id="user-1").content for _ in range(4)}
+        self.assertEqual(len(answers), 1)
+
+    def test_streaming_releases_replica(self):
+        pool = ReplicaPool([ReplicaLLM("r0")], health_check=None)
+
+        class Streaming(MockLLM):
+            def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+                return iter(["a", "b"])
+
+        pool.replicas[0].llm = Streaming()
+        stream = pool.generate(MESSAGES, stream=True)
+        self.assertEqual(pool.stats()[0]["outstanding"], 1)
+        self.assertEqual("".join(stream), "ab")
+        self.assertEqual(pool.stats()[0]["outstanding"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import time
+import threading
+import unittest
+from gentis_ai.context import Priority, priority
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.ratelimit import RateLimiter, RateLimitedLLM, RateLimitTimeout
+from gentis_ai.types import Message
+from gentis_ai import metrics
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_backpressure(self):
+        limiter = RateLimiter(tokens_per_minute=600, name="test-burst") # 10 tokens/s
+        self.assertLess(limiter.acquire(600), 0.01) # The bucket starts full
+        waited = limiter.acquire(2)
+        self.assertGreater(waited, 0.1)
+        self.assertLess(waited, 1.0)
+        self.assertEqual(limiter.stats()["waited"], 1)
+
+    def test_requests_per_minute(self):
+        limiter = RateLimiter(requests_per_minute=120, name="test-rpm") # 2 requests/s
+        for _ in range(120):
+            limiter.acquire()
+        started = time.monotonic()
+        limiter.acquire()
+        self.assertGreater(time.monotonic() - started, 0.3)
+
+    def test_priority_order(self):
+        limiter = RateLimiter(tokens_per_minute=600, name="test-priority")
+        limiter.acquire(600)
+        order = []
+
+        def call(level, label):
+            with priority(level):
+                limiter.acquire(3)
+            order.append(label)
+
+        background = threading.Thread(target=call, args=(Priority.BACKGROUND, "summary"))
+        background.start()
+        time.sleep(0.05)
+        routing = threading.Thread(target=call, args=(Priority.ROUTING, "router"))
+        routing.start()
+        background.join()
+        routing.join()
+        self.assertEqual(order, ["router", "summary"])
+
+    def test_max_wait(self):
+        limiter = RateLimiter(tokens_per_minute=60, max_wait=0.05, name="test-timeout")
+        limiter.acquire(60)
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(30)
+        self.assertEqual(limiter.stats()["queued"], 0)
+
+    def test_wait_metrics(self):
+        limiter = RateLimiter(tokens_per_minute=600, name="test-metrics")
+        limiter.acquire(600)
+        limiter.acquire(1)
+        text = metrics.REGISTRY.render()
+        self.assertIn('gentis_rate_limit_wait_seconds_count{limiter="test-metrics",priority="interactive"} 2', text)
+
+
+class TestRateLimitedLLM(unittest.TestCase):
+    def test_estimate_is_reconciled_with_usage(self):
+        llm = RateLimitedLLM(MockLLM(default_response="ok"), tokens_per_minute=10000, expected_output_tokens=100)
+        messages = [Message(role="user", content="x" * 400)]
+        self.assertEqual(llm.estimate_tokens(messages), 200)
+
+        self.assertEqual(llm.generate(messages), "ok")
+        # Only the real usage (100 prompt + 0 completion tokens) stays taken from the bucket
+        self.assertAlmostEqual(llm.limiter._tokens, 10000 - llm.get_token_usage()["total"], delta=5)
+
+    def test_shared_limiter(self):
+        limiter = RateLimiter(requests_per_minute=60, name="test-shared")
+        router_llm = RateLimitedLLM(MockLLM(), limiter=limiter)
+        expert_llm = RateLimitedLLM(MockLLM(), limiter=limiter)
+        router_llm.generate([Message(role="user", content="hi")])
+        expert_llm.generate([Message(role="user", content="hi")])
+        self.assertEqual(limiter.acquired, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.ollama import OllamaLLM
+from gentis_ai.llm.resilient import ResilientLLM, CircuitBreaker, ProviderTimeout, AllProvidersFailed, is_retryable
+from gentis_ai.types import Message
+from gentis_ai.tools import cached_tool
+from gentis_ai import metrics
+
+MESSAGES = [Message(role="user", content="hello")]
+
+
+class FlakyLLM(MockLLM):
+    """Fails the first `failures` calls with `error`, sleeps `delays[i]` seconds on call i."""
+    def __init__(self, failures=0, error=None, delays=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.error = error or ConnectionError("connection reset")
+        self.delays = list(delays or [])
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        with self._lock:
+            call = self.calls
+            self.calls += 1
+        if call < len(self.delays):
+            time.sleep(self.delays[call])
+        if call < self.failures:
+            raise self.error
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+class TestResilientLLM(unittest.TestCase):
+    def test_retries_retryable_errors(self):
+        provider = FlakyLLM(failures=2, default_response="ok")
+        llm = ResilientLLM(provider, backoff_base=0.001)
+        self.assertEqual(llm.generate(MESSAGES), "ok")
+        self.assertEqual(provider.calls, 3)
+        self.assertGreater(llm.get_token_usage()["total"], 0)
+
+    def test_does_not_retry_bad_requests(self):
+        provider = FlakyLLM(failures=1, error=ValueError("API key not valid"))
+        llm = ResilientLLM(provider, backoff_base=0.001)
+        with self.assertRaises(AllProvidersFailed) as raised:
+            llm.generate(MESSAGES)
+        self.assertEqual(provider.calls, 1)
+        self.assertIn("API key not valid", str(raised.exception))
+
+    def test_timeout_falls_back(self):
+        slow = FlakyLLM(delays=[0.5], default_response="slow")
+        local = MockLLM(default_response="local")
+        llm = ResilientLLM([slow, local], timeout=0.05, max_retries=0)
+        started = time.perf_counter()
+        self.assertEqual(llm.generate(MESSAGES), "local")
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertIn('event="fallback"', metrics.REGISTRY.render())
+
+    def test_model_only_sent_to_primary(self):
+        seen = []
+
+        class Recording(MockLLM):
+            def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+                seen.append(kwargs.get("model"))
+                return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+        llm = ResilientLLM([FlakyLLM(failures=5), Recording()], max_retries=0)
+        llm.generate(MESSAGES, model="gemini-2.0-flash")
+        self.assertEqual(seen, [None])
+
+    def test_hedged_request(self):
+        # Ten fast calls set the latency baseline, then one call stalls and its hedge answers first
+        provider = FlakyLLM(delays=[0.0] * 10 + [1.0], default_response="ok")
+        llm = ResilientLLM(provider, hedge_percentile=90, hedge_min_samples=10)
+        for _ in range(10):
+            llm.generate(MESSAGES)
+        started = time.perf_counter()
+        self.assertEqual(llm.generate(MESSAGES), "ok")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(provider.calls, 12)
+        self.assertIn('event="hedge_won"', metrics.REGISTRY.render())
+
+    def test_streaming(self):
+        llm = ResilientLLM(FlakyLLM(failures=1, default_response="streamed"), backoff_base=0.001)
+        self.assertEqual("".join(llm.generate(MESSAGES, stream=True)), "streamed")
+        self.assertGreater(llm.get_token_usage()["total"], 0)
+
+    def test_circuit_breaker_skips_provider(self):
+        broken = FlakyLLM(failures=100)
+        llm = ResilientLLM([broken, MockLLM(default_response="backup")], max_retries=0, failure_threshold=2, reset_timeout=60)
+        for _ in range(4):
+            self.assertEqual(llm.generate(MESSAGES), "backup")
+        self.assertEqual(broken.calls, 2)
+        self.assertEqual(llm.breakers[0].state, CircuitBreaker.OPEN)
+
+
+def lookup_order(order_id: str) -> str:
+    """Status of an order."""
+    return f"order {order_id} shipped"
+
+    def test_rejected_requests_do_not_open_the_circuit(self):
+        provider = FlakyLLM(failures=100, error=ValueError("API key not valid"))
+        llm = ResilientLLM(provider, max_retries=0, failure_threshold=2)
+        for _ in range(3):
+            with self.assertRaises(AllProvidersFailed):
+                llm.generate(MESSAGES)
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(llm.breakers[0].state, CircuitBreaker.CLOSED)
+
+
+def send_mail(to: str) -> str:
+    """Has a side effect: must not run twice."""
+    return "sent"
+
+
+@cached_tool(ttl=60)
+def get_prices(plan: str) -> str:
+    """Idempotent."""
+    return "10$"
+
+
+class TestResilientToolCalls(unittest.TestCase):
+    def test_side_effect_tools_are_not_retried_or_sent_to_a_fallback(self):
+        provider = FlakyLLM(failures=2)
+        backup = FlakyLLM(default_response="backup")
+        llm = ResilientLLM([provider, backup], backoff_base=0.001)
+        with self.assertRaises(AllProvidersFailed):
+            llm.generate(MESSAGES, tools=[send_mail])
+        self.assertEqual((provider.calls, backup.calls), (1, 0))
+        with self.assertRaises(AllProvidersFailed):
+            llm.generate(MESSAGES, tools=[send_mail], stream=True)
+        self.assertEqual((provider.calls, backup.calls), (2, 0))
+
+    def test_side_effect_tools_are_not_hedged(self):
+        provider = FlakyLLM(delays=[0.0] * 10 + [0.3], default_response="ok")
+        llm = ResilientLLM(provider, hedge_percentile=90, hedge_min_samples=10)
+        for _ in range(10):
+            llm.generate(MESSAGES, tools=[send_mail])
+        self.assertEqual(llm.generate(MESSAGES, tools=[send_mail]), "ok")
+        self.assertEqual(provider.calls, 11)
+
+    def test_idempotent_tools_are_retried(self):
+        provider = FlakyLLM(failures=1, default_response="ok")
+        llm = ResilientLLM(provider, backoff_base=0.001)
+        self.assertEqual(llm.generate(MESSAGES, tools=[get_prices]), "ok")
+        self.assertEqual(provider.calls, 2)
+
+    def test_provider_with_open_circuit_is_passed_over(self):
+        broken = FlakyLLM(failures=100)
+        llm = ResilientLLM([broken, MockLLM(default_response="backup")], max_retries=0, failure_threshold=1, reset_timeout=60)
+        llm.generate(MESSAGES) # Opens the primary's circuit
+        self.assertEqual(llm.generate(MESSAGES, tools=[send_mail]), "backup") # Nothing was started on the primary
+        self.assertEqual(broken.calls, 1)
+
+
+class ToolStreamingClient:
+    """Fake ollama client: each streamed turn makes one tool call, then answers."""
+    def __init__(self):
+        self.requests = 0
+
+    def chat(self, **kwargs):
+        self.requests += 1
+        if self.requests % 2:
+            return iter([{"message": {"content": "", "tool_calls": [{"function": {"name": "lookup_order", "arguments": {"order_id": "42"}}}]}}])
+        return iter([{"message": {"content": "It "}}, {"message": {"content": "shipped."}}])
+
+
+class TestResilientStreamingState(unittest.TestCase):
+    def test_streamed_tool_calls_do_not_accumulate(self):
+        with patch("gentis_ai.llm.ollama.ollama", SimpleNamespace(Client=lambda **_: ToolStreamingClient())):
+            provider = OllamaLLM("llama3")
+        llm = ResilientLLM(provider, hedge_percentile=None)
+        for _ in range(3):
+            text = "".join(llm.generate(MESSAGES, tools=[lookup_order], stream=True))
+            self.assertEqual(text, "It shipped.")
+            self.assertEqual([c["name"] for c in llm.get_tool_calls()], ["lookup_order"])
+        llm.close()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow()) # Trial call
+        self.assertFalse(breaker.allow()) # Only one at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_retryable_errors(self):
+        self.assertTrue(is_retryable(ProviderTimeout()))
+        self.assertTrue(is_retryable(Exception("429 RESOURCE_EXHAUSTED")))
+        self.assertFalse(is_retryable(ValueError("400 INVALID_ARGUMENT")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.memory import RetrievalMemory, SessionMemory
+from gentis_ai.history import ConversationHistory
+from gentis_ai.index import VectorIndex
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.gemini import GeminiLLM
+
+TOPICS = ["billing", "shipping", "warranty", "password", "refund"]
+
+
+def keyword_embedder(texts):
+    """One dimension per topic word: enough to test the vector path without a model."""
+    return [[float(text.lower().count(topic)) + 0.01 for topic in TOPICS] for text in texts]
+
+
+class RecordingLLM(MockLLM):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.calls.append(list(messages))
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+class TestSessionMemory(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_search_excludes_recent_turns(self):
+        memory = SessionMemory()
+        memory.add("user: my order number is 4411\nassistant: noted")
+        memory.add("user: what is the weather\nassistant: sunny")
+        memory.add("user: order status?\nassistant: shipped")
+        self.assertEqual(memory.search("order number", k=1)[0][0], "user: my order number is 4411\nassistant: noted")
+        texts = [text for text, _ in memory.search("order", k=3, exclude_recent=1)]
+        self.assertEqual(texts, ["user: my order number is 4411\nassistant: noted"])
+
+    def test_persistence_is_incremental_and_survives_a_torn_line(self):
+        path = os.path.join(self.dir, "s.jsonl")
+        memory = SessionMemory(path=path)
+        memory.add("user: my dog is called Rex\nassistant: nice")
+        memory.add("user: I live in Lyon\nassistant: ok")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"text": "user: interrupted wri') # Crash in the middle of an append
+        reloaded = SessionMemory(path=path)
+        self.assertEqual(len(reloaded), 2)
+        reloaded.add("user: my cat is Tom\nassistant: cute")
+        self.assertEqual(len(SessionMemory(path=path)), 3)
+        self.assertEqual(SessionMemory(path=path).search("dog name", k=1)[0][0], "user: my dog is called Rex\nassistant: nice")
+
+    def test_embeddings_are_stored_and_not_recomputed(self):
+        calls = []
+
+        def embedder(texts):
+            calls.append(texts)
+            return keyword_embedder(texts)
+
+        path = os.path.join(self.dir, "v.jsonl")
+        memory = SessionMemory(embedder=embedder, path=path)
+        memory.add("user: billing question\nassistant: billed monthly")
+        memory.add("user: shipping question\nassistant: ships in 2 days")
+        calls.clear()
+        reloaded = SessionMemory(embedder=embedder, path=path)
+        self.assertEqual(calls, [])
+        self.assertIn("shipping", reloaded.search("when does shipping happen", k=1)[0][0])
+
+    def test_vector_index(self):
+        index = VectorIndex()
+        index.add("a", [1.0, 0.0])
+        index.add("b", [0.0, 2.0])
+        index.add("c", [1.0, 1.0])
+        self.assertEqual([doc for doc, _ in index.search([0.0, 1.0], k=2)], ["b", "c"])
+        index.remove("b")
+        self.assertEqual(index.search([0.0, 1.0], k=1)[0][0], "c")
+        self.assertEqual([doc for doc, _ in index.search([1.0, 0.0], k=5, allowed=["c"])], ["c"])
+
+
+class TestFlowMemory(unittest.TestCase):
+    def make_flow(self, memory):
+        experts = [Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt")]
+        llm = RecordingLLM()
+        return Flow(Router(experts, MockLLM()), llm, memory=memory), llm
+
+    def test_experts_get_recalled_and_recent_turns_only(self):
+        flow, llm = self.make_flow(RetrievalMemory(top_k=1, recent_turns=2))
+        flow.process_turn("My account number is ZX-42, remember it", user_id="u")
+        for i in range(10):
+            flow.process_turn(f"Small talk number {i}", user_id="u")
+        flow.process_turn("What was my account number?", user_id="u")
+        sent = llm.calls[-1]
+        self.assertEqual(len(sent), 1 + 4 + 1) # Recalled turns, last 2 turns, new message
+        self.assertEqual(sent[0].role, "user")
+        self.assertTrue(sent[0].content.startswith(RetrievalMemory.SNIPPETS_HEADER))
+        self.assertIn("ZX-42", sent[0].content)
+        self.assertEqual(sent[-1].content, "What was my account number?")
+        self.assertEqual(len(flow.get_history("u")), 24) # The session history itself is unchanged
+
+    def test_no_recall_without_match(self):
+        flow, llm = self.make_flow(RetrievalMemory(recent_turns=1))
+        flow.process_turn("hello there", user_id="u")
+        flow.process_turn("nice weather today", user_id="u")
+        flow.process_turn("quantum chromodynamics", user_id="u")
+        self.assertFalse(any(m.content.startswith(RetrievalMemory.SNIPPETS_HEADER) for m in llm.calls[-1]))
+
+    def test_memory_is_reloaded_from_storage(self):
+        directory = tempfile.mkdtemp()
+        try:
+            flow, _ = self.make_flow(RetrievalMemory(storage_dir=directory, recent_turns=1))
+            flow.process_turn("My favourite colour is teal", user_id="user/1")
+            flow.process_turn("Thanks", user_id="user/1")
+            flow._drop_session("user/1")
+
+            flow, llm = self.make_flow(RetrievalMemory(storage_dir=directory, recent_turns=1))
+            flow.process_turn("Which colour do I like?", user_id="user/1")
+            self.assertIn("teal", llm.calls[-1][0].content)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_context_keeps_summaries(self):
+        memory = RetrievalMemory(recent_turns=1)
+        history = ConversationHistory()
+        history.append("system", "Previous conversation summary: the user likes tea")
+        for i in range(3):
+            history.append("user", f"q{i}")
+            history.append("assistant", f"a{i}")
+        context = memory.context("u", history, "anything")
+        self.assertEqual([r.content for r in context], ["Previous conversation summary: the user likes tea", "q2", "a2"])
+
+
+class FakeGeminiClient:
+    """Records the history each chat is created with, as google-genai's Client would send it."""
+    def __init__(self, api_key):
+        self.histories = []
+        self.chats = SimpleNamespace(create=self.create)
+
+    def create(self, model, history, config):
+        self.histories.append(history)
+        return SimpleNamespace(send_message=lambda text: SimpleNamespace(text="Noted.", usage_metadata=None))
+
+
+class TestRecallReachesProvider(unittest.TestCase):
+    def test_gemini_payload_holds_recalled_turns(self):
+        fake_types = SimpleNamespace(Content=SimpleNamespace, Part=SimpleNamespace)
+        with patch("gentis_ai.llm.gemini.genai", SimpleNamespace(Client=FakeGeminiClient)), patch("gentis_ai.llm.gemini.types", fake_types):
+            llm = GeminiLLM(api_key="test-key")
+            experts = [Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt")]
+            flow = Flow(Router(experts, MockLLM()), llm, memory=RetrievalMemory(top_k=1, recent_turns=1))
+            flow.process_turn("My account number is ZX-42, remember it", user_id="u")
+            for i in range(4):
+                flow.process_turn(f"Small talk number {i}", user_id="u")
+            flow.process_turn("What was my account number?", user_id="u")
+        sent = [part.text for content in llm.client.histories[-1] for part in content.parts]
+        self.assertTrue(any(RetrievalMemory.SNIPPETS_HEADER in text and "ZX-42" in text for text in sent))
+
+
+if __name__ == "__main__":
+    unittest.main()
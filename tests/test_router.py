@@ -3,6 +3,17 @@ from gentis_ai.router import Router
 from gentis_ai.types import Expert
 from gentis_ai.llm.mock import MockLLM
 
+
+class RecordingMockLLM(MockLLM):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.calls.append(kwargs)
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
 class TestRouter(unittest.TestCase):
     def setUp(self):
         self.experts = [
@@ -33,5 +44,88 @@ class TestRouter(unittest.TestCase):
         expert = self.router.classify("random text", "orchestrator")
         self.assertEqual(expert, ["orchestrator"])
 
+    def test_match_experts(self):
+        self.assertEqual(self.router._match_experts(" Sales, 'support' ,unknown, sales"), ["sales", "support"])
+        self.assertEqual(self.router._match_experts('["support", "sales"]'), ["support", "sales"])
+        self.assertEqual(self.router._match_experts('["support", "sal'), ["support"]) # Cut by the token cap
+
+
+class TestStructuredRouting(unittest.TestCase):
+    def setUp(self):
+        self.experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys"),
+            Expert(name="support", description="Support expert", system_prompt="support sys")
+        ]
+        self.llm = RecordingMockLLM(routing_rules={"buy": "sales", "refund": "sales, support"})
+
+    def test_constraints_are_sent(self):
+        router = Router(self.experts, self.llm, structured=True)
+        self.assertEqual(router.classify("I want to buy", "orchestrator"), ["sales"])
+        self.assertEqual(router.classify("refund please", "orchestrator"), ["sales", "support"])
+
+        constraints = self.llm.calls[0]
+        self.assertEqual(constraints["choices"], ["orchestrator", "sales", "support"])
+        self.assertTrue(constraints["multiple_choices"])
+        self.assertEqual(constraints["stop"], ["\n"])
+        self.assertLessEqual(constraints["max_tokens"], 40)
+
+    def test_single_choice_without_hybrid(self):
+        router = Router(self.experts, self.llm, structured=True, enable_hybrid=False)
+        self.assertEqual(router.classify("I want to buy", "orchestrator"), ["sales"])
+        self.assertFalse(self.llm.calls[0]["multiple_choices"])
+        self.assertLess(self.llm.calls[0]["max_tokens"], 10)
+
+    def test_free_text_mode_sends_no_constraints(self):
+        Router(self.experts, self.llm).classify("I want to buy", "orchestrator")
+        self.assertNotIn("choices", self.llm.calls[0])
+
+    def test_choices_schema(self):
+        self.assertEqual(MockLLM._choices_schema(["a", "b"]), {"type": "string", "enum": ["a", "b"]})
+        self.assertEqual(MockLLM._choices_schema(["a"], multiple=True)["type"], "array")
+
+class TestHierarchicalRouting(unittest.TestCase):
+    def setUp(self):
+        self.experts = [
+            Expert(name="orchestrator", description="General chit-chat", system_prompt="sys"),
+            Expert(name="invoices", description="Invoices, billing addresses and VAT", system_prompt="s", category="billing"),
+            Expert(name="refunds", description="Refunds of payments and returned orders", system_prompt="s", category="billing"),
+            Expert(name="laptops", description="Laptop hardware, batteries and screens", system_prompt="s", category="hardware"),
+            Expert(name="printers", description="Printer setup, ink and paper jams", system_prompt="s", category="hardware"),
+        ]
+        self.llm = RecordingMockLLM(routing_rules={"refund": "refunds", "battery": "laptops"})
+
+    def test_shortlist_limits_candidates(self):
+        router = Router(self.experts, self.llm, shortlist_size=1)
+        self.assertEqual(router._candidates("my laptop battery died", "orchestrator"), ["orchestrator", "laptops"])
+        self.assertEqual(router._candidates("my laptop battery died", "printers"), ["printers", "orchestrator", "laptops"])
+        self.assertEqual(router.classify("my laptop battery died", "orchestrator"), ["laptops"])
+
+    def test_prompt_only_lists_candidates(self):
+        router = Router(self.experts, self.llm, shortlist_size=1)
+        prompts = []
+        original = self.llm.generate
+        def spy(messages, **kwargs):
+            prompts.append(messages[-1].content)
+            return original(messages, **kwargs)
+        self.llm.generate = spy
+        router.classify("I want a refund of my payment", "orchestrator")
+        self.assertIn("'refunds'", prompts[0])
+        self.assertNotIn("'printers'", prompts[0])
+
+    def test_categories_then_experts(self):
+        router = Router(self.experts, self.llm, categories={"billing": "Money matters", "hardware": "Devices"}, structured=True)
+        self.assertEqual(router.classify("I want a refund", "orchestrator"), ["refunds"])
+        # First call picks among categories, second among the experts of the chosen category
+        self.assertEqual(self.llm.calls[0]["choices"], ["billing", "hardware"])
+        self.assertEqual(self.llm.calls[1]["choices"], ["orchestrator", "invoices", "refunds"])
+        self.assertEqual(router._match_categories("Billing, laptops, nope"), ["billing", "hardware"])
+
+    def test_fused_instruction_is_shortlisted(self):
+        router = Router(self.experts, self.llm, shortlist_size=1)
+        instruction = router.handoff_instruction("orchestrator", "printer paper jam")
+        self.assertIn("'printers'", instruction)
+        self.assertNotIn("'refunds'", instruction)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,106 @@
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.llm.scheduling import ModelAffinityScheduler
+from gentis_ai.llm.ollama import OllamaLLM
+from gentis_ai.types import Message
+
+
+class StreamingClient:
+    def __init__(self):
+        self.requests = 0
+
+    def chat(self, **kwargs):
+        self.requests += 1
+        return iter([{"message": {"content": "ok"}, "done": True}])
+
+
+class TestModelAffinityScheduler(unittest.TestCase):
+    def run_calls(self, scheduler, models, duration=0.02, stagger=0.002):
+        """Starts one call per model (in order, slightly staggered) and returns the admission order."""
+        order = []
+        lock = threading.Lock()
+
+        def call(model):
+            scheduler.acquire(model)
+            with lock:
+                order.append(model)
+            time.sleep(duration)
+            scheduler.release(model)
+
+        threads = []
+        for model in models:
+            thread = threading.Thread(target=call, args=(model,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(stagger)
+        for thread in threads:
+            thread.join()
+        return order
+
+    @staticmethod
+    def count_switches(order):
+        return sum(1 for a, b in zip(order, order[1:]) if a != b)
+
+    def test_groups_interleaved_calls(self):
+        scheduler = ModelAffinityScheduler(max_loaded_models=1, max_delay=5.0)
+        scheduler.mark_resident("a")
+        order = self.run_calls(scheduler, ["a", "b", "a", "b", "a", "b"])
+        self.assertEqual(self.count_switches(order), 1)
+        self.assertEqual(scheduler.swaps, 1)
+        self.assertEqual(scheduler.resident_models, ["b"])
+
+    def test_idle_model_is_swapped_immediately(self):
+        scheduler = ModelAffinityScheduler(max_loaded_models=1)
+        scheduler.mark_resident("a")
+        self.assertLess(scheduler.acquire("b"), 0.05)
+        scheduler.release("b")
+        self.assertEqual(scheduler.stats()["swaps"], 1)
+        self.assertEqual(scheduler.stats()["loads"], 0) # "a" was marked resident, not loaded
+
+    def test_max_delay_bounds_wait(self):
+        scheduler = ModelAffinityScheduler(max_loaded_models=1, max_delay=0.1)
+        scheduler.acquire("a") # Held for the whole test
+        started = time.monotonic()
+        scheduler.acquire("b")
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_several_resident_models(self):
+        scheduler = ModelAffinityScheduler(max_loaded_models=2)
+        order = self.run_calls(scheduler, ["a", "b", "a", "b"])
+        self.assertEqual(sorted(order), ["a", "a", "b", "b"])
+        self.assertEqual(scheduler.swaps, 0) # Both fit: nothing was evicted
+        self.assertEqual(scheduler.loads, 2)
+        self.assertEqual(scheduler.stats()["delayed"], 0)
+
+    def test_max_concurrent(self):
+        scheduler = ModelAffinityScheduler(max_loaded_models=1, max_concurrent=1)
+        scheduler.acquire("a")
+        admitted = threading.Event()
+
+        def second():
+            scheduler.acquire("a")
+            admitted.set()
+
+        threading.Thread(target=second).start()
+        self.assertFalse(admitted.wait(0.05))
+        scheduler.release("a")
+        self.assertTrue(admitted.wait(1.0))
+
+    def test_unconsumed_stream_holds_no_slot(self):
+        scheduler = ModelAffinityScheduler(max_loaded_models=1, max_concurrent=1)
+        with patch("gentis_ai.llm.ollama.ollama", SimpleNamespace(Client=lambda **_: StreamingClient())):
+            llm = OllamaLLM("a", scheduler=scheduler)
+        stream = llm.generate([Message(role="user", content="hi")], stream=True)
+        self.assertEqual(scheduler.stats()["inflight"], {})
+        self.assertEqual(llm.client.requests, 0)
+        del stream # Dropped without being iterated
+        self.assertEqual("".join(llm.generate([Message(role="user", content="hi")], stream=True)), "ok")
+        self.assertEqual(scheduler.stats()["inflight"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
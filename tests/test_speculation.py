@@ -0,0 +1,95 @@
+import time
+import unittest
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.tools import cached_tool
+
+
+class SlowMockLLM(MockLLM):
+    """MockLLM with a fixed latency per call, streaming word by word when asked to."""
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+
+    def generate(self, messages, system_prompt=None, tools=None, stream=False, **kwargs):
+        time.sleep(self.delay)
+        text = super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+        if not stream:
+            return text
+        return iter([word + " " for word in text.split()])
+
+
+def lookup(query: str) -> str:
+    return query
+
+
+class TestSpeculation(unittest.TestCase):
+    def setUp(self):
+        self.experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys")
+        ]
+        self.llm = MockLLM(
+            responses={"hello": "Hello there!", "buy": "Sure, what do you want?"},
+            routing_rules={"buy": "sales"}
+        )
+
+    def test_hit_uses_speculative_answer(self):
+        flow = Flow(Router(self.experts, self.llm), self.llm, speculative=True)
+        response = flow.process_turn("hello", user_id="u1")
+
+        self.assertEqual(response.content, "Hello there!")
+        self.assertEqual(response.metadata["speculation"], "hit")
+        self.assertGreater(response.token_usage["total"], 0)
+        stats = flow.speculation_stats.to_dict()
+        self.assertEqual((stats["attempts"], stats["hits"], stats["misses"]), (1, 1, 0))
+        self.assertEqual(stats["hit_rate"], 1.0)
+        flow.close()
+
+    def test_miss_discards_and_counts_waste(self):
+        flow = Flow(Router(self.experts, self.llm), self.llm, speculative=True)
+        response = flow.process_turn("I want to buy", user_id="u1")
+
+        self.assertEqual(response.agent_name, "sales")
+        self.assertEqual(response.content, "Sure, what do you want?")
+        self.assertEqual(response.metadata["speculation"], "miss")
+        flow.close()
+        self.assertEqual(flow.speculation_stats.misses, 1)
+        self.assertGreater(flow.speculation_stats.wasted_tokens, 0)
+        # History only holds the answer that was actually used
+        self.assertEqual([m.content for m in flow.get_history("u1")], ["I want to buy", "Sure, what do you want?"])
+
+    def test_expert_with_side_effect_tools_is_not_speculated(self):
+        experts = [Expert(name="orchestrator", description="General", system_prompt="sys", tools=[lookup])]
+        flow = Flow(Router(experts, self.llm), self.llm, speculative=True)
+        response = flow.process_turn("hello", user_id="u1")
+        self.assertEqual(response.metadata["speculation"], "skipped")
+        self.assertEqual(flow.speculation_stats.skipped, 1)
+
+        experts = [Expert(name="orchestrator", description="General", system_prompt="sys", tools=[cached_tool(ttl=60)(lookup)])]
+        flow = Flow(Router(experts, self.llm), self.llm, speculative=True)
+        self.assertEqual(flow.process_turn("hello", user_id="u1").metadata["speculation"], "hit")
+        flow.close()
+
+    def test_generation_overlaps_routing(self):
+        llm = SlowMockLLM(0.2, responses={"hello": "Hello there!"})
+        serial = Flow(Router(self.experts, llm), llm)
+        started = time.perf_counter()
+        serial.process_turn("hello", user_id="u1")
+        serial_time = time.perf_counter() - started
+
+        flow = Flow(Router(self.experts, llm), llm, speculative=True)
+        started = time.perf_counter()
+        response = flow.process_turn("hello", user_id="u1", stream=True)
+        speculative_time = time.perf_counter() - started
+
+        self.assertEqual(response.content.strip(), "Hello there!")
+        self.assertIn("stream", response.metadata)
+        self.assertLess(speculative_time, serial_time * 0.8)
+        self.assertGreater(flow.speculation_stats.saved_ms, 0)
+        flow.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+from gentis_ai.streaming import StreamBuffer
+
+class TestStreamBuffer(unittest.TestCase):
+    def test_consume_joins_chunks(self):
+        seen = []
+        buffer = StreamBuffer()
+        text = buffer.consume(iter(["Hel", "lo", "", " world"]), on_chunk=seen.append)
+        self.assertEqual(text, "Hello world")
+        self.assertEqual(len(buffer), 11)
+        self.assertEqual(seen, ["Hel", "lo", "", " world"])
+
+    def test_text_is_readable_while_streaming(self):
+        buffer = StreamBuffer()
+        out = []
+        for chunk in buffer.wrap(["a", "b", "c"]):
+            out.append(buffer.text)
+        self.assertEqual(out, ["a", "ab", "abc"])
+
+    def test_timing(self):
+        buffer = StreamBuffer(track_timing=True)
+        buffer.consume(["x"] * 5)
+        timing = buffer.timing()
+        self.assertEqual(timing["chunks"], 5)
+        self.assertIsNotNone(timing["time_to_first_chunk_ms"])
+        self.assertEqual(len(buffer.chunk_latencies()), 4)
+
+if __name__ == '__main__':
+    unittest.main()
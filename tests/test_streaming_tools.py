@@ -0,0 +1,87 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.types import Message
+from gentis_ai.llm.ollama import OllamaLLM
+from gentis_ai.llm.gemini import GeminiLLM
+
+
+def get_weather(city: str) -> str:
+    """Weather of a city."""
+    return f"sunny in {city}"
+
+
+class ScriptedOllamaClient:
+    """Returns the scripted streams in order and records the messages of each request."""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def chat(self, **kwargs):
+        self.requests.append([dict(m) for m in kwargs["messages"]])
+        return iter(self.responses.pop(0))
+
+
+def gemini_chunk(text=None, call=None, tokens=None):
+    part = SimpleNamespace(text=text, function_call=call, thought=False)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))], usage_metadata=SimpleNamespace(total_token_count=tokens) if tokens else None)
+
+
+class FakeGeminiChat:
+    """A chats.create() session streaming scripted rounds."""
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.sent = []
+
+    def send_message_stream(self, message):
+        self.sent.append(message)
+        return iter(self.rounds.pop(0))
+
+
+class FakePart(SimpleNamespace):
+    @staticmethod
+    def from_function_response(name, response):
+        return {"name": name, "response": response}
+
+
+# Stand-in for google.genai.types: the config objects just keep their arguments
+FAKE_GEMINI_TYPES = SimpleNamespace(Content=SimpleNamespace, Part=FakePart, AutomaticFunctionCallingConfig=SimpleNamespace, GenerateContentConfig=SimpleNamespace, HttpOptions=SimpleNamespace)
+
+
+class TestStreamingToolCalls(unittest.TestCase):
+    def test_ollama_stream_runs_tools_and_keeps_streaming(self):
+        client = ScriptedOllamaClient([
+            [
+                {"message": {"content": "Let me check. "}},
+                {"message": {"content": "", "tool_calls": [{"function": {"name": "get_weather", "arguments": {"city": "Paris"}}}]}, "done": True, "prompt_eval_count": 10, "eval_count": 5},
+            ],
+            [
+                {"message": {"content": "Sunny"}},
+                {"message": {"content": " today."}, "done": True, "prompt_eval_count": 30, "eval_count": 5},
+            ],
+        ])
+        with patch("gentis_ai.llm.ollama.ollama", SimpleNamespace(Client=lambda **_: client)):
+            llm = OllamaLLM("llama3")
+        chunks = list(llm.generate([Message(role="user", content="Weather in Paris?")], tools=[get_weather], stream=True))
+        self.assertEqual(chunks, ["Let me check. ", "Sunny", " today."])
+        self.assertEqual(client.requests[-1][-1], {"role": "tool", "content": "sunny in Paris", "tool_name": "get_weather"})
+        self.assertEqual([(c["name"], c["round"]) for c in llm.get_tool_calls()], [("get_weather", 1)])
+        self.assertEqual(llm.get_token_usage()["total"], 50)
+
+    def test_gemini_stream_runs_tools_and_sums_usage(self):
+        chat = FakeGeminiChat([
+            [gemini_chunk(text="Checking. "), gemini_chunk(call=SimpleNamespace(name="get_weather", args={"city": "Rome"}), tokens=40)],
+            [gemini_chunk(text="Sunny", tokens=55), gemini_chunk(text=" in Rome.", tokens=60)],
+        ])
+        client = SimpleNamespace(chats=SimpleNamespace(create=lambda **_: chat))
+        with patch("gentis_ai.llm.gemini.genai", SimpleNamespace(Client=lambda **_: client)), patch("gentis_ai.llm.gemini.types", FAKE_GEMINI_TYPES):
+            llm = GeminiLLM(api_key="test-key")
+            chunks = list(llm.generate([Message(role="user", content="Weather in Rome?")], tools=[get_weather], stream=True))
+        self.assertEqual(chunks, ["Checking. ", "Sunny", " in Rome."])
+        self.assertEqual(chat.sent, ["Weather in Rome?", [{"name": "get_weather", "response": {"result": "sunny in Rome"}}]])
+        self.assertEqual([(c["name"], c["round"]) for c in llm.get_tool_calls()], [("get_weather", 1)])
+        self.assertEqual(llm.get_token_usage()["total"], 100) # Both rounds, not the last chunk's total only
+
+
+if __name__ == '__main__':
+    unittest.main()
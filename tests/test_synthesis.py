@@ -0,0 +1,130 @@
+import unittest
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.synthesis import SynthesisStrategy, LLMSynthesis, SectionedMerge, WinnerSynthesis, compress_answer, split_budget
+from gentis_ai.llm.mock import MockLLM
+
+ANSWERS = {
+    "sales prompt": "The premium plan costs 20 dollars per month.\n\nYou can cancel at any time.",
+    "support prompt": "To reset your router, hold the reset button for ten seconds.\n\nYou can cancel at any time.",
+}
+
+
+class ExpertLLM(MockLLM):
+    """Answers as the expert whose system prompt it receives, and records every call."""
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.calls.append((system_prompt, messages[-1].content, kwargs))
+        if system_prompt in ANSWERS:
+            self._last_usage = {"total": 100}
+            return ANSWERS[system_prompt]
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+def make_flow(synthesis=None, **kwargs):
+    experts = [
+        Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt"),
+        Expert(name="sales", description="Sales", system_prompt="sales prompt"),
+        Expert(name="support", description="Support", system_prompt="support prompt"),
+    ]
+    llm = ExpertLLM()
+    router = Router(experts, MockLLM(routing_rules={"router": "sales, support"}))
+    return Flow(router, llm, synthesis=synthesis, **kwargs), llm
+
+
+class TestBudget(unittest.TestCase):
+    def test_compress_answer_ends_on_a_sentence(self):
+        text = "First sentence here. Second sentence is a bit longer. Third one."
+        self.assertEqual(compress_answer(text, 100), text)
+        self.assertEqual(compress_answer(text, 14), "First sentence here. Second sentence is a bit longer. …")
+        self.assertEqual(compress_answer(text, 10), "First sentence here. Second sentence is …") # No boundary close enough
+
+    def test_split_budget_gives_unused_share_to_longer_answers(self):
+        self.assertEqual(split_budget([10, 500, 1000], 300), [10, 145, 145])
+        self.assertEqual(split_budget([10, 20], 300), [10, 20])
+
+
+class TestSynthesisStrategies(unittest.TestCase):
+    def test_default_llm_synthesis(self):
+        flow, llm = make_flow()
+        response = flow.process_turn("How much is premium and how do I reset my router?", user_id="u")
+        synthesis_prompt = llm.calls[-1][1]
+        self.assertIn("[sales]: The premium plan", synthesis_prompt)
+        self.assertIn("[support]: To reset", synthesis_prompt)
+        self.assertEqual(response.agent_name, "orchestrator")
+        self.assertEqual(response.metadata["synthesis"], "llm")
+
+    def test_token_usage_counts_experts_and_synthesis(self):
+        flow, llm = make_flow()
+        response = flow.process_turn("How much is premium and how do I reset my router?", user_id="u")
+        synthesis_tokens = llm.count_tokens("orchestrator prompt" + llm.calls[-1][1]) + llm.count_tokens(llm.default_response)
+        self.assertEqual(response.token_usage["total"], 200 + synthesis_tokens)
+
+        for strategy in (SectionedMerge(), WinnerSynthesis()):
+            flow, _ = make_flow(strategy)
+            response = flow.process_turn("How much is premium and how do I reset my router?", user_id="u")
+            self.assertEqual(response.token_usage["total"], 200) # The two experts
+
+    def test_answer_budget_and_cheaper_model(self):
+        flow, llm = make_flow(LLMSynthesis(model="small-model", answer_budget=24))
+        flow.process_turn("How much is premium and how do I reset my router?", user_id="u")
+        _, synthesis_prompt, kwargs = llm.calls[-1]
+        self.assertEqual(kwargs["model"], "small-model")
+        self.assertIn("[sales]: The premium plan costs 20 dollars per month. …", synthesis_prompt)
+        self.assertNotIn("You can cancel", synthesis_prompt)
+
+    def test_synthesis_model_is_kept(self):
+        flow, llm = make_flow(synthesis_model="small-model")
+        flow.process_turn("How much is premium and how do I reset my router?", user_id="u")
+        self.assertEqual(llm.calls[-1][2]["model"], "small-model")
+
+    def test_sectioned_merge_makes_no_llm_call(self):
+        flow, llm = make_flow(SectionedMerge(titles={"support": "Tech Support"}))
+        response = flow.process_turn("How much is premium and how do I reset my router?", user_id="u")
+        self.assertEqual(len(llm.calls), 2) # The two experts only
+        self.assertEqual(response.content, (
+            "**Sales**\nThe premium plan costs 20 dollars per month.\n\nYou can cancel at any time.\n\n"
+            "**Tech Support**\nTo reset your router, hold the reset button for ten seconds."
+        ))
+        self.assertEqual(response.agent_name, "orchestrator")
+
+    def test_winner_picks_the_best_matching_answer(self):
+        flow, llm = make_flow(WinnerSynthesis())
+        response = flow.process_turn("My router keeps dropping, how do I reset the router?", user_id="u")
+        self.assertEqual(len(llm.calls), 2)
+        self.assertEqual(response.agent_name, "support")
+        self.assertTrue(response.content.startswith("To reset your router"))
+        self.assertEqual(flow._get_session("u")["current_expert"], "support")
+
+    def test_winner_custom_scorer(self):
+        flow, _ = make_flow(WinnerSynthesis(scorer=lambda message, name, answer: len(answer)))
+        response = flow.process_turn("premium or router", user_id="u")
+        self.assertEqual(response.agent_name, "support")
+
+    def test_failed_answers_are_left_out(self):
+        expert = Expert(name="orchestrator", description="General", system_prompt="sys")
+        answers = [("sales", "Error - connection refused"), ("support", "To reset your router, hold the button.")]
+        self.assertEqual(SectionedMerge().synthesize("reset router", answers, MockLLM(), expert)[1], "**Support**\nTo reset your router, hold the button.")
+        self.assertEqual(WinnerSynthesis(scorer=lambda message, name, answer: len(answer)).synthesize("sales", [answers[1], ("sales", "Error - " + "x" * 200)], MockLLM(), expert)[0], "support")
+        self.assertNotIn("connection refused", LLMSynthesis().build_prompt("reset router", answers))
+
+    def test_strategy_must_implement_synthesize(self):
+        class Incomplete(SynthesisStrategy):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_streamed_merge_reaches_the_consumer(self):
+        flow, _ = make_flow(SectionedMerge())
+        chunks = []
+        response = flow.process_turn("How much is premium and how do I reset my router?", user_id="u", stream=True, on_chunk=chunks.append)
+        self.assertEqual("".join(chunks), response.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
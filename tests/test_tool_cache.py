@@ -0,0 +1,56 @@
+import time
+import unittest
+from gentis_ai.tools import execute_tool_calls, cached_tool, ToolCache
+
+
+class TestToolCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ToolCache(max_entries=2)
+        self.calls = []
+
+        @cached_tool(ttl=60, cache=self.cache)
+        def get_plan_prices(plan: str) -> str:
+            """Returns the price list of a plan."""
+            self.calls.append(plan)
+            time.sleep(0.05)
+            return f"{plan}: $10"
+
+        self.tool = get_plan_prices
+
+    def test_wrapper_keeps_tool_metadata(self):
+        self.assertEqual(self.tool.__name__, "get_plan_prices")
+        self.assertEqual(self.tool.__doc__, "Returns the price list of a plan.")
+        self.assertTrue(self.tool.idempotent)
+
+    def test_repeated_calls_hit_cache(self):
+        self.assertEqual(self.tool(plan="pro"), "pro: $10")
+        self.assertEqual(self.tool(plan="pro"), "pro: $10")
+        self.assertEqual(self.calls, ["pro"])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["tools"]["get_plan_prices"]["hits"], 1)
+
+    def test_concurrent_calls_are_coalesced(self):
+        results = execute_tool_calls([("get_plan_prices", {"plan": "team"})] * 3, {"get_plan_prices": self.tool})
+        self.assertEqual([r["result"] for r in results], ["team: $10"] * 3)
+        self.assertEqual(self.calls, ["team"])
+
+    def test_ttl_and_bounded_size(self):
+        @cached_tool(ttl=0.01, cache=self.cache)
+        def short_lived(x: int) -> int:
+            self.calls.append(x)
+            return x
+
+        short_lived(1)
+        time.sleep(0.02)
+        short_lived(1)
+        self.assertEqual(self.calls, [1, 1])
+
+        for plan in ["a", "b", "c"]:
+            self.tool(plan=plan)
+        self.assertLessEqual(self.cache.stats()["size"], 2)
+        self.assertGreater(self.cache.stats()["evictions"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
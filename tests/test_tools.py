@@ -0,0 +1,115 @@
+import time
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from gentis_ai.tools import execute_tool_calls
+from gentis_ai.types import Message
+from gentis_ai.llm.ollama import OllamaLLM
+
+def slow_lookup(key: str) -> str:
+    """Pretend I/O-bound lookup."""
+    time.sleep(0.2)
+    return f"value-{key}"
+
+async def async_lookup(key: str) -> str:
+    """Async variant of the lookup."""
+    await asyncio.sleep(0.01)
+    return f"async-{key}"
+
+def hanging_lookup() -> str:
+    """Never returns in time."""
+    time.sleep(1)
+    return "too late"
+
+class TestToolExecution(unittest.TestCase):
+    def setUp(self):
+        self.tool_map = {
+            "slow_lookup": slow_lookup,
+            "async_lookup": async_lookup,
+            "hanging_lookup": hanging_lookup,
+        }
+
+    def test_calls_run_concurrently_in_order(self):
+        calls = [("slow_lookup", {"key": str(i)}) for i in range(4)]
+        start = time.perf_counter()
+        results = execute_tool_calls(calls, self.tool_map)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual([r["result"] for r in results], ["value-0", "value-1", "value-2", "value-3"])
+        for r in results:
+            self.assertIsNone(r["error"])
+            self.assertGreaterEqual(r["latency_ms"], 150)
+
+    def test_async_tool_and_json_arguments(self):
+        results = execute_tool_calls([("async_lookup", '{"key": "a"}')], self.tool_map)
+        self.assertEqual(results[0]["result"], "async-a")
+
+    def test_timeout_and_unknown_tool(self):
+        results = execute_tool_calls([("hanging_lookup", {}), ("missing", {})], self.tool_map, timeout=0.1)
+        self.assertEqual(results[0]["error"], "timeout")
+        self.assertEqual(results[1]["error"], "not_found")
+
+
+def get_weather(city: str) -> str:
+    """Weather of a city."""
+    return f"sunny in {city}"
+
+
+def tool_call_message(city):
+    return {"role": "assistant", "content": "", "tool_calls": [{"function": {"name": "get_weather", "arguments": {"city": city}}}]}
+
+
+class ScriptedOllamaClient:
+    """Returns the scripted responses in order and records the messages of each request."""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def chat(self, **kwargs):
+        self.requests.append([dict(m) for m in kwargs["messages"]])
+        return self.responses.pop(0)
+
+
+def make_ollama(client, **kwargs):
+    """An OllamaLLM built by its constructor, talking to `client` instead of a server."""
+    with patch("gentis_ai.llm.ollama.ollama", SimpleNamespace(Client=lambda **_: client)):
+        return OllamaLLM("llama3", **kwargs)
+
+
+class TestOllamaToolLoop(unittest.TestCase):
+    def make_llm(self, responses, max_tool_iterations=5):
+        return make_ollama(ScriptedOllamaClient(responses), max_tool_iterations=max_tool_iterations)
+
+    def test_tool_rounds_feed_results_back(self):
+        llm = self.make_llm([
+            {"message": tool_call_message("Paris"), "prompt_eval_count": 10, "eval_count": 5},
+            {"message": tool_call_message("Rome"), "prompt_eval_count": 20, "eval_count": 5},
+            {"message": {"role": "assistant", "content": "Sunny in both."}, "prompt_eval_count": 30, "eval_count": 5},
+        ])
+        answer = llm.generate([Message(role="user", content="Weather in Paris and Rome?")], tools=[get_weather])
+        self.assertEqual(answer, "Sunny in both.")
+        self.assertEqual(len(llm.client.requests), 3)
+        self.assertEqual(llm.client.requests[-1][-1], {"role": "tool", "content": "sunny in Rome", "tool_name": "get_weather"})
+        calls = llm.get_tool_calls()
+        self.assertEqual([(c["name"], c["round"], c["error"]) for c in calls], [("get_weather", 1, None), ("get_weather", 2, None)])
+        self.assertTrue(all(c["latency_ms"] >= 0 for c in calls))
+        self.assertEqual(llm.get_token_usage()["total"], 75)
+
+    def test_rounds_are_capped(self):
+        llm = self.make_llm([{"message": tool_call_message(f"city{i}")} for i in range(4)], max_tool_iterations=2)
+        llm.generate([Message(role="user", content="Weather everywhere?")], tools=[get_weather])
+        self.assertEqual(len(llm.client.requests), 3) # The first request and 2 tool rounds
+        self.assertEqual([c["round"] for c in llm.get_tool_calls()], [1, 2])
+        self.assertEqual(len(llm.client.responses), 1) # The last tool call is not executed
+
+    def test_tool_calls_are_reset_per_call(self):
+        llm = self.make_llm([{"message": tool_call_message("Oslo")}, {"message": {"content": "Cold."}}, {"message": {"content": "Hi."}}])
+        llm.generate([Message(role="user", content="Weather in Oslo?")], tools=[get_weather])
+        llm.generate([Message(role="user", content="Hello")], tools=[get_weather])
+        self.assertEqual(llm.get_tool_calls(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
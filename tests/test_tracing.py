@@ -0,0 +1,63 @@
+import unittest
+from gentis_ai.session import Flow
+from gentis_ai.router import Router
+from gentis_ai.types import Expert
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.tools import execute_tool_calls, cached_tool, ToolCache
+from gentis_ai.tracing import Tracer, InMemoryExporter, NOOP_SPAN
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.experts = [
+            Expert(name="orchestrator", description="General", system_prompt="sys"),
+            Expert(name="sales", description="Sales expert", system_prompt="sales sys")
+        ]
+        self.mock_llm = MockLLM(
+            responses={"hello": "Hello there!", "buy": "Sure, what do you want?"},
+            routing_rules={"buy": "sales", "hello": "orchestrator"}
+        )
+        self.router = Router(self.experts, self.mock_llm)
+
+    def test_turn_spans_are_attached_and_exported(self):
+        exporter = InMemoryExporter()
+        flow = Flow(self.router, self.mock_llm, tracer=Tracer(exporter))
+        response = flow.process_turn("I want to buy", user_id="user1")
+
+        names = [s["name"] for s in response.spans]
+        self.assertEqual(sorted(names), ["expert", "prune", "route", "turn"])
+        root = next(s for s in response.spans if s["name"] == "turn")
+        self.assertIsNone(root["parent_id"])
+        for s in response.spans:
+            self.assertEqual(s["context"]["trace_id"], root["context"]["trace_id"])
+            if s is not root:
+                self.assertEqual(s["parent_id"], root["context"]["span_id"])
+            self.assertGreaterEqual(s["duration_ms"], 0)
+        expert = next(s for s in response.spans if s["name"] == "expert")
+        self.assertEqual(expert["attributes"]["expert"], "sales")
+        self.assertGreater(expert["attributes"]["tokens.total"], 0)
+        self.assertEqual(len(exporter.spans), 4)
+
+    def test_default_tracer_is_noop(self):
+        flow = Flow(self.router, self.mock_llm)
+        response = flow.process_turn("hello", user_id="user1")
+        self.assertEqual(response.spans, [])
+        self.assertIs(flow.tracer.span("anything"), NOOP_SPAN)
+
+    def test_tool_spans_record_cache_hits(self):
+        @cached_tool(ttl=60, cache=ToolCache())
+        def lookup(key: str) -> str:
+            """Lookup."""
+            return key.upper()
+
+        exporter = InMemoryExporter()
+        tracer = Tracer(exporter)
+        with tracer.span("expert"):
+            execute_tool_calls([("lookup", {"key": "a"}), ("lookup", {"key": "b"})], {"lookup": lookup})
+            execute_tool_calls([("lookup", {"key": "a"})], {"lookup": lookup})
+
+        tools = [s for s in exporter.spans if s.name == "tool"]
+        self.assertEqual(len(tools), 3)
+        self.assertEqual(sorted(s.attributes["cache.hit"] for s in tools), [False, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
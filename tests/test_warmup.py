@@ -0,0 +1,75 @@
+import unittest
+from gentis_ai.types import Expert
+from gentis_ai.router import Router
+from gentis_ai.session import Flow
+from gentis_ai.llm.mock import MockLLM
+from gentis_ai.llm.registry import ModelRegistry
+
+
+class WarmableLLM(MockLLM):
+    def __init__(self, model_name="default-model", fail=False):
+        super().__init__()
+        self.model_name = model_name
+        self.fail = fail
+        self.warmed = []
+        self.generated = []
+
+    def warmup(self, models=None):
+        if self.fail:
+            raise ConnectionError("server unreachable")
+        models = models or [self.model_name]
+        self.warmed.extend(models)
+        return {model: 0.01 for model in models}
+
+    def generate(self, messages, system_prompt=None, tools=None, **kwargs):
+        self.generated.append((system_prompt, kwargs.get("model"), kwargs.get("max_tokens")))
+        return super().generate(messages, system_prompt=system_prompt, tools=tools, **kwargs)
+
+
+def make_experts():
+    return [
+        Expert(name="orchestrator", description="General", system_prompt="orchestrator prompt"),
+        Expert(name="sales", description="Sales", system_prompt="sales prompt", model_name="big-model"),
+    ]
+
+
+class TestWarmup(unittest.TestCase):
+    def test_flow_warms_every_model(self):
+        llm = WarmableLLM()
+        flow = Flow(Router(make_experts(), llm, model_name="small-model"), llm, synthesis_model="synth-model")
+        report = flow.warmup()
+        self.assertTrue(report.ready)
+        self.assertEqual(set(llm.warmed), {"default-model", "big-model", "synth-model", "small-model"})
+        self.assertIn("llm/big-model", report.timings)
+        self.assertIn("router.llm/small-model", report.timings)
+        self.assertEqual(llm.generated, []) # No generation unless asked
+
+    def test_generate_dry_runs(self):
+        llm = WarmableLLM()
+        flow = Flow(Router(make_experts(), llm), llm)
+        report = flow.warmup(generate=True)
+        self.assertIn("router.classify", report.timings)
+        self.assertIn("expert:sales", report.timings)
+        self.assertIn(("sales prompt", "big-model", 1), llm.generated)
+
+    def test_failures_are_reported(self):
+        llm = WarmableLLM(fail=True)
+        flow = Flow(Router(make_experts(), MockLLM()), llm)
+        report = flow.warmup()
+        self.assertFalse(report.ready)
+        self.assertIn("server unreachable", report.errors["llm"])
+
+    def test_registry_warms_each_backend(self):
+        local, cloud = WarmableLLM("local-default"), WarmableLLM("cloud-default")
+        registry = ModelRegistry(local, {"cloud": cloud})
+        timings = registry.warmup(["cloud/gemini-2.0-flash", "granite4:micro"])
+        self.assertEqual(cloud.warmed, ["gemini-2.0-flash"])
+        self.assertEqual(local.warmed, ["granite4:micro"])
+        self.assertEqual(set(timings), {"cloud/gemini-2.0-flash", "granite4:micro"})
+
+    def test_default_warmup_is_noop(self):
+        self.assertEqual(MockLLM().warmup(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()